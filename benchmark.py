@@ -0,0 +1,282 @@
+"""기록해 둔 페이지(fixture)로 파서와 출력 싱크의 성능을 측정하는 벤치마크.
+
+osha.gov에 요청하지 않고 같은 입력으로 반복 측정할 수 있도록, 먼저 `record`로 accident_detail과
+inspection_detail 페이지를 `--fixtures` 폴더에 저장합니다. 기본으로는 프로세스 안에서 띄운
+`stub_server.StubServer`에서 기록하며, `--base-url https://www.osha.gov`를 주면 실제 페이지를 기록합니다.
+검색 결과 페이지는 저장소의 `(tmp) Accident Search Results ... (sample).html` 파일들을 그대로 씁니다.
+
+측정 항목:
+- report_id: 검색 결과 페이지의 Summary Nr 추출 (`utils.get_report_id`)
+- accident_detail: 여러 ID를 묶은 accident_detail 페이지에서 Inspection Nr 추출 (`utils.parse_inspection_nrs`)
+- inspection_detail: inspection_detail 페이지의 필드 추출 (`inspection_http.parse_inspection_detail`)
+- dataframe, parquet, xlsx, xlsx-long: `--sizes`개 레코드의 DataFrame 구성과 Parquet/Excel(넓은 형식, 긴 형식 스트리밍) 쓰기
+
+각 항목은 새 프로세스에서 실행되므로 최대 RSS가 서로 섞이지 않습니다. 결과는 초당 처리 수(pages/sec,
+rows/sec), MB/sec(파서는 입력, 싱크는 출력 크기), 최대 RSS로 보고합니다. `--save`로 결과를 JSON으로 남기고,
+`--baseline`으로 이전 결과와 비교해 처리량이 `--threshold`보다 많이 떨어지거나 최대 RSS가 그만큼 늘면
+종료 코드 1로 끝납니다.
+
+Usage:
+    $ python benchmark.py record
+    $ python benchmark.py record --base-url https://www.osha.gov --count 20
+    $ python benchmark.py run --save benchmark-fixtures/baseline.json
+    $ python benchmark.py run --baseline benchmark-fixtures/baseline.json --threshold 0.1
+    $ python benchmark.py run --only inspection_detail parquet --sizes 1000 10000
+"""
+# Internal Modules
+from utils import ACCIDENT_DETAIL_PATH, INSPECTION_DETAIL_PATH, create_session, get_report_id, parse_inspection_nrs, read_ids_from_file
+# External Modules
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import multiprocessing
+import statistics
+import argparse
+import platform
+import tempfile
+import logging
+import shutil
+import glob
+import json
+import time
+import sys
+import io
+import os
+
+# Root
+logger_name = 'benchmark'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DEFAULT_FIXTURES = "benchmark-fixtures"
+SEARCH_PAGES = "(tmp) Accident Search Results*.html"
+PARSER_CASES = ("report_id", "accident_detail", "inspection_detail")
+SINK_CASES = ("dataframe", "parquet", "xlsx", "xlsx-long")
+ACCIDENT_BATCH = 25  # accident_detail 페이지 하나에 묶는 Summary Nr 수 (`inspection_bs4.py --batch-size` 기본값)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """현재 프로세스의 최대 RSS(MB). `resource` 모듈이 없는 플랫폼(Windows)에서는 None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 byte 단위입니다.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def record_fixtures(fixtures: str, count: int, base_url: Optional[str] = None, summary_nrs_file: str = "Summary_Nrs.txt", inspection_nrs_file: str = "Inspection Nrs.txt") -> None:
+    """accident_detail 페이지 `count`개(각 `ACCIDENT_BATCH`개 ID)와 inspection_detail 페이지 `count`개를 기록합니다.
+
+    Args:
+        fixtures (str): 페이지와 `manifest.json`을 저장할 폴더.
+        count (int): 종류별 페이지 수.
+        base_url (Optional[str]): 요청할 서버. None이면 프로세스 안의 스텁 서버.
+    """
+    from stub_server import StubServer
+
+    server = StubServer().start() if base_url is None else None
+    base_url = base_url or server.url
+    session = create_session()
+    summary_nrs = [nr for nr in read_ids_from_file(summary_nrs_file) if nr][:count * ACCIDENT_BATCH]
+    inspection_nrs = [nr for nr in read_ids_from_file(inspection_nrs_file) if nr][:count]
+    manifest: Dict[str, List[Dict[str, Any]]] = {"accident_detail": [], "inspection_detail": []}
+    try:
+        for kind in manifest:
+            os.makedirs(os.path.join(fixtures, kind), exist_ok=True)
+        for start in range(0, len(summary_nrs), ACCIDENT_BATCH):
+            ids = summary_nrs[start:start + ACCIDENT_BATCH]
+            response = session.get(f"{base_url}{ACCIDENT_DETAIL_PATH}", params=[("id", id) for id in ids], timeout=60)
+            response.raise_for_status()
+            file = os.path.join("accident_detail", f"{ids[0]}.html")
+            with open(os.path.join(fixtures, file), 'wb') as f:
+                f.write(response.content)
+            manifest["accident_detail"].append({"file": file, "ids": ids})
+        for inspection_nr in inspection_nrs:
+            response = session.get(f"{base_url}{INSPECTION_DETAIL_PATH}", params={"id": inspection_nr}, timeout=60)
+            response.raise_for_status()
+            file = os.path.join("inspection_detail", f"{inspection_nr}.html")
+            with open(os.path.join(fixtures, file), 'wb') as f:
+                f.write(response.content)
+            manifest["inspection_detail"].append({"file": file, "inspection_nr": inspection_nr})
+    finally:
+        if server is not None:
+            server.stop()
+    with open(os.path.join(fixtures, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump({"base_url": base_url if server is None else "stub", "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"), **manifest}, f, indent=2)
+    logger.info(f"Recorded {len(manifest['accident_detail'])} accident_detail and {len(manifest['inspection_detail'])} inspection_detail pages from {base_url} to {fixtures}")
+
+
+def load_fixtures(fixtures: str) -> Dict[str, Any]:
+    with open(os.path.join(fixtures, "manifest.json"), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for kind in ("accident_detail", "inspection_detail"):
+        for entry in manifest[kind]:
+            with open(os.path.join(fixtures, entry["file"]), 'rb') as f:
+                entry["page"] = f.read()
+    return manifest
+
+
+def build_records(manifest: Dict[str, Any], size: int) -> List[Dict[str, Any]]:
+    """기록한 inspection_detail 페이지에서 뽑은 레코드를 `size`개가 되도록 Inspection Nr만 바꿔 반복합니다."""
+    from inspection_http import parse_inspection_detail
+
+    base = [parse_inspection_detail(entry["page"], entry["inspection_nr"]) for entry in manifest["inspection_detail"]]
+    records = []
+    for i in range(size):
+        record = dict(base[i % len(base)])
+        record["Inspection Nr"] = f"{i}.015"
+        records.append(record)
+    return records
+
+
+def folder_size(folder: str) -> int:
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(folder, "**", "*"), recursive=True) if os.path.isfile(path))
+
+
+def prepare_case(case: str, manifest: Dict[str, Any], size: int, workdir: str) -> Tuple[Callable[[], Any], int, Callable[[], int]]:
+    """측정할 함수, 한 번 실행할 때의 처리 수, 처리한 byte 수를 돌려주는 함수를 만듭니다 (측정에서 제외되는 준비 단계)."""
+    if case == "report_id":
+        pages = []
+        for path in sorted(glob.glob(SEARCH_PAGES)):
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        if not pages:
+            raise FileNotFoundError(f"No search result pages match {SEARCH_PAGES}")
+        return (lambda: [get_report_id(io.BytesIO(page)) for page in pages]), len(pages), (lambda: sum(map(len, pages)))
+    if case == "accident_detail":
+        pages = [(entry["page"].decode("utf-8"), entry["ids"]) for entry in manifest["accident_detail"]]
+        return (lambda: [parse_inspection_nrs(page, ids) for page, ids in pages]), len(pages), (lambda: sum(len(entry["page"]) for entry in manifest["accident_detail"]))
+    if case == "inspection_detail":
+        from inspection_http import parse_inspection_detail
+
+        pages = [(entry["page"], entry["inspection_nr"]) for entry in manifest["inspection_detail"]]
+        return (lambda: [parse_inspection_detail(page, nr) for page, nr in pages]), len(pages), (lambda: sum(len(page) for page, _ in pages))
+    records = build_records(manifest, size)
+    if case == "dataframe":
+        import pandas as pd
+
+        return (lambda: pd.DataFrame(records)), size, (lambda: 0)
+    from output_sinks import SINKS
+
+    output_dir = os.path.join(workdir, case)
+    sink = SINKS[case](output_dir)
+    runs: List[str] = []
+
+    def write() -> None:
+        # 실행마다 배치 이름을 바꿔 새 파일을 씁니다. 출력 크기는 실행 한 번의 평균입니다.
+        runs.append(f"bench-{len(runs)}")
+        sink.write(runs[-1], records)
+
+    return write, size, (lambda: folder_size(output_dir) // max(1, len(runs)))
+
+
+def run_case(case: str, fixtures: str, size: int, repeat: int) -> Dict[str, Any]:
+    """`case`를 `repeat`번 실행하고 중앙값 기준의 처리량과 최대 RSS를 돌려줍니다. 새 프로세스에서 호출됩니다."""
+    logging.disable(logging.INFO)  # 싱크의 배치 저장 로그가 측정 출력에 섞이지 않도록 합니다.
+    manifest = load_fixtures(fixtures)
+    workdir = tempfile.mkdtemp(prefix="osha-benchmark-")
+    try:
+        work, items, processed_bytes = prepare_case(case, manifest, size, workdir)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            work()
+            timings.append(time.perf_counter() - started)
+        seconds = statistics.median(timings)
+        size_bytes = processed_bytes()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "items": items,
+        "seconds": seconds,
+        "items_per_sec": items / seconds if seconds else None,
+        "mb_per_sec": size_bytes / seconds / 1e6 if seconds and size_bytes else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "repeat": repeat,
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    """기준 결과보다 처리량이 `threshold` 넘게 줄었거나 최대 RSS가 그만큼 늘어난 항목."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("items_per_sec") and result["items_per_sec"] < base["items_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: {result['items_per_sec']:,.1f}/s vs baseline {base['items_per_sec']:,.1f}/s")
+        if base.get("peak_rss_mb") and result["peak_rss_mb"] and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']:,.0f} MB vs baseline {base['peak_rss_mb']:,.0f} MB")
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.command == "record":
+        record_fixtures(args.fixtures, args.count, args.base_url)
+        return 0
+
+    if not os.path.exists(os.path.join(args.fixtures, "manifest.json")):
+        logger.info(f"No fixtures in {args.fixtures}; recording them from the stub server first")
+        record_fixtures(args.fixtures, args.count)
+    cases = [(case, 0) for case in PARSER_CASES] + [(case, size) for case in SINK_CASES for size in args.sizes]
+    if args.only:
+        cases = [(case, size) for case, size in cases if case in args.only]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    # 항목마다 새 프로세스를 써서 최대 RSS가 앞 항목의 영향을 받지 않도록 합니다.
+    context = multiprocessing.get_context("spawn")
+    for case, size in cases:
+        name = f"{case}[{size}]" if size else case
+        # 10만 행 이상의 싱크는 한 번만 실행합니다.
+        repeat = 1 if size >= 100_000 else args.repeat
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, case, args.fixtures, size, repeat).result()
+        results[name] = result
+        unit = "rows" if size else "pages"
+        mb = f", {result['mb_per_sec']:,.2f} MB/s" if result["mb_per_sec"] else ""
+        rss = f", peak RSS {result['peak_rss_mb']:,.0f} MB" if result["peak_rss_mb"] else ""
+        logger.info(f"{name:<24} {result['seconds']:9.3f}s  {result['items_per_sec']:>12,.1f} {unit}/s{mb}{rss}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(), "cases": results}, f, indent=2)
+        logger.info(f"Saved results to {args.save}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["cases"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+        logger.info(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the parsers and output sinks on recorded pages')
+    parser.add_argument('command', choices=["record", "run"], help='record: save fixture pages, run: measure')
+    parser.add_argument('--fixtures', type=str, default=DEFAULT_FIXTURES, help='Folder of the recorded pages')
+    parser.add_argument('--count', type=int, default=50, help='Number of accident_detail and inspection_detail pages to record')
+    parser.add_argument('--base-url', type=str, default=None, help='Server to record from (default: an in-process stub server)')
+    parser.add_argument('--sizes', type=int, nargs="+", default=[1_000, 10_000, 100_000], help='Record counts of the DataFrame and sink cases')
+    parser.add_argument('--only', nargs="+", choices=PARSER_CASES + SINK_CASES, default=None, help='Run only these cases')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the median is reported')
+    parser.add_argument('--save', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative drop in throughput (or rise in peak RSS) before failing')
+    args = parser.parse_args()
+
+    sys.exit(main(args))
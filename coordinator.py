@@ -0,0 +1,241 @@
+"""여러 워커 프로세스에 작업을 나눠 주는 코디네이터.
+
+입력 ID 목록을 SQLite 작업 원장(`work_ledger.WorkLedger`)에 넣고 N개의 워커 프로세스를 띄웁니다.
+워커들은 원장에서 작은 묶음씩 임대(lease)해 가져가므로 범위를 손으로 나눌 필요가 없고 서로 겹치지
+않습니다. 워커 프로세스가 죽으면 그 워커가 잡고 있던 항목을 바로 되돌리고 새 워커를 띄웁니다.
+응답 없이 멈춘 워커가 잡고 있던 항목은 임대 시간이 지나면 다시 나눠집니다. 원장과 공유 속도 제한은
+SQLite WAL 파일이므로 한 머신의 로컬 디스크에 두어야 합니다 (네트워크 파일 시스템에서는 잠금이 보장되지 않음).
+
+모든 워커는 `rate_limit.SharedTokenBucket` 하나를 공유하므로, 사용자는 전체 초당 요청 수(`--rate`)만
+정하면 됩니다. 각 워커의 `AdaptiveRateController`가 서버 응답에 맞춰 이 공유 속도를 `--max-rate`까지
+올리거나 내립니다. 결과 파일은 코디네이터 혼자 원장에서 내보냅니다.
+
+Usage:
+    $ python coordinator.py detail -I inspection-nrs/id_index.sqlite --workers 4 --rate 1
+    $ python coordinator.py nrs -I Summary_Nrs.txt --workers 2 --rate 0.5
+"""
+# Internal Modules
+from work_ledger import WorkLedger
+from id_index import DEFAULT_INDEX, IdIndex
+from rate_limit import AdaptiveRateController, SharedTokenBucket
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from output_sinks import SINKS, create_sinks
+from utils import OSHA_BASE_URL
+# External Modules
+from typing import Any, Dict, List, Optional
+import multiprocessing
+import argparse
+import logging
+import socket
+import time
+import os
+
+# Root
+logger_name = 'coordinator'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+
+def detail_worker(ledger_path: str, limiter_path: str, max_rate: Optional[float], claim_size: int, lease_timeout: float, engine: str, fallback: bool, drivers: int, max_pages: int, cache_dir: Optional[str], profile: str = "full", base_url: str = OSHA_BASE_URL) -> None:
+    """inspection_detail 워커 프로세스의 본체. 원장의 항목이 모두 끝날 때까지 가져와 처리합니다."""
+    from inspection_detail import InspectionDataProcessor, create_scraper
+
+    limiter = AdaptiveRateController(max_rate=max_rate, bucket=SharedTokenBucket(limiter_path))
+    scraper, pool = create_scraper(engine, fallback, drivers, max_pages, cache_dir, limiter=limiter, profile=profile, base_url=base_url)
+    processor = InspectionDataProcessor(scraper, WorkLedger(ledger_path, lease_timeout=lease_timeout), sinks=[])
+    try:
+        # 내보내기는 코디네이터가 맡으므로 output_dir은 넘기지 않습니다.
+        processor.run(claim_size, 0, workers=drivers, wait=True)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def nrs_worker(ledger_path: str, limiter_path: str, max_rate: Optional[float], claim_size: int, lease_timeout: float, base_url: str, cache_dir: Optional[str], poll_interval: float = 5) -> None:
+    """Summary Nr → Inspection Nr 워커 프로세스의 본체. 임대한 묶음을 accident_detail 묶음 요청으로 처리합니다."""
+    from utils import BatchSizeTuner, create_session, fetch_inspection_nrs
+
+    ledger = WorkLedger(ledger_path, lease_timeout=lease_timeout)
+    limiter = AdaptiveRateController(max_rate=max_rate, bucket=SharedTokenBucket(limiter_path))
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    session = create_session()
+    tuner = BatchSizeTuner()
+    while True:
+        ids = ledger.claim(claim_size)
+        if not ids:
+            if ledger.remaining():
+                time.sleep(poll_interval)
+                continue
+            break
+        for id, inspection_nr in fetch_inspection_nrs(ids, session, tuner, limiter, base_url=base_url, cache=cache):
+            if inspection_nr:
+                ledger.complete(id, {"Summary Nr": id, "Inspection Nr": inspection_nr})
+            else:
+                ledger.fail(id, "Inspection Nr not found or error occurred")
+
+
+class Coordinator:
+    """워커 프로세스들을 띄우고 감시하며, 원장의 완료된 레코드를 내보냅니다."""
+
+    def __init__(self, ledger: WorkLedger, target: Any, kwargs: Dict[str, Any], workers: int = 4, max_restarts: int = 10, poll_interval: float = 5) -> None:
+        """Coordinator 클래스의 초기화 메서드.
+
+        Args:
+            ledger (WorkLedger): 워커들과 공유하는 작업 원장.
+            target (Any): 워커 프로세스에서 실행할 함수 (`detail_worker`, `nrs_worker`).
+            kwargs (Dict[str, Any]): `target`에 넘길 인자.
+            workers (int): 동시에 띄울 워커 프로세스 수.
+            max_restarts (int): 비정상 종료한 워커를 다시 띄우는 최대 횟수 (전체).
+            poll_interval (float): 워커 상태를 확인하고 결과를 내보내는 주기(초).
+        """
+        self.ledger = ledger
+        self.target = target
+        self.kwargs = kwargs
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+        # 워커가 원장에 쓰는 SQLite 연결과 스레드를 물려받지 않도록 spawn으로 띄웁니다.
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self.restarts = 0
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(target=self.target, kwargs=self.kwargs, daemon=True)
+        process.start()
+        logger.info(f"Started worker pid {process.pid}")
+        return process
+
+    def _reap(self) -> None:
+        # 끝난 워커를 정리하고, 비정상 종료한 워커의 임대 항목은 바로 되돌린 뒤 새 워커로 바꿉니다.
+        alive = []
+        for process in self._processes:
+            if process.is_alive():
+                alive.append(process)
+                continue
+            if process.exitcode == 0:
+                logger.info(f"Worker pid {process.pid} finished")
+                continue
+            released = self.ledger.release(f"{socket.gethostname()}:{process.pid}:")
+            logger.warning(f"Worker pid {process.pid} died with exit code {process.exitcode}; released {released} leased items")
+            if self.restarts < self.max_restarts and self.ledger.remaining():
+                self.restarts += 1
+                alive.append(self._spawn())
+        self._processes = alive
+
+    def run(self, export: Any) -> None:
+        """원장의 항목이 모두 끝나거나 워커가 모두 끝날 때까지 워커를 감시합니다.
+
+        Args:
+            export (Any): 주기적으로 호출해 완료된 레코드를 파일로 내보내는 함수.
+        """
+        self._processes = [self._spawn() for _ in range(self.workers)]
+        try:
+            while self._processes:
+                for process in self._processes:
+                    process.join(self.poll_interval / max(1, len(self._processes)))
+                self._reap()
+                export()
+        finally:
+            for process in self._processes:
+                process.terminate()
+            for process in self._processes:
+                process.join()
+                self.ledger.release(f"{socket.gethostname()}:{process.pid}:")
+            export()
+        logger.info(f"Ledger state: {self.ledger.counts()}")
+
+
+def export_nrs(ledger: WorkLedger, output_file: str, index: Optional[IdIndex] = None) -> None:
+    """완료된 Summary Nr → Inspection Nr을 `id: inspection_nr` 형식으로 덧붙이고, `index`가 있으면 함께 기록합니다."""
+    token = f"{os.getpid()}-{time.time_ns()}"
+    rows = ledger.take_unexported(token)
+    if not rows:
+        return
+    try:
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(output_file, 'a', encoding='utf-8') as file:
+            for _, record in rows:
+                file.write(f"{record['Summary Nr']}: {record['Inspection Nr']}\n")
+        if index is not None:
+            index.add((record['Summary Nr'], record['Inspection Nr']) for _, record in rows)
+    except BaseException:
+        ledger.abort_export(token)
+        raise
+    ledger.finish_export(token)
+
+
+def main(args: argparse.Namespace) -> None:
+    # 작업 원장과 공유 속도 제한 파일은 같은 로컬 폴더에 둡니다.
+    ledger = WorkLedger(args.ledger, lease_timeout=args.lease_timeout)
+    limiter_path = os.path.join(os.path.dirname(args.ledger) or ".", "rate_limit.sqlite")
+    SharedTokenBucket(limiter_path, args.rate)
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    if args.stage == "detail":
+        from inspection_detail import InspectionDataProcessor, read_inspection_nrs
+
+        inspection_nrs = read_inspection_nrs(args.input_file_path)
+        if inspection_nrs is None:
+            return
+        processor = InspectionDataProcessor(None, ledger, create_sinks(args.format, args.output))
+        processor.prepare(inspection_nrs, args.output)
+        target = detail_worker
+        kwargs = dict(engine=args.engine, fallback=not args.no_fallback, drivers=args.drivers, max_pages=args.max_pages, cache_dir=cache_dir, profile=args.browser_profile, base_url=args.base_url)
+        export = lambda: processor.export(args.output, args.batch_size)
+    else:
+        from utils import read_ids_from_file
+
+        ledger.add(read_ids_from_file(args.input_file_path))
+        ledger.reset_exports()
+        target = nrs_worker
+        kwargs = dict(base_url=args.base_url, cache_dir=cache_dir)
+        index = IdIndex(args.id_index)
+        export = lambda: export_nrs(ledger, args.output, index)
+
+    kwargs.update(ledger_path=args.ledger, limiter_path=limiter_path, max_rate=args.max_rate or args.rate * 4, claim_size=args.claim_size, lease_timeout=args.lease_timeout)
+    logger.info(f"{ledger.remaining():,} items to process with {args.workers} workers at {args.rate} requests/sec in total")
+    Coordinator(ledger, target, kwargs, args.workers, args.max_restarts).run(export)
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shard scraping work across worker processes that share a ledger and a global rate limit')
+    parser.add_argument('stage', choices=["detail", "nrs"], help='detail: Inspection Nr -> inspection details, nrs: Summary Nr -> Inspection Nr')
+    parser.add_argument('--input-file_path', '-I', type=str, required=True, help='ID index or file of Inspection Nrs (detail), or file of Summary Nrs (nrs)')
+    parser.add_argument('--output', '-O', type=str, default=None, help='Output folder (detail) or output file (nrs)')
+    parser.add_argument('--ledger', '-P', type=str, default=None, help='Work ledger shared by all workers, on a local disk')
+    parser.add_argument('--id-index', type=str, default=DEFAULT_INDEX, help='SQLite Summary Nr <-> Inspection Nr index the results are recorded in (nrs)')
+    parser.add_argument('--workers', '-W', type=int, default=4, help='Number of worker processes on this machine')
+    parser.add_argument('--rate', '-R', type=float, default=1.0, help='Initial total requests per second across all workers, adapted to server responses')
+    parser.add_argument('--max-rate', type=float, default=None, help='Upper bound of the adaptive total rate (default: 4x --rate)')
+    parser.add_argument('--claim-size', type=int, default=10, help='Number of items a worker leases at a time')
+    parser.add_argument('--lease-timeout', type=float, default=600, help='Seconds after which items leased by an unresponsive worker are handed out again')
+    parser.add_argument('--max-restarts', type=int, default=10, help='How many times crashed workers are replaced')
+    parser.add_argument('--batch-size', '-B', type=int, default=1_000, help='Number of records per exported batch (detail)')
+    parser.add_argument('--format', '-F', nargs="+", choices=list(SINKS), default=["parquet"], help='Output formats (detail)')
+    parser.add_argument('--engine', '-E', choices=["http", "selenium", "replay"], default="http", help='Extraction engine (detail)')
+    parser.add_argument('--no-fallback', action='store_true', help='Do not fall back to Selenium (detail)')
+    parser.add_argument('--drivers', '-N', type=int, default=1, help='Chrome drivers and fetch threads per worker (detail)')
+    parser.add_argument('--max-pages', type=int, default=200, help='Recycle each Chrome driver after this many pages (detail)')
+    parser.add_argument('--browser-profile', choices=["full", "lean"], default="full", help='Chrome profile: full page loads, or lean (headless, eager page load, no images/fonts/CSS/analytics) (detail)')
+    parser.add_argument('--base-url', type=str, default=OSHA_BASE_URL, help="Server to query (e.g. a local stub_server.py)")
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the raw response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read from or write to the response cache')
+    args = parser.parse_args()
+    if args.stage == "detail":
+        args.output = args.output or "inspection-detail"
+        args.ledger = args.ledger or "inspection-detail/ledger.sqlite"
+    else:
+        args.output = args.output or "inspection-nrs/Inspection_Nrs(coordinator).txt"
+        args.ledger = args.ledger or "inspection-nrs/ledger.sqlite"
+
+    main(args)
@@ -0,0 +1,131 @@
+"""inspection_detail 결과 파트 파일(`.xlsx`, `.pkl`)을 빠르게 불러오는 로더.
+
+각 파트 파일을 처음 읽을 때 옆에 `<파일 이름>.<해시 16자리>.feather` 사이드카(압축하지 않은 Arrow IPC)를
+만들어 두고, 이후에는 원본 대신 사이드카를 메모리 매핑해 읽습니다. 사이드카 이름에 원본 내용의
+해시가 들어 있으므로 원본이 바뀌면 자동으로 다시 만들어집니다. 변환은 프로세스 풀에서 병렬로 진행됩니다.
+
+Usage:
+    >>> from detail_loader import load_inspection_details
+    >>> df = load_inspection_details("inspection-detail")
+
+    $ python detail_loader.py inspection-detail
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+import pyarrow.feather as feather
+import pyarrow as pa
+import pandas as pd
+import argparse
+import hashlib
+import logging
+import pickle
+import glob
+import os
+
+# Root
+logger_name = 'detail_loader'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+SIDECAR_EXT = "feather"
+
+
+def source_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """원본 파일 내용의 SHA-256 해시."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_path(path: str, digest: str) -> str:
+    """원본 `path`(해시 `digest`)에 대응하는 사이드카 경로."""
+    return f"{path}.{digest[:16]}.{SIDECAR_EXT}"
+
+
+def read_part(path: str) -> pd.DataFrame:
+    """원본 파트 파일을 모든 값이 문자열인 DataFrame으로 읽습니다."""
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as file:
+            return pd.DataFrame(pickle.load(file))
+    return pd.read_excel(path, dtype=str)
+
+
+def convert_part(path: str) -> str:
+    """필요하면 사이드카를 만들고 그 경로를 반환합니다. 예전 해시의 사이드카는 지웁니다.
+
+    프로세스 풀의 워커에서 실행됩니다.
+    """
+    target = sidecar_path(path, source_digest(path))
+    if not os.path.exists(target):
+        table = pa.Table.from_pandas(read_part(path), preserve_index=False)
+        # 압축하지 않아야 읽을 때 복사 없이 메모리 매핑할 수 있습니다.
+        feather.write_feather(table, f"{target}.tmp", compression="uncompressed")
+        os.replace(f"{target}.tmp", target)
+    for stale in glob.glob(f"{glob.escape(path)}.*.{SIDECAR_EXT}"):
+        if stale != target:
+            os.remove(stale)
+    return target
+
+
+def find_parts(folder: str, ext: Sequence[str] = ("xlsx",)) -> List[str]:
+    """`folder`에서 확장자가 `ext`인 파트 파일을 수정 시각 순서로 나열합니다 (사이드카 제외)."""
+    files = [os.path.join(folder, file) for file in os.listdir(folder) if file.split('.')[-1] in ext and not file.startswith('~$')]
+    return sorted(files, key=os.path.getmtime)
+
+
+def load_inspection_details(folder: str, ext: Sequence[str] = ("xlsx",), workers: Optional[int] = None, dedupe: bool = True) -> pd.DataFrame:
+    """파트 파일들을 하나의 DataFrame으로 불러옵니다.
+
+    Args:
+        folder (str): 파트 파일이 있는 폴더 (예: `inspection-detail`, `inspection-detail/pkls`).
+        ext (Sequence[str]): 읽을 확장자 (`xlsx`, `pkl`).
+        workers (Optional[int]): 사이드카를 만들 프로세스 수. 기본값은 CPU 수.
+        dedupe (bool): True이면 같은 Inspection Nr은 가장 최근 파일의 행만 남깁니다.
+
+    Returns:
+        pd.DataFrame: 모든 파트의 행 (열은 파트들의 합집합).
+    """
+    parts = find_parts(folder, ext)
+    if not parts:
+        return pd.DataFrame()
+    pending = [path for path in parts if not glob.glob(f"{glob.escape(path)}.*.{SIDECAR_EXT}")]
+    if pending:
+        logger.info(f"Converting {len(pending)} of {len(parts)} part files")
+    if len(pending) > 1 and workers != 1:
+        # 변환만 워커에서 하고, 읽기는 사이드카를 메모리 매핑해 부모 프로세스에서 합니다.
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sidecars = list(executor.map(convert_part, parts))
+    else:
+        sidecars = [convert_part(path) for path in parts]
+    frames = [feather.read_table(path, memory_map=True).to_pandas() for path in sidecars]
+    df = pd.concat(frames, ignore_index=True)
+    if dedupe and "Inspection Nr" in df:
+        df = df.drop_duplicates("Inspection Nr", keep="last", ignore_index=True)
+    return df
+
+
+def main(folder: str, ext: List[str], workers: Optional[int]) -> None:
+    df = load_inspection_details(folder, ext, workers)
+    logger.info(f"Loaded {len(df):,} rows x {len(df.columns):,} columns from {folder}")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load inspection detail part files through fast Feather sidecars')
+    parser.add_argument('folder', type=str, help='Folder with Inspection_Detail(...) part files')
+    parser.add_argument('--ext', '-E', nargs="+", default=["xlsx"], choices=["xlsx", "pkl"], help='Part file extensions to load')
+    parser.add_argument('--workers', '-W', type=int, default=None, help='Number of conversion processes')
+    args = parser.parse_args()
+
+    main(args.folder, args.ext, args.workers)
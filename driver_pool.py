@@ -0,0 +1,193 @@
+from metrics import timer
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import tempfile
+import logging
+import shutil
+import queue
+import copy
+
+# Logger 설정
+logger_name = 'driver_pool'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+
+# File Handler 설정
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+
+# Stream Handler 설정
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+# 브라우저 프로필. full은 페이지를 사람이 보는 그대로 불러오고, lean은 추출에 필요한 HTML만 받습니다.
+PROFILES = ("full", "lean")
+
+# lean 프로필에서 CDP `Network.setBlockedURLs`로 막는 요청 패턴 (`*`는 임의의 문자열).
+# 저장된 `_files` 폴더에 보이는 DOL 공통 리소스 중 이미지, 글꼴, 스타일시트와 분석/번역 스크립트에 해당합니다.
+# jQuery 등 사이트 자체 스크립트는 DOM을 바꿀 수 있으므로 막지 않습니다.
+LEAN_BLOCKED_URLS: Tuple[str, ...] = (
+    "*.svg*", "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.ico*", "*.webp*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    "*.css*",
+    "*Universal-Federated-Analytics*", "*google-analytics.com*", "*googletagmanager.com*", "*dap.digitalgov.gov*",
+    "*translate.google.com*", "*translate.googleapis.com*", "*gstatic.com*",
+)
+
+
+class _Slot:
+    """풀 안의 드라이버 한 자리. 드라이버와 전용 user-data-dir, 처리한 페이지 수를 보관합니다."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.driver: Optional[webdriver.Chrome] = None
+        self.user_data_dir: Optional[str] = None
+        self.pages = 0
+        self.broken = False
+
+
+class DriverPool:
+    """오래 유지되는 headless Chrome 드라이버 N개를 관리하는 풀.
+
+    각 드라이버는 자신만의 user-data-dir을 사용하므로 동시에 여러 개를 띄울 수 있습니다.
+    드라이버는 처음 임대될 때 생성되고, `max_pages`만큼 페이지를 처리했거나
+    `WebDriverException`으로 중단되었거나 `discard`된 경우 반납 시점에 재생성됩니다.
+
+    `profile="lean"`이면 headless와 `pageLoadStrategy=eager`로 띄우고 `LEAN_BLOCKED_URLS`를 받지 않으므로,
+    `driver.get`은 DOMContentLoaded에서 돌아오고 페이지마다 내려받는 양이 HTML과 스크립트로 줄어듭니다.
+
+    Example:
+        >>> with DriverPool(service, options, size=2) as pool:
+        ...     with pool.lease() as driver:
+        ...         driver.get(url)
+    """
+
+    def __init__(self, driver_service: Service, chrome_options: Options, size: int = 1, max_pages: int = 200, headless: bool = True, user_data_root: Optional[str] = None, profile: str = "full", blocked_urls: Tuple[str, ...] = LEAN_BLOCKED_URLS) -> None:
+        """DriverPool 클래스의 초기화 메서드.
+
+        Args:
+            driver_service (Service): ChromeDriver 서비스.
+            chrome_options (Options): 모든 드라이버의 기본 옵션. `--user-data-dir`은 드라이버마다 새로 지정됩니다.
+            size (int): 동시에 유지할 드라이버 수.
+            max_pages (int): 드라이버를 재생성하기 전까지 처리할 최대 페이지 수.
+            headless (bool): headless 모드로 실행할지 여부.
+            user_data_root (Optional[str]): user-data-dir을 만들 상위 폴더. None이면 임시 폴더를 사용합니다.
+            profile (str): 브라우저 프로필 (`PROFILES`). lean이면 `headless`와 관계없이 headless로 실행합니다.
+            blocked_urls (Tuple[str, ...]): lean 프로필에서 막을 URL 패턴.
+
+        Raises:
+            ValueError: 알 수 없는 프로필인 경우.
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown browser profile: {profile} (expected one of {', '.join(PROFILES)})")
+        self.driver_service = driver_service
+        self.chrome_options = chrome_options
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self.user_data_root = user_data_root
+        self.profile = profile
+        self.blocked_urls = blocked_urls
+        self._slots: List[_Slot] = [_Slot(index) for index in range(size)]
+        self._idle: "queue.Queue[_Slot]" = queue.Queue()
+        self._leased: Dict[int, _Slot] = {}
+        self._lock = threading.Lock()
+        for slot in self._slots:
+            self._idle.put(slot)
+
+    def _options_for(self, user_data_dir: str) -> Options:
+        options = copy.deepcopy(self.chrome_options)
+        options.arguments[:] = [arg for arg in options.arguments if not arg.startswith("--user-data-dir")]
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+        if (self.headless or self.profile == "lean") and not any(arg.startswith("--headless") for arg in options.arguments):
+            options.add_argument("--headless=new")
+        if self.profile == "lean":
+            # HTML이 파싱되면(DOMContentLoaded) 돌아오고, 이미지는 요청 자체를 하지 않습니다.
+            options.page_load_strategy = "eager"
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.arguments[:] = [arg for arg in options.arguments if arg != "--start-maximized"]
+        return options
+
+    def _start(self, slot: _Slot) -> None:
+        slot.user_data_dir = tempfile.mkdtemp(prefix=f"chrome_user_data_{slot.index}_", dir=self.user_data_root)
+        try:
+            with timer("osha_driver_seconds", phase="startup"):
+                slot.driver = webdriver.Chrome(service=self.driver_service, options=self._options_for(slot.user_data_dir))
+                if self.profile == "lean" and self.blocked_urls:
+                    # 차단 목록은 탭에 남으므로 드라이버를 띄울 때 한 번만 설정합니다.
+                    slot.driver.execute_cdp_cmd("Network.enable", {})
+                    slot.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(self.blocked_urls)})
+        except BaseException:
+            # 어떤 예외로 실패하든 띄우다 만 드라이버와 임시 user-data-dir을 남기지 않습니다.
+            self._stop(slot)
+            raise
+        slot.pages = 0
+        slot.broken = False
+        logger.debug(f"Started driver #{slot.index} ({self.profile} profile) with user-data-dir {slot.user_data_dir}")
+
+    def _stop(self, slot: _Slot) -> None:
+        if slot.driver is not None:
+            try:
+                slot.driver.quit()
+            except Exception as e:
+                logger.warning(f"Failed to quit driver #{slot.index}: {e}")
+        if slot.user_data_dir is not None:
+            shutil.rmtree(slot.user_data_dir, ignore_errors=True)
+        slot.driver = None
+        slot.user_data_dir = None
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[webdriver.Chrome]:
+        """풀에서 드라이버 하나를 빌려 사용하고, 블록이 끝나면 반납합니다.
+
+        Args:
+            timeout (Optional[float]): 빈 드라이버를 기다릴 최대 시간(초). None이면 무한정 기다립니다.
+
+        Yields:
+            webdriver.Chrome: 임대된 드라이버.
+        """
+        slot = self._idle.get(timeout=timeout)
+        try:
+            if slot.driver is None:
+                self._start(slot)
+            with self._lock:
+                self._leased[id(slot.driver)] = slot
+            yield slot.driver
+        except WebDriverException:
+            slot.broken = True
+            raise
+        finally:
+            with self._lock:
+                self._leased.pop(id(slot.driver), None)
+            slot.pages += 1
+            if slot.broken or slot.pages >= self.max_pages:
+                logger.debug(f"Recycling driver #{slot.index} after {slot.pages} pages (broken={slot.broken})")
+                self._stop(slot)
+            self._idle.put(slot)
+
+    def discard(self, driver: webdriver.Chrome) -> None:
+        """임대 중인 드라이버를 반납 시점에 재생성하도록 표시합니다 (페이지 로드 실패, 크래시 등)."""
+        with self._lock:
+            slot = self._leased.get(id(driver))
+        if slot is not None:
+            slot.broken = True
+
+    def close(self) -> None:
+        """모든 드라이버를 종료하고 user-data-dir을 정리합니다."""
+        for slot in self._slots:
+            self._stop(slot)
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,262 @@
+"""정규화된 inspection_detail 테이블을 메모리를 일정하게 쓰면서 `.xlsx`로 내보내는 모듈.
+
+`df.to_excel`은 openpyxl로 통합 문서 전체를 메모리에 만든 뒤 저장하고, 넓은 형식(`Violation Item N ...`)은
+항목이 늘 때마다 열이 11개씩 늘어 Excel의 열 한도(16,384)와 행 한도(1,048,576)에 가까워집니다.
+여기서는 xlsxwriter의 `constant_memory` 모드로 행을 쓰는 즉시 디스크로 내보내고, `records.SCHEMAS`의
+네 테이블을 각각 시트 하나(`Inspections`, `Related Activity`, `Violation Summary`, `Violation Items`)에
+긴 형식으로 씁니다. 자식 시트는 `Inspection Nr` 열로 `Inspections` 시트와 연결됩니다.
+
+- 시트가 행 한도에 이르면 같은 이름에 번호를 붙인 시트(`Violation Items (2)`)로 이어 씁니다.
+- `max_file_rows`를 주면 파일 하나의 데이터 행 수가 그만큼 찼을 때 `<이름>(2).xlsx`로 이어 씁니다.
+- 타입이 변환된 테이블(`normalize.TYPED_SCHEMAS`)이면 날짜는 Excel 날짜로, 센트 단위 금액은 달러로 씁니다.
+
+Usage:
+    >>> from excel_export import StreamingWorkbook
+    >>> with StreamingWorkbook("output/inspections.xlsx") as workbook:
+    ...     for name, table in tables.items():
+    ...         workbook.write(name, table)
+
+    $ python excel_export.py output/merged -o output/merged.xlsx
+"""
+# Internal Modules
+from records import SCHEMAS
+from normalize import CONVERSIONS
+# External Modules
+from typing import Any, Dict, List, Optional, Tuple, Union
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow as pa
+import xlsxwriter
+import argparse
+import logging
+import glob
+import os
+
+# Root
+logger_name = 'excel_export'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+# Excel 한도
+MAX_ROWS = 1_048_576
+MAX_COLUMNS = 16_384
+MAX_CELL_CHARS = 32_767
+
+SHEET_TITLES: Dict[str, str] = {
+    "inspections": "Inspections",
+    "related_activity": "Related Activity",
+    "violation_summary": "Violation Summary",
+    "violation_items": "Violation Items",
+}
+
+# (셀 값 목록, worksheet 쓰기 메서드 이름, 셀 서식 이름 또는 행별 서식 이름 목록)
+Column = Tuple[List[Any], str, Union[Optional[str], List[Optional[str]]]]
+
+
+def _dollars(column: Union[pa.Array, pa.ChunkedArray]) -> pa.Array:
+    return pc.divide(pc.cast(column, pa.float64()), 100.0)
+
+
+def _columns(table_name: str, batch: pa.RecordBatch) -> List[Column]:
+    # 열마다 파이썬 값 목록과 쓰기 메서드, 서식을 한 번에 준비합니다. 빈 값은 None으로 두고 쓰지 않습니다.
+    conversions = CONVERSIONS.get(table_name, {})
+    columns: List[Column] = []
+    for field, column in zip(batch.schema, batch.columns):
+        conversion = conversions.get(field.name)
+        cell_format: Union[Optional[str], List[Optional[str]]] = None
+        if pa.types.is_integer(field.type) and conversion == "money":
+            values, method, cell_format = _dollars(column).to_pylist(), "write_number", "money"
+        elif pa.types.is_integer(field.type) and conversion == "summary":
+            # Violation Summary는 Penalty 행만 센트 단위 금액이고 나머지 행은 건수입니다.
+            penalty = pc.fill_null(pc.match_substring(pc.cast(batch.column("Label"), pa.string()), "Penalty"), False).to_pylist()
+            values = pc.if_else(penalty, _dollars(column), pc.cast(column, pa.float64())).to_pylist()
+            method, cell_format = "write_number", ["money" if is_penalty else None for is_penalty in penalty]
+        elif pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+            values, method, cell_format = column.to_pylist(), "write_datetime", "date"
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            values, method = column.to_pylist(), "write_number"
+        elif pa.types.is_boolean(field.type):
+            values, method = column.to_pylist(), "write_boolean"
+        elif pa.types.is_map(field.type):
+            # `Extra` 같은 map 열은 `key: value` 줄로 쓰고, 빈 map은 빈 셀로 둡니다.
+            values, method = [("\n".join(f"{key}: {item}" for key, item in value)[:MAX_CELL_CHARS] or None) if value else None for value in column.to_pylist()], "write_string"
+        elif pa.types.is_list(field.type):
+            values, method = [("\n".join(value)[:MAX_CELL_CHARS] or None) if value else None for value in column.to_pylist()], "write_string"
+        else:
+            values, method = [(str(value)[:MAX_CELL_CHARS] or None) if value is not None else None for value in column.to_pylist()], "write_string"
+        columns.append((values, method, cell_format))
+    return columns
+
+
+class _Sheet:
+    """현재 파일 안에서 테이블 하나가 쓰고 있는 시트와 그 시트에 쓴 데이터 행 수."""
+
+    def __init__(self, worksheet: Any, number: int) -> None:
+        self.worksheet = worksheet
+        self.number = number
+        self.rows = 0
+
+
+class StreamingWorkbook:
+    """테이블별 시트에 행을 스트리밍하는 `.xlsx` 통합 문서 (xlsxwriter `constant_memory`).
+
+    같은 테이블의 배치는 이어서 쓰며, 열 구성은 처음 배치의 스키마를 따릅니다.
+    쓰는 동안 메모리에는 시트마다 현재 행 하나와 지금 쓰는 배치만 남습니다.
+    """
+
+    def __init__(self, path: str, max_rows: int = MAX_ROWS, max_file_rows: Optional[int] = None) -> None:
+        """StreamingWorkbook 클래스의 초기화 메서드.
+
+        Args:
+            path (str): 첫 번째 파일 경로. 이어 쓰는 파일은 `<이름>(2).xlsx`, `<이름>(3).xlsx`, ...
+            max_rows (int): 시트 하나의 최대 행 수 (머리글 포함).
+            max_file_rows (Optional[int]): 파일 하나의 최대 데이터 행 수 (모든 시트 합계). None이면 나누지 않습니다.
+        """
+        self.path = path
+        self.max_rows = max_rows
+        self.max_file_rows = max_file_rows
+        self.paths: List[str] = []
+        self.rows = 0
+        self._workbook: Optional[xlsxwriter.Workbook] = None
+        self._formats: Dict[str, Any] = {}
+        self._sheets: Dict[str, _Sheet] = {}
+        self._file_rows = 0
+
+    def _open(self) -> None:
+        self._close_file()
+        root, ext = os.path.splitext(self.path)
+        path = self.path if not self.paths else f"{root}({len(self.paths) + 1}){ext}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        self._formats = {
+            "header": self._workbook.add_format({"bold": True}),
+            "date": self._workbook.add_format({"num_format": "yyyy-mm-dd"}),
+            "money": self._workbook.add_format({"num_format": "$#,##0.00"}),
+        }
+        self._sheets = {}
+        self._file_rows = 0
+        self.paths.append(path)
+
+    def _close_file(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            logger.info(f"Saved {self.paths[-1]} ({self._file_rows:,} rows)")
+            self._workbook = None
+
+    def _add_sheet(self, table_name: str, header: List[str]) -> _Sheet:
+        previous = self._sheets.get(table_name)
+        number = previous.number + 1 if previous else 1
+        title = SHEET_TITLES.get(table_name, table_name)[:31]
+        if number > 1:
+            title = f"{title[:31 - len(f' ({number})')]} ({number})"
+        worksheet = self._workbook.add_worksheet(title)
+        # constant_memory에서는 행을 순서대로만 쓸 수 있으므로 열 너비와 머리글을 먼저 씁니다.
+        for col, name in enumerate(header):
+            worksheet.set_column(col, col, max(10, min(len(name) + 2, 40)))
+        worksheet.write_row(0, 0, header, self._formats["header"])
+        worksheet.freeze_panes(1, 0)
+        sheet = self._sheets[table_name] = _Sheet(worksheet, number)
+        return sheet
+
+    def write(self, table_name: str, data: Union[pa.Table, pa.RecordBatch]) -> None:
+        """테이블 `table_name`의 시트에 행들을 이어 씁니다.
+
+        Args:
+            table_name (str): `SCHEMAS`의 테이블 이름 (다른 이름이면 그대로 시트 이름이 됩니다).
+            data (Union[pa.Table, pa.RecordBatch]): 쓸 행들.
+
+        Raises:
+            ValueError: 열 수가 Excel의 열 한도를 넘는 경우.
+        """
+        if data.num_columns > MAX_COLUMNS:
+            raise ValueError(f"{table_name} has {data.num_columns:,} columns; Excel allows at most {MAX_COLUMNS:,}")
+        header = data.schema.names
+        if self._workbook is None:
+            self._open()
+        if data.num_rows == 0 and table_name not in self._sheets:
+            # 행이 없는 테이블도 머리글만 있는 시트로 남깁니다. 행이 있으면 시트는 `_write_batch`에서
+            # 파일을 넘길지 정한 뒤에 만들어, 넘긴 파일에 빈 시트가 남지 않게 합니다.
+            self._add_sheet(table_name, header)
+        for batch in (data.to_batches() if isinstance(data, pa.Table) else [data]):
+            self._write_batch(table_name, header, batch)
+
+    def _write_batch(self, table_name: str, header: List[str], batch: pa.RecordBatch) -> None:
+        columns = _columns(table_name, batch)
+        sheet: Optional[_Sheet] = None
+        writers: List[Any] = []
+        for r in range(batch.num_rows):
+            if self.max_file_rows and self._file_rows >= self.max_file_rows:
+                self._open()
+            current = self._sheets.get(table_name)
+            if current is None or current.rows >= self.max_rows - 1:
+                current = self._add_sheet(table_name, header)
+            if current is not sheet:
+                sheet = current
+                writers = [getattr(sheet.worksheet, method) for _, method, _ in columns]
+            sheet.rows += 1
+            for c, (values, _, cell_format) in enumerate(columns):
+                value = values[r]
+                if value is not None:
+                    name = cell_format[r] if isinstance(cell_format, list) else cell_format
+                    writers[c](sheet.rows, c, value, self._formats[name] if name else None)
+            self._file_rows += 1
+            self.rows += 1
+
+    def close(self) -> List[str]:
+        """마지막 파일을 닫고, 쓴 파일 경로들을 반환합니다."""
+        self._close_file()
+        return self.paths
+
+    def __enter__(self) -> "StreamingWorkbook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def export_dataset(root: str, path: str, batch_size: int = 10_000, max_file_rows: Optional[int] = None) -> List[str]:
+    """`root/<table>/*.parquet` 형식의 데이터셋(`MergedStore`, `ParquetSink` 결과)을 `.xlsx`로 내보냅니다.
+
+    Parquet 파일을 `batch_size` 행씩 읽어 바로 쓰므로, 데이터셋 크기와 관계없이 메모리 사용량이 일정합니다.
+
+    Args:
+        root (str): 테이블별 폴더가 있는 폴더 (예: `output/merged`).
+        path (str): 내보낼 `.xlsx` 경로.
+        batch_size (int): 한 번에 읽을 행 수.
+        max_file_rows (Optional[int]): 파일 하나의 최대 데이터 행 수.
+
+    Returns:
+        List[str]: 쓴 파일 경로들.
+    """
+    with StreamingWorkbook(path, max_file_rows=max_file_rows) as workbook:
+        for table_name in SCHEMAS:
+            for part in sorted(glob.glob(os.path.join(root, table_name, "*.parquet"))):
+                for batch in pq.ParquetFile(part).iter_batches(batch_size=batch_size):
+                    workbook.write(table_name, batch)
+    logger.info(f"Exported {workbook.rows:,} rows from {root} to {len(workbook.paths)} file(s)")
+    return workbook.paths
+
+
+def main(args: argparse.Namespace) -> None:
+    export_dataset(args.input, args.output, args.batch_size, args.max_file_rows)
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream normalized inspection_detail tables to .xlsx with one long-format sheet per table')
+    parser.add_argument('input', type=str, help='Folder with one sub-folder of Parquet files per table (e.g. output/merged)')
+    parser.add_argument('-o', '--output', type=str, default="output/inspection_detail.xlsx", help='Output .xlsx path (further files get a (2), (3), ... suffix)')
+    parser.add_argument('--batch-size', type=int, default=10_000, help='Rows read from Parquet at a time')
+    parser.add_argument('--max-file-rows', type=int, default=None, help='Start a new file after this many data rows (all sheets together)')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,332 @@
+"""inspection_detail 페이지의 선언적 추출 명세.
+
+어떤 값을 어디서 가져올지는 `FIELDS`와 `TABLES`에만 적혀 있고, 모듈을 불러올 때 한 번
+`CompiledSpec`으로 컴파일됩니다 (XPath는 `etree.XPath`로 미리 컴파일). 라벨(`<strong>`)로
+찾는 필드들은 문서의 `<strong>` 요소를 한 번 훑으면서 모두 채우고, 테이블 열은 위치가 아니라
+헤더 텍스트로 찾습니다. HTTP 엔진과 Selenium 엔진(`driver.page_source`)이 같은 명세를 사용하므로
+페이지 레이아웃이 바뀌면 이 파일의 명세만 고치면 됩니다.
+"""
+# Internal Modules
+from utils import sanitize_string
+# External Modules
+from dataclasses import dataclass
+from lxml import etree, html as lxml_html
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import logging
+import re
+
+logger = logging.getLogger('inspection_http')
+
+# 렌더링 시 줄바꿈이 생기는 블록 태그들 (Selenium의 `.text`와 같은 결과를 내기 위함)
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "caption", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "table", "tbody", "tfoot", "thead", "tr", "ul",
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "head"}
+HTML_WHITESPACE = " \t\n\r\f"
+_whitespace_run = re.compile(r'[ \t\n\r\f]+')
+
+
+class InspectionPageError(Exception):
+    """추출 명세로 처리할 수 없는 inspection_detail 페이지일 때 발생합니다."""
+
+
+def element_text(element: lxml_html.HtmlElement) -> str:
+    """Selenium `WebElement.text`와 같은 방식으로 요소의 표시 텍스트를 만듭니다.
+
+    소스의 공백은 하나로 합치고, `<br>`과 블록 태그 경계에서만 줄을 바꾸며, NBSP(`&nbsp;`)는
+    일반 공백으로 바꾼 뒤 각 줄의 앞뒤 공백과 빈 줄을 제거합니다.
+
+    Args:
+        element (lxml_html.HtmlElement): 텍스트를 추출할 요소.
+
+    Returns:
+        str: 줄바꿈(`\\n`)으로 구분된 표시 텍스트.
+    """
+    if len(element) == 0 and isinstance(element.tag, str) and element.tag not in SKIP_TAGS and element.tag != "br":
+        # 자식이 없는 요소(대부분의 표 셀)는 텍스트만 정리하면 됩니다.
+        return _whitespace_run.sub(" ", element.text).replace("\u00a0", " ").strip(HTML_WHITESPACE) if element.text else ""
+    parts: List[str] = []
+
+    def walk(el: lxml_html.HtmlElement) -> None:
+        tag = el.tag if isinstance(el.tag, str) else None
+        if tag in SKIP_TAGS:
+            return
+        if tag == "br":
+            parts.append("\n")
+            return
+        block = tag in BLOCK_TAGS or tag in ("td", "th")
+        if block:
+            parts.append("\n" if tag not in ("td", "th") else " ")
+        if tag is not None and el.text:
+            parts.append(_whitespace_run.sub(" ", el.text))
+        for child in el:
+            walk(child)
+            if child.tail:
+                parts.append(_whitespace_run.sub(" ", child.tail))
+        if block:
+            parts.append("\n" if tag not in ("td", "th") else " ")
+
+    walk(element)
+    lines = (line.strip(HTML_WHITESPACE) for line in "".join(parts).replace("\u00a0", " ").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+# 후처리기: 요소의 표시 텍스트 → 저장할 값
+def label_value(text: str) -> str:
+    """`Label: value` 문자열에서 값만 남깁니다."""
+    return sanitize_string(text.split(": ")[1] if ": " in text else text.split(":")[1] if ":" in text else text)
+
+
+def address_value(text: str) -> str:
+    """여러 줄 주소를 `, `로 이어 붙인 뒤 값만 남깁니다."""
+    return label_value(text.replace("\n", ", "))
+
+
+def office_value(text: str) -> str:
+    """`Inspection Information - Office: X`에서 X만 남깁니다."""
+    return sanitize_string(text.split(": ")[-1])
+
+
+@dataclass(frozen=True)
+class Field:
+    """값 하나를 추출하는 규칙.
+
+    Attributes:
+        name (str): 결과 키.
+        post (Callable[[str], str]): 찾은 요소의 표시 텍스트에 적용할 후처리기.
+        labels (Tuple[str, ...]): 값을 가리키는 `<strong>` 텍스트. 앞의 것이 우선합니다.
+        container (str): 라벨에서 값을 담은 요소로 가는 경로.
+            `p`(부모 `<p>`), `span4`(부모 `div.span4`), `span4 p`(부모 `<p>`를 감싼 `div.span4`).
+        xpath (Optional[str]): 라벨 대신 XPath로 찾을 때의 식.
+        required (bool): True이면 찾지 못했을 때 `InspectionPageError`를 냅니다.
+    """
+    name: str
+    post: Callable[[str], str] = label_value
+    labels: Tuple[str, ...] = ()
+    container: str = "p"
+    xpath: Optional[str] = None
+    required: bool = False
+
+
+@dataclass(frozen=True)
+class Column:
+    """테이블 열 하나. `headers` 중 하나와 헤더 텍스트가 같은 열을 쓰고, 없으면 `position`을 씁니다."""
+    name: str
+    headers: Tuple[str, ...]
+    position: int
+
+
+@dataclass(frozen=True)
+class Table:
+    """`<caption>`으로 찾는 테이블의 추출 규칙.
+
+    Attributes:
+        caption (str): 테이블 캡션.
+        key (str): 결과 키 형식. `{idx}`(1부터 시작하는 행 번호), `{label}`(행 머리글), `{column}`(열 이름).
+        columns (Tuple[Column, ...]): 추출할 열. 위치는 행의 모든 셀(`th`, `td`) 기준입니다.
+        label_position (Optional[int]): 행 머리글 셀의 위치 (`{label}`에 쓰임).
+    """
+    caption: str
+    key: str
+    columns: Tuple[Column, ...]
+    label_position: Optional[int] = None
+
+
+FIELDS: Tuple[Field, ...] = (
+    Field("Inspection Office", office_value, xpath="//p/strong[contains(text(), 'Inspection Information - Office')]", required=True),
+    Field("Inspection Nr", labels=("Inspection Nr",), container="span4"),
+    Field("Report ID", labels=("Report ID",), container="span4"),
+    Field("Date Opened", labels=("Date Opened",), container="span4"),
+    Field("Case Status", xpath="//div[@class='well well-small']"),
+    Field("Site Address", address_value, labels=("Site Address",)),
+    Field("Mailing Address", address_value, labels=("Mailing Address",)),
+    Field("Union Status", labels=("Union Status",), container="span4 p"),
+    Field("SIC", labels=("SIC",)),
+    Field("NAICS", labels=("NAICS",)),
+    Field("Inspection Type", labels=("Inspection Type",)),
+    Field("Scope", labels=("Scope",)),
+    Field("Advanced Notice", labels=("Advanced Notice",)),
+    Field("Ownership", labels=("Ownership",)),
+    Field("Safety/Health", labels=("Safety/Health",)),
+    Field("Close Conference", labels=("Close Conference",)),
+    Field("Emphasis", labels=("Emphasis",)),
+    Field("Case Closed", labels=("Case Closed",)),
+)
+
+TABLES: Tuple[Table, ...] = (
+    Table("Related Activity", "Related Activity {column} {idx}", (
+        Column("Type", ("type",), 0),
+        Column("Nr", ("activity nr", "nr"), 1),
+        Column("Safety", ("safety",), 2),
+        Column("Health", ("health",), 3),
+    )),
+    Table("Violation Summary", "{label} {column}", (
+        Column("Serious", ("serious",), 1),
+        Column("Willful", ("willful",), 2),
+        Column("Repeat", ("repeat",), 3),
+        Column("Other", ("other",), 4),
+        Column("Unclass", ("unclass",), 5),
+        Column("Total", ("total",), 6),
+    ), label_position=0),
+    Table("Violation Items", "Violation Item {idx} {column}", (
+        Column("Citation ID", ("citation id",), 0),
+        Column("Citation Type", ("citation type", "type"), 1),
+        Column("Standard Cited", ("standard cited", "standard"), 2),
+        Column("Issuance Date", ("issuance date",), 3),
+        Column("Abatement Due Date", ("abatement due date", "abatement due"), 4),
+        Column("Current Penalty", ("current penalty",), 5),
+        Column("Initial Penalty", ("initial penalty",), 6),
+        Column("FTA Penalty", ("fta penalty",), 7),
+        Column("Contest", ("contest",), 8),
+        Column("Latest Event", ("latest event",), 9),
+        Column("Note", ("note", "notes"), 10),
+    )),
+)
+
+# Investigation Summary 영역 (구조가 달라 명세 대신 전용 규칙으로 추출)
+INVESTIGATION_SUMMARY = "//h4[strong[text()='Investigation Summary']]"
+KEYWORDS = Field("Keywords", labels=("Keywords:", "Keywords"))
+
+
+def _normalize_header(text: str) -> str:
+    return _whitespace_run.sub(" ", text).strip().lower()
+
+
+def _container(strong: lxml_html.HtmlElement, container: str) -> Optional[lxml_html.HtmlElement]:
+    parent = strong.getparent()
+    if parent is None:
+        return None
+    if container == "p":
+        return parent if parent.tag == "p" else None
+    if container == "span4":
+        return parent if parent.tag == "div" and parent.get("class") == "span4" else None
+    if container == "span4 p":
+        grandparent = parent.getparent()
+        if parent.tag == "p" and grandparent is not None and grandparent.tag == "div" and grandparent.get("class") == "span4":
+            return grandparent
+        return None
+    raise ValueError(f"Unknown container: {container}")
+
+
+class CompiledSpec:
+    """`FIELDS`/`TABLES`를 미리 컴파일한 추출기."""
+
+    def __init__(self, fields: Tuple[Field, ...] = FIELDS, tables: Tuple[Table, ...] = TABLES, keywords: Field = KEYWORDS) -> None:
+        self.fields = fields
+        self.tables = tables
+        self.keywords = keywords
+        self._layout = etree.XPath("//div[contains(concat(' ', normalize-space(@class), ' '), ' row-fluid ')][1]")
+        self._strong = etree.XPath("//strong")
+        self._xpaths = {field.name: etree.XPath(field.xpath) for field in fields if field.xpath}
+        self._captions = etree.XPath("//table[caption]")
+        self._rows = etree.XPath(".//tr")
+        self._cells = etree.XPath("./th|./td")
+        self._tds = etree.XPath("./td")
+        self._summary = etree.XPath(INVESTIGATION_SUMMARY)
+        self._summary_rows = etree.XPath("./following-sibling::div[contains(@class, 'row-fluid')]/div")
+        self._summary_long = etree.XPath("./following-sibling::p")
+        # 라벨 텍스트 → (필드, 컨테이너) 목록
+        self._labels: Dict[str, List[Tuple[Field, str]]] = {}
+        for field in fields + (keywords,):
+            for label in field.labels:
+                self._labels.setdefault(label, []).append((field, field.container))
+
+    def _find_labels(self, tree: lxml_html.HtmlElement) -> Dict[Tuple[str, str], lxml_html.HtmlElement]:
+        # 문서의 <strong>을 한 번만 훑어 라벨 필드들의 요소를 모두 찾습니다 (문서 순서상 처음 것).
+        found: Dict[Tuple[str, str], lxml_html.HtmlElement] = {}
+        for strong in self._strong(tree):
+            for field, container in self._labels.get(strong.text, ()):
+                if (field.name, strong.text) not in found:
+                    element = _container(strong, container)
+                    if element is not None:
+                        found[(field.name, strong.text)] = element
+        return found
+
+    def _field(self, tree: lxml_html.HtmlElement, field: Field, found: Dict[Tuple[str, str], lxml_html.HtmlElement], inspection_nr: str) -> str:
+        if field.xpath:
+            elements = self._xpaths[field.name](tree)
+            element = elements[0] if elements else None
+        else:
+            element = next((found[(field.name, label)] for label in field.labels if (field.name, label) in found), None)
+        if element is None:
+            if field.required:
+                raise InspectionPageError(f"{field.name} not found for Inspection Nr: {inspection_nr}")
+            logger.warning(f"Failed to extract {field.name} for Inspection Nr: {inspection_nr}")
+            return ''
+        try:
+            return field.post(element_text(element))
+        except IndexError:
+            logger.warning(f"Failed to extract {field.name} for Inspection Nr: {inspection_nr}")
+            return ''
+
+    def _table(self, table_element: lxml_html.HtmlElement, table: Table) -> Dict[str, str]:
+        rows = self._rows(table_element)
+        if not rows:
+            return {}
+        # 헤더 행의 텍스트로 열 위치를 정하고, 찾지 못한 열은 기본 위치를 씁니다.
+        headers = {_normalize_header(element_text(cell)): position for position, cell in enumerate(self._cells(rows[0]))}
+        positions = [(column.name, next((headers[h] for h in column.headers if h in headers), column.position)) for column in table.columns]
+        data: Dict[str, str] = {}
+        for idx, row in enumerate(rows[1:], start=1):
+            cells = [element_text(cell) for cell in self._cells(row)]
+            label = cells[table.label_position] if table.label_position is not None and table.label_position < len(cells) else ""
+            for name, position in positions:
+                if position < len(cells):
+                    data[table.key.format(idx=idx, label=label, column=name)] = sanitize_string(cells[position])
+        return data
+
+    def extract(self, page: Union[str, bytes, lxml_html.HtmlElement], inspection_nr: str = "") -> Dict[str, Any]:
+        """inspection_detail 페이지에서 명세의 모든 값을 추출합니다.
+
+        Args:
+            page (Union[str, bytes, lxml_html.HtmlElement]): 페이지 HTML 또는 이미 파싱한 트리.
+            inspection_nr (str): 로그에 남길 Inspection Nr.
+
+        Returns:
+            Dict[str, Any]: 필드, 테이블, Investigation Summary 순서의 결과.
+
+        Raises:
+            InspectionPageError: 본문 레이아웃(`div.row-fluid`)이나 필수 필드를 찾을 수 없는 경우.
+        """
+        tree = lxml_html.fromstring(page) if isinstance(page, (str, bytes)) else page
+        if not self._layout(tree):
+            raise InspectionPageError(f"div.row-fluid not found for Inspection Nr: {inspection_nr}")
+        found = self._find_labels(tree)
+
+        # 기본 정보 추출
+        data: Dict[str, Any] = {field.name: self._field(tree, field, found, inspection_nr) for field in self.fields}
+
+        # 테이블 추출 (캡션 → 테이블 요소)
+        tables: Dict[str, lxml_html.HtmlElement] = {}
+        for element in self._captions(tree):
+            tables.setdefault(element_text(element.find("caption")), element)
+        for table in self.tables:
+            if table.caption in tables:
+                data.update(self._table(tables[table.caption], table))
+            else:
+                logger.warning(f"{table.caption} table not found for Inspection Nr: {inspection_nr}")
+
+        # Investigation Summary 추출
+        summary = self._summary(tree)
+        if not summary:
+            logger.warning(f"Investigation Summary not found for Inspection Nr: {inspection_nr}")
+            return data
+        for div in self._summary_rows(summary[0]):
+            text = element_text(div)
+            if ": " in text:
+                text = text.split(": ")
+                data[text[0]] = sanitize_string(text[1])
+            else:
+                data["Investigation Summary Short"] = sanitize_string(text)
+        long = self._summary_long(summary[0])
+        if not long:
+            logger.warning(f"Investigation Summary not found for Inspection Nr: {inspection_nr}")
+            return data
+        data["Investigation Summary Long"] = sanitize_string(element_text(long[0]))
+        data[self.keywords.name] = self._field(tree, self.keywords, found, inspection_nr)
+        return data
+
+
+SPEC = CompiledSpec()
@@ -0,0 +1,196 @@
+"""URL 단위로 원본 응답 HTML을 보관하는 로컬 캐시.
+
+본문은 SHA-256으로 주소를 정해 zstd로 압축해 `blobs/`에 저장하고(같은 본문은 한 번만 저장),
+URL → 본문 해시, 가져온 시각, 마지막 사용 시각은 SQLite 인덱스에 기록합니다.
+TTL이 지난 항목은 조회되지 않으며, 전체 크기가 `max_bytes`를 넘으면 가장 오래 사용되지 않은
+URL부터 지웁니다.
+
+Usage:
+    $ python http_cache.py stats
+    $ python http_cache.py evict --max-bytes 1000000000
+"""
+from typing import Iterator, Optional, Tuple
+import zstandard
+import threading
+import argparse
+import hashlib
+import logging
+import sqlite3
+import time
+import os
+
+# Root
+logger_name = 'http_cache'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DEFAULT_CACHE_DIR = "cache"
+DEFAULT_TTL = 30 * 24 * 60 * 60  # 30일
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GiB (압축 후 크기)
+
+
+class ResponseCache:
+    """URL을 키로 하는 content-addressed 응답 캐시. 여러 스레드에서 함께 사용할 수 있습니다."""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, ttl: Optional[float] = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES, level: int = 10) -> None:
+        """ResponseCache 클래스의 초기화 메서드.
+
+        Args:
+            root (str): 캐시 폴더.
+            ttl (Optional[float]): 항목의 유효 기간(초). None이면 만료되지 않습니다.
+            max_bytes (int): 압축된 본문의 최대 총 크기. 넘으면 LRU 순서로 지웁니다.
+            level (int): zstd 압축 레벨.
+        """
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        # 압축 해제는 잠금 밖에서 하므로, 스레드마다 따로 만듭니다 (zstandard 객체는 스레드 간에 공유할 수 없음).
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY, digest TEXT NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    @property
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.zst")
+
+    def get(self, url: str, max_age: Optional[float] = -1) -> Optional[bytes]:
+        """캐시된 본문을 반환합니다.
+
+        Args:
+            url (str): 요청 URL.
+            max_age (Optional[float]): 허용할 최대 경과 시간(초). 기본값(-1)은 캐시의 TTL을,
+                None은 만료를 무시합니다 (오프라인 재파싱용).
+
+        Returns:
+            Optional[bytes]: 본문. 없거나 만료되었으면 None.
+        """
+        max_age = self.ttl if max_age == -1 else max_age
+        with self._lock:
+            row = self._db.execute("SELECT digest, fetched_at FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None or (max_age is not None and time.time() - row[1] > max_age):
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        try:
+            with open(self._blob_path(row[0]), 'rb') as file:
+                return self._decompressor.decompress(file.read())
+        except (OSError, zstandard.ZstdError) as e:
+            logger.warning(f"Corrupted cache entry for {url}: {e!r}")
+            return None
+
+    def put(self, url: str, body: bytes) -> str:
+        """본문을 저장하고 그 SHA-256 해시를 반환합니다. 같은 본문은 한 번만 저장됩니다."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                compressed = self._compressor.compress(body)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as file:
+                    file.write(compressed)
+                os.replace(tmp_path, path)
+                self._db.execute("INSERT INTO blobs (digest, size) VALUES (?, ?)", (digest, len(compressed)))
+                self._total += len(compressed)
+            self._db.execute("INSERT OR REPLACE INTO responses (url, digest, fetched_at, accessed_at) VALUES (?, ?, ?, ?)", (url, digest, now, now))
+            over_limit = self._total > self.max_bytes
+        if over_limit:
+            self.evict()
+        return digest
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """가장 오래 사용되지 않은 URL부터 지워 총 크기를 `target_bytes`(기본값: `max_bytes`의 90%) 이하로 줄입니다.
+
+        Returns:
+            int: 지운 URL 수.
+        """
+        target_bytes = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        removed = 0
+        with self._lock:
+            while self._total > target_bytes:
+                rows = self._db.execute("SELECT url, digest FROM responses ORDER BY accessed_at LIMIT 256").fetchall()
+                if not rows:
+                    break
+                for url, digest in rows:
+                    self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    removed += 1
+                    if self._db.execute("SELECT 1 FROM responses WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                        size = self._db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                        self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                        self._total -= size[0] if size else 0
+                        try:
+                            os.remove(self._blob_path(digest))
+                        except OSError:
+                            pass
+                    if self._total <= target_bytes:
+                        break
+        logger.debug(f"Evicted {removed} cached responses; {self._total:,} bytes remain")
+        return removed
+
+    def digest(self, url: str) -> Optional[Tuple[str, float]]:
+        """본문을 읽지 않고 캐시된 본문의 SHA-256 해시와 가져온 시각을 반환합니다 (만료 무시).
+
+        Returns:
+            Optional[Tuple[str, float]]: (해시, 가져온 시각). 캐시에 없으면 None.
+        """
+        with self._lock:
+            return self._db.execute("SELECT digest, fetched_at FROM responses WHERE url = ?", (url,)).fetchone()
+
+    def urls(self, prefix: str = "") -> Iterator[Tuple[str, float]]:
+        """`prefix`로 시작하는 캐시된 URL과 가져온 시각을 나열합니다."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, fetched_at FROM responses WHERE url >= ? AND url < ? ORDER BY url", (prefix, prefix + "\uffff")).fetchall()
+        yield from rows
+
+    def stats(self) -> Tuple[int, int, int]:
+        """Returns: (URL 수, 서로 다른 본문 수, 압축된 총 크기)."""
+        with self._lock:
+            urls = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            blobs = self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return urls, blobs, self._total
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def main(root: str, command: str, max_bytes: int) -> None:
+    cache = ResponseCache(root, max_bytes=max_bytes)
+    if command == "evict":
+        cache.evict(max_bytes)
+    urls, blobs, size = cache.stats()
+    logger.info(f"{urls:,} URLs, {blobs:,} distinct bodies, {size:,} bytes compressed")
+    cache.close()
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or shrink the raw response cache')
+    parser.add_argument('command', choices=["stats", "evict"], help='Show cache statistics or evict down to --max-bytes')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, type=str, help='Cache folder')
+    parser.add_argument('--max-bytes', default=DEFAULT_MAX_BYTES, type=int, help='Size limit used by evict')
+    args = parser.parse_args()
+
+    main(args.cache_dir, args.command, args.max_bytes)
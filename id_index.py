@@ -0,0 +1,203 @@
+"""Summary Nr ↔ Inspection Nr 매핑을 저장하는 SQLite 인덱스.
+
+여러 사고 요약(Summary Nr)이 하나의 점검(Inspection Nr)을 가리키는 경우가 많으므로, 매핑을 한 곳에
+양방향으로 보관해 상세 정보 수집 전에 Inspection Nr을 중복 없이 뽑고, 각 점검이 어떤 Summary Nr들을
+포함하는지 기록합니다. 두 방향 모두 인덱스로 조회하며, 같은 Summary Nr을 다시 넣으면 새 값으로 바뀝니다.
+
+Usage:
+    >>> from id_index import IdIndex
+    >>> index = IdIndex("inspection-nrs/id_index.sqlite")
+    >>> index.import_files(["inspection-nrs/Inspection_Nrs(0~1000).txt"])
+    >>> index.summary_nrs("1716316.015")
+
+    $ python id_index.py import inspection-nrs/Inspection_Nrs*.txt
+    $ python id_index.py export "inspection-nrs/Inspection Nrs.txt"
+    $ python id_index.py lookup 164402.015 1716316.015
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import threading
+import argparse
+import logging
+import sqlite3
+import os
+
+# Root
+logger_name = 'id_index'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DEFAULT_INDEX = "inspection-nrs/id_index.sqlite"
+
+
+def parse_mapping_lines(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """`summary_nr: inspection_nr` 형식의 줄에서 (Summary Nr, Inspection Nr)을 꺼냅니다. 형식이 다른 줄은 건너뜁니다."""
+    for line in lines:
+        summary_nr, sep, inspection_nr = line.strip().partition(': ')
+        if sep and summary_nr and inspection_nr:
+            yield summary_nr, inspection_nr
+
+
+class IdIndex:
+    """Summary Nr ↔ Inspection Nr 양방향 매핑. 여러 스레드/프로세스에서 함께 사용할 수 있습니다."""
+
+    def __init__(self, path: str = DEFAULT_INDEX) -> None:
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db
+        # summary_nr → inspection_nr은 기본 키로, inspection_nr → summary_nr은 보조 인덱스로 조회합니다.
+        # seq는 처음 들어온 순서이며 중복 없는 Inspection Nr 목록의 순서를 정합니다.
+        db.execute("""CREATE TABLE IF NOT EXISTS links (
+            summary_nr TEXT PRIMARY KEY,
+            inspection_nr TEXT NOT NULL,
+            seq INTEGER NOT NULL) WITHOUT ROWID""")
+        db.execute("CREATE INDEX IF NOT EXISTS links_inspection_nr ON links (inspection_nr, seq)")
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않으므로 스레드마다 따로 엽니다.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def add(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """(Summary Nr, Inspection Nr) 쌍들을 한 트랜잭션으로 넣습니다.
+
+        이미 있는 Summary Nr의 Inspection Nr이 다르면 새 값으로 바꾸고, 같으면 그대로 둡니다(순서 유지).
+
+        Returns:
+            int: 새로 추가되거나 바뀐 Summary Nr 수.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            start = db.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM links").fetchone()[0]
+            before = db.total_changes
+            db.executemany(
+                """INSERT INTO links (summary_nr, inspection_nr, seq) VALUES (?, ?, ?)
+                ON CONFLICT(summary_nr) DO UPDATE SET inspection_nr = excluded.inspection_nr
+                WHERE inspection_nr != excluded.inspection_nr""",
+                ((summary_nr, inspection_nr, start + i) for i, (summary_nr, inspection_nr) in enumerate(pairs)),
+            )
+            changed = db.total_changes - before
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return changed
+
+    def import_files(self, paths: Iterable[str]) -> int:
+        """`summary_nr: inspection_nr` 형식의 텍스트 파일들을 읽어 넣습니다.
+
+        Returns:
+            int: 새로 추가되거나 바뀐 Summary Nr 수.
+        """
+        changed = 0
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as file:
+                changed += self.add(parse_mapping_lines(file))
+        return changed
+
+    def inspection_nr(self, summary_nr: str) -> Optional[str]:
+        """Summary Nr이 가리키는 Inspection Nr. 없으면 None."""
+        row = self._db.execute("SELECT inspection_nr FROM links WHERE summary_nr = ?", (summary_nr,)).fetchone()
+        return row[0] if row else None
+
+    def summary_nrs(self, inspection_nr: str) -> List[str]:
+        """Inspection Nr 하나가 포함하는 Summary Nr들 (들어온 순서)."""
+        return [nr for nr, in self._db.execute("SELECT summary_nr FROM links WHERE inspection_nr = ? ORDER BY seq", (inspection_nr,))]
+
+    def resolved(self, summary_nrs: Iterable[str]) -> Dict[str, str]:
+        """이미 매핑을 아는 Summary Nr → Inspection Nr (요청하지 않아도 되는 ID)."""
+        db = self._db
+        found: Dict[str, str] = {}
+        for summary_nr in summary_nrs:
+            row = db.execute("SELECT inspection_nr FROM links WHERE summary_nr = ?", (summary_nr,)).fetchone()
+            if row:
+                found[summary_nr] = row[0]
+        return found
+
+    def inspection_nrs(self) -> List[str]:
+        """중복 없는 Inspection Nr 목록. 처음 나타난 순서를 따릅니다."""
+        return [nr for nr, in self._db.execute("SELECT inspection_nr FROM links GROUP BY inspection_nr ORDER BY MIN(seq)")]
+
+    def coverage(self) -> Iterator[Tuple[str, List[str]]]:
+        """(Inspection Nr, 그 점검이 포함하는 Summary Nr들)을 Inspection Nr 순서로 나열합니다."""
+        current: Optional[str] = None
+        summary_nrs: List[str] = []
+        for inspection_nr, summary_nr in self._db.execute("SELECT inspection_nr, summary_nr FROM links ORDER BY inspection_nr, seq"):
+            if inspection_nr != current:
+                if current is not None:
+                    yield current, summary_nrs
+                current, summary_nrs = inspection_nr, []
+            summary_nrs.append(summary_nr)
+        if current is not None:
+            yield current, summary_nrs
+
+    def counts(self) -> Tuple[int, int]:
+        """Returns: (Summary Nr 수, 서로 다른 Inspection Nr 수)."""
+        return self._db.execute("SELECT COUNT(*), COUNT(DISTINCT inspection_nr) FROM links").fetchone()
+
+    def export(self, path: str) -> int:
+        """중복 없는 Inspection Nr을 한 줄에 하나씩 `path`에 씁니다 (`inspection_detail.py`의 입력 형식).
+
+        Returns:
+            int: 쓴 Inspection Nr 수.
+        """
+        inspection_nrs = self.inspection_nrs()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(f"{nr}\n" for nr in inspection_nrs)
+        return len(inspection_nrs)
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def main(args: argparse.Namespace) -> None:
+    index = IdIndex(args.index)
+    if args.command == "import":
+        changed = index.import_files(args.paths)
+        logger.info(f"Imported {changed:,} new or changed Summary Nrs from {len(args.paths)} files")
+    elif args.command == "export":
+        for path in args.paths:
+            logger.info(f"Wrote {index.export(path):,} unique Inspection Nrs to {path}")
+    elif args.command == "lookup":
+        for nr in args.paths:
+            inspection_nr = index.inspection_nr(nr)
+            summary_nrs = index.summary_nrs(nr)
+            if inspection_nr:
+                print(f"Summary Nr {nr} -> Inspection Nr {inspection_nr}")
+            if summary_nrs:
+                print(f"Inspection Nr {nr} <- Summary Nrs {', '.join(summary_nrs)}")
+            if not inspection_nr and not summary_nrs:
+                print(f"{nr}: not found")
+    summary_count, inspection_count = index.counts()
+    logger.info(f"{summary_count:,} Summary Nrs -> {inspection_count:,} unique Inspection Nrs ({summary_count - inspection_count:,} duplicate detail fetches avoided)")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bidirectional Summary Nr <-> Inspection Nr index')
+    parser.add_argument('command', choices=["import", "export", "lookup", "stats"], help='import mapping files, export unique Inspection Nrs, look up Nrs, or show counts')
+    parser.add_argument('paths', nargs="*", help='Mapping files (import), output files (export) or Nrs (lookup)')
+    parser.add_argument('--index', type=str, default=DEFAULT_INDEX, help='Path to the index SQLite file')
+    args = parser.parse_args()
+
+    main(args)
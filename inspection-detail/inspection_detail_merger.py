@@ -1,16 +1,30 @@
-from typing import Dict, List, Optional, Union
+# Internal Modules
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from output_sinks import normalize_records
+from records import SCHEMAS
+from normalize import normalize_tables, summarize_failures
+from excel_export import export_dataset
+# External Modules
+from typing import Any, Dict, List, Optional, Set, Union
 from tqdm import tqdm
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow as pa
 import pandas as pd
+import hashlib
 import logging
+import pickle
+import json
+import glob
 import fire
-import os
 
 # Root 
 logger_name = 'inspection_detail_merger'
 logger = logging.getLogger(logger_name)
 logger.setLevel(logging.DEBUG)
 # File Handler
-file_handler = logging.FileHandler(f'../logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
 file_handler.setLevel(logging.DEBUG)
 file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
 logger.addHandler(file_handler)
@@ -86,12 +100,241 @@ class FileChunk:
             return all_files
 
 
-def main(folder: Optional[str] = "./", ext: Optional[Union[str, List[str]]] = "xlsx", output: Optional[str] = "../output") -> None:
-    df_list: List[pd.DataFrame] = []
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """파일 내용의 SHA-256 해시."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parquet_part_paths(path: str) -> Dict[str, str]:
+    """`ParquetSink` 파트의 `inspections` 파일 경로(`parquet/inspections/<이름>.parquet`)로 네 테이블의 파일 경로를 찾습니다."""
+    root, name = os.path.dirname(os.path.dirname(path)), os.path.basename(path)
+    return {table: os.path.join(root, table, name) for table in SCHEMAS}
+
+
+def part_digest(path: str) -> str:
+    """파트의 SHA-256 해시. Parquet 파트는 네 테이블 파일을 함께 해시합니다."""
+    if not path.endswith('.parquet'):
+        return file_digest(path)
+    digest = hashlib.sha256()
+    for table, table_path in parquet_part_paths(path).items():
+        if os.path.exists(table_path):
+            digest.update(f"{table}:{file_digest(table_path)}".encode())
+    return digest.hexdigest()
+
+
+def is_long_workbook(path: str) -> bool:
+    """`xlsx-long`(`StreamingExcelSink`, `excel_export`)처럼 테이블별 시트로 나뉜 통합 문서인지 여부."""
+    return len(pd.ExcelFile(path).sheet_names) > 1
+
+
+def load_part(path: str) -> Dict[str, pa.Table]:
+    """파트 파일 하나(`.parquet`, `.xlsx` 또는 `.pkl`)를 읽어 정규화된 테이블들로 변환합니다.
+
+    `.parquet`는 `ParquetSink`가 이미 정규화해 둔 테이블을 그대로 읽습니다 (파일이 없는 테이블은 빈 테이블).
+    넓은 형식 파일 안에 같은 Inspection Nr이 여러 번 있으면 마지막 행만 남깁니다.
+    """
+    if path.endswith('.parquet'):
+        return {
+            table: pq.read_table(table_path).cast(SCHEMAS[table]) if os.path.exists(table_path) else SCHEMAS[table].empty_table()
+            for table, table_path in parquet_part_paths(path).items()
+        }
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as file:
+            rows = pickle.load(file)
+    else:
+        rows = pd.read_excel(path, dtype=str).to_dict('records')
+    records: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        record = {key: str(value) for key, value in row.items() if isinstance(value, str) or not pd.isna(value)}
+        if record.get("Inspection Nr"):
+            records.pop(record["Inspection Nr"], None)
+            records[record["Inspection Nr"]] = record
+    return normalize_records(list(records.values()))
+
+
+class MergedStore:
+    """파트 파일들을 Inspection Nr 기준으로 중복 제거해 정규화된 Parquet 데이터셋으로 유지하는 저장소.
+
+    `root` 아래 구성:
+        - `manifest.json`: 원본 파일별 mtime/크기/해시, 파트별 mtime, Inspection Nr별 포함 파트 목록.
+        - `staging/<해시>/<table>.parquet`: 원본 파트를 그대로 변환한 사본 (다시 읽지 않기 위함).
+        - `<table>/<해시>.parquet`: 각 파트에서 그 파트가 "최신"인 Inspection Nr의 행만 남긴 결과.
+            날짜, 금액, SIC/NAICS 등은 `normalize.TYPED_SCHEMAS`의 타입으로 변환되어 있으며,
+            `pd.read_parquet(f"{root}/<table>")`로 중복 없는 전체 데이터를 읽을 수 있습니다.
+        - `parse_failures/<해시>.parquet`: 그 파트에서 타입으로 변환하지 못한 값들 (`normalize.FAILURE_SCHEMA`).
+
+    같은 Inspection Nr이 여러 파트에 있으면 mtime이 가장 늦은 파트(가장 최근 수집)의 행이 남습니다.
+    한 번에 하나의 파트만 메모리에 올립니다.
+    """
+
+    # 저장소 파트 형식이 바뀌면 올립니다. 이전 형식의 저장소는 다음 `update`에서 모든 파트를 다시 씁니다.
+    VERSION = 2
+
+    def __init__(self, root: str) -> None:
+        """MergedStore 클래스의 초기화 메서드.
+
+        Args:
+            root (str): 저장소 폴더.
+        """
+        self.root = root
+        self._manifest_path = os.path.join(root, "manifest.json")
+        manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        self.files: Dict[str, Dict[str, Any]] = manifest.get("files", {})
+        self.parts: Dict[str, float] = manifest.get("parts", {})
+        self.keys: Dict[str, List[str]] = manifest.get("keys", {})
+        self._outdated = manifest.get("version", 1) != self.VERSION
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": self.VERSION, "files": self.files, "parts": self.parts, "keys": self.keys}, file)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _staging_path(self, digest: str, table: str) -> str:
+        return os.path.join(self.root, "staging", digest, f"{table}.parquet")
+
+    def _store_path(self, digest: str, table: str) -> str:
+        return os.path.join(self.root, table, f"{digest}.parquet")
+
+    def _failures_path(self, digest: str) -> str:
+        return os.path.join(self.root, "parse_failures", f"{digest}.parquet")
+
+    def _owner(self, inspection_nr: str) -> Optional[str]:
+        digests = self.keys.get(inspection_nr)
+        return max(digests, key=lambda digest: (self.parts[digest], digest)) if digests else None
+
+    def _ingest(self, digest: str, path: str, mtime: float) -> Set[str]:
+        tables = load_part(path)
+        for table, data in tables.items():
+            staging_path = self._staging_path(digest, table)
+            os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+            pq.write_table(data, staging_path, compression="zstd")
+        self.parts[digest] = mtime
+        nrs = set(tables["inspections"].column("Inspection Nr").to_pylist())
+        for nr in nrs:
+            self.keys.setdefault(nr, []).append(digest)
+        return nrs
+
+    def _drop(self, digest: str) -> Set[str]:
+        nrs = set()
+        for nr in pq.read_table(self._staging_path(digest, "inspections"), columns=["Inspection Nr"]).column("Inspection Nr").to_pylist():
+            self.keys[nr].remove(digest)
+            if not self.keys[nr]:
+                del self.keys[nr]
+            nrs.add(nr)
+        for path in [self._failures_path(digest)] + [path for table in SCHEMAS for path in (self._staging_path(digest, table), self._store_path(digest, table))]:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(os.path.join(self.root, "staging", digest))
+        del self.parts[digest]
+        return nrs
+
+    def _materialize(self, digest: str) -> None:
+        # 스테이징 사본에서 이 파트가 최신인 Inspection Nr의 행만 골라 타입을 변환한 뒤 저장소 파트를 다시 씁니다.
+        owned = pa.array([nr for nr in pq.read_table(self._staging_path(digest, "inspections"), columns=["Inspection Nr"]).column("Inspection Nr").to_pylist() if self._owner(nr) == digest], type=pa.string())
+        tables = {}
+        for table in SCHEMAS:
+            data = pq.read_table(self._staging_path(digest, table))
+            tables[table] = data.filter(pc.is_in(data.column("Inspection Nr"), value_set=owned))
+        typed, failures = normalize_tables(tables)
+        for table, data in typed.items():
+            store_path = self._store_path(digest, table)
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            pq.write_table(data, f"{store_path}.tmp", compression="zstd")
+            os.replace(f"{store_path}.tmp", store_path)
+        failures_path = self._failures_path(digest)
+        os.makedirs(os.path.dirname(failures_path), exist_ok=True)
+        pq.write_table(failures, f"{failures_path}.tmp", compression="zstd")
+        os.replace(f"{failures_path}.tmp", failures_path)
+        for line in summarize_failures(failures):
+            logger.warning(f"Unparsed values in part {digest[:16]}: {line}")
+
+    def update(self, paths: List[str]) -> int:
+        """원본 파트 파일 목록과 저장소를 맞춥니다. 새로 생겼거나 바뀐 파일만 다시 읽습니다.
+
+        Args:
+            paths (List[str]): 원본 파트 파일 경로 목록. 목록에서 빠진 파일의 행은 저장소에서 제거됩니다.
+
+        Returns:
+            int: 다시 읽은 파일 수.
+        """
+        touched: Set[str] = set()  # 소유 파트가 바뀌었을 수 있는 Inspection Nr
+        ingested = 0
+        current = {os.path.abspath(path): path for path in paths}
+        # 사라지거나 바뀐 파일의 파트를 먼저 제거합니다.
+        for key in list(self.files):
+            entry = self.files[key]
+            path = current.get(key)
+            if path is not None:
+                stat = os.stat(path)
+                if (stat.st_mtime, stat.st_size) == (entry["mtime"], entry["size"]):
+                    continue
+                digest = part_digest(path)
+                if digest == entry["digest"]:
+                    entry.update(mtime=stat.st_mtime, size=stat.st_size)
+                    continue
+            del self.files[key]
+            if not any(other["digest"] == entry["digest"] for other in self.files.values()):
+                touched |= self._drop(entry["digest"])
+        # 새 파일(또는 바뀐 파일)을 mtime 순서로 읽어들입니다.
+        new_paths = sorted((path for key, path in current.items() if key not in self.files), key=os.path.getmtime)
+        for path in tqdm(new_paths):
+            stat = os.stat(path)
+            digest = part_digest(path)
+            self.files[os.path.abspath(path)] = {"mtime": stat.st_mtime, "size": stat.st_size, "digest": digest}
+            if digest not in self.parts:
+                touched |= self._ingest(digest, path, stat.st_mtime)
+                ingested += 1
+            else:
+                logger.info(f"{path} has the same content as an ingested part; skipping")
+            self._save_manifest()
+        # 소유 관계가 바뀌었을 수 있는 파트들만 다시 씁니다 (이전 소유 파트 포함).
+        affected = {digest for nr in touched for digest in self.keys.get(nr, [])}
+        if self._outdated:
+            affected = set(self.parts)
+            self._outdated = False
+        for digest in tqdm(sorted(affected)):
+            self._materialize(digest)
+        self._save_manifest()
+        logger.info(f"Ingested {ingested} part files, rewrote {len(affected)} store parts; {len(self.keys):,} unique Inspection Nrs")
+        return ingested
+
+
+def main(folder: Optional[str] = "inspection-detail", ext: Optional[Union[str, List[str]]] = None, output: Optional[str] = "output", excel: Optional[str] = None, excel_max_rows: Optional[int] = None) -> None:
+    """`folder`의 파트 파일들을 `output/merged`의 중복 없는 Parquet 데이터셋으로 증분 병합합니다.
+
+    Args:
+        folder (Optional[str]): 파트 파일이 있는 폴더 (`inspection_detail.py`의 출력 폴더). Parquet 파트는
+            `folder/parquet/<table>/Inspection_Detail(...).parquet`, 넓은 형식 파트는 `folder/Inspection_Detail(...).xlsx` 등.
+        ext (Optional[Union[str, List[str]]]): 병합할 형식 (`parquet`, `xlsx`, `pkl`). 기본값은 `parquet`와 `xlsx`.
+            테이블별 시트로 나뉜 `xlsx-long` 통합 문서는 건너뜁니다.
+        output (Optional[str]): 결과 폴더. `merged/` 아래에 저장소가 만들어집니다.
+        excel (Optional[str]): 주어지면 병합 결과를 이 경로의 `.xlsx`로도 내보냅니다 (테이블별 긴 형식 시트, `excel_export`).
+        excel_max_rows (Optional[int]): `.xlsx` 파일 하나의 최대 데이터 행 수. 넘으면 `(2)`, `(3)`, ... 파일로 이어 씁니다.
+    """
+    exts = [ext] if isinstance(ext, str) else list(ext or ["parquet", "xlsx"])
     file_chunks: FileChunk = FileChunk(os.listdir(folder))
-    for file in tqdm(file_chunks(ext)):
-        df_list.append(pd.read_excel(os.path.join(folder, file)))
-    pd.concat(df_list, ignore_index=True).to_excel(os.path.join(output, "Inspection_Details.xlsx"), index=False)
+    # `xlsx/`, `pkls/`처럼 확장자와 이름이 같은 폴더는 건너뜁니다.
+    paths = [path for e in exts if e != "parquet" for path in (os.path.join(folder, file) for file in file_chunks(e)) if os.path.isfile(path)]
+    long_workbooks = [path for path in paths if path.endswith('.xlsx') and is_long_workbook(path)]
+    for path in long_workbooks:
+        logger.warning(f"Skipping {path}: long-format workbooks (xlsx-long) are not merge parts")
+    paths = [path for path in paths if path not in long_workbooks]
+    if "parquet" in exts:
+        # Parquet 파트는 `inspections` 파일 하나로 대표합니다.
+        paths += sorted(glob.glob(os.path.join(folder, "parquet", "inspections", "*.parquet")))
+    store = MergedStore(os.path.join(output, "merged"))
+    store.update(paths)
+    if excel:
+        export_dataset(store.root, excel, max_file_rows=excel_max_rows)
 
 # Main
 if __name__ == '__main__':
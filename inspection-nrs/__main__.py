@@ -1,25 +1,35 @@
-from typing import List
+"""이 폴더의 `id: inspection_nr` 파일들을 ID 인덱스에 모으고 중복 없는 `Inspection Nrs.txt`를 만듭니다.
+
+여러 Summary Nr이 같은 Inspection Nr을 가리키므로, 줄을 그대로 이어 붙이면 같은 점검을 여러 번 수집하게
+되고 Summary Nr과의 관계도 사라집니다. 대신 `id_index.sqlite`에 매핑을 보관하고 Inspection Nr은 한 번씩만
+씁니다.
+
+Usage:
+    $ python inspection-nrs
+"""
 from tqdm import tqdm
+import sys
 import os
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_index import IdIndex
+
 
-def bootstrap_inspection_nrs(file: str) -> List[str]:
-    with open(file, 'r', encoding='utf-8') as f:
-        lines: List[str] = f.readlines()
-    return [line.split(': ')[-1] for line in lines]
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = "Inspection Nrs.txt"
 
-def save2file(file: str, context: List[str]) -> None:
-    with open(file, 'w', encoding='utf-8') as f:
-        f.writelines(context)
-    return None
 
 def main() -> None:
-    lines: List[str] = []
-    for file in tqdm(os.listdir('./')):
-        file_path = os.path.join('./', file)
-        if os.path.isfile(file_path):  # Only process files, not directories
-            lines.extend(bootstrap_inspection_nrs(file_path))
-    save2file("./Inspection Nrs.txt", lines)
+    index = IdIndex(os.path.join(FOLDER, "id_index.sqlite"))
+    for file in tqdm(sorted(os.listdir(FOLDER))):
+        file_path = os.path.join(FOLDER, file)
+        # 결과 파일과 이 스크립트는 매핑 파일이 아니므로 건너뜁니다.
+        if os.path.isfile(file_path) and file.endswith('.txt') and file != OUTPUT_FILE:
+            index.import_files([file_path])
+    count = index.export(os.path.join(FOLDER, OUTPUT_FILE))
+    summary_count, _ = index.counts()
+    print(f"{summary_count:,} Summary Nrs -> {count:,} unique Inspection Nrs")
 
 # Main
 if __name__ == '__main__':
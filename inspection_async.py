@@ -0,0 +1,116 @@
+# Internal Modules
+from utils import ACCIDENT_DETAIL_PATH, HEADERS, OSHA_BASE_URL, parse_inspection_nr
+from rate_limit import AdaptiveRateController, backoff_delay
+from http_cache import ResponseCache
+from metrics import count, log_sampled, observe
+# External Modules
+from tqdm import tqdm
+from typing import Dict, List, Optional, Set
+import aiohttp
+import asyncio
+import logging
+import time
+import os
+
+# Root
+logger_name = 'inspection_async'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+
+def read_done_ids(output_file: str) -> Set[str]:
+    """이전 실행에서 이미 기록된 Summary Nr들을 읽어옵니다 (`id: inspection_nr` 형식)."""
+    if not os.path.exists(output_file):
+        return set()
+    with open(output_file, 'r', encoding='utf-8') as file:
+        return {line.split(': ')[0] for line in file.read().splitlines() if ': ' in line}
+
+
+async def fetch_inspection_nr_async(session: aiohttp.ClientSession, id: str, bucket: AdaptiveRateController, base_url: str = OSHA_BASE_URL, retry_count: int = 3, cache: Optional[ResponseCache] = None) -> Optional[str]:
+    """하나의 Summary Nr에 대한 accident_detail 페이지를 가져와 Inspection Nr을 반환합니다."""
+    url = f"{base_url}{ACCIDENT_DETAIL_PATH}"
+    for attempt in range(retry_count):
+        await bucket.acquire_async()
+        started = time.perf_counter()
+        try:
+            async with session.get(url, params={"id": id}) as response:
+                ttfb = time.perf_counter() - started
+                observe("osha_request_seconds", ttfb, page="accident_detail", phase="ttfb")
+                count("osha_requests_total", page="accident_detail", status=response.status)
+                bucket.record(response.status, ttfb, response.headers.get("Retry-After"))
+                if response.status == 200:
+                    body = await response.read()
+                    observe("osha_request_seconds", time.perf_counter() - started - ttfb, page="accident_detail", phase="download")
+                    if cache:
+                        cache.put(str(response.url), body)
+                    return parse_inspection_nr(body.decode(response.get_encoding(), errors="replace"))
+                logger.warning(f"Status code {response.status} for ID: {id} ({attempt + 1}/{retry_count})")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            count("osha_requests_total", page="accident_detail", status="error")
+            bucket.record(None, time.perf_counter() - started)
+            logger.warning(f"Request failed for ID: {id} ({attempt + 1}/{retry_count}): {e!r}")
+        if attempt + 1 < retry_count:
+            await asyncio.sleep(backoff_delay(attempt))
+    return None
+
+
+async def _run(ids: List[str], output_file: str, concurrency: int, rate: float, base_url: str, cache: Optional[ResponseCache], max_rate: Optional[float] = None) -> Dict[str, str]:
+    bucket = AdaptiveRateController(rate, max_rate=max_rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, str] = {}
+    # 동시 요청 수만큼 keep-alive 커넥션을 유지합니다.
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        async def worker(id: str) -> None:
+            async with semaphore:
+                inspection_nr = await fetch_inspection_nr_async(session, id, bucket, base_url, cache=cache)
+            if inspection_nr:
+                results[id] = inspection_nr
+                # 완료되는 대로 바로 디스크에 기록합니다.
+                file.write(f"{id}: {inspection_nr}\n")
+                file.flush()
+                log_sampled(logger, "resolved", id=id, inspection_nr=inspection_nr)
+            else:
+                logger.error(f"ID: {id}, Inspection Nr not found or error occurred")
+            progress.update()
+
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(output_file, 'a', encoding='utf-8') as file, tqdm(total=len(ids)) as progress:
+            await asyncio.gather(*(worker(id) for id in ids))
+    logger.info(f"Rate controller: {bucket.stats()}")
+    return results
+
+
+def fetch_inspection_nrs_async(ids: List[str], output_file: str, concurrency: int = 8, rate: float = 2.0, base_url: str = OSHA_BASE_URL, cache: Optional[ResponseCache] = None, max_rate: Optional[float] = None) -> Dict[str, str]:
+    """Summary Nr 목록을 비동기로 조회하여 `output_file`에 `id: inspection_nr` 형식으로 스트리밍합니다.
+
+    이미 `output_file`에 기록된 ID는 건너뛰므로 중단된 실행을 그대로 이어갈 수 있습니다.
+
+    Args:
+        ids (List[str]): 조회할 Summary Nr 목록.
+        output_file (str): 결과를 덧붙여 쓸 파일.
+        concurrency (int): 동시에 진행할 최대 요청 수 (커넥션 풀 크기).
+        rate (float): 모든 요청이 공유하는 시작 초당 요청 수. 서버 응답(429/5xx, 지연 시간)에 따라 조절됩니다.
+        base_url (str): 요청할 서버 주소. 스텁 서버로 시험할 때 바꿉니다.
+        cache (Optional[ResponseCache]): 원본 응답을 기록할 캐시.
+        max_rate (Optional[float]): 조절되는 속도의 상한. 기본값은 `rate`의 4배.
+
+    Returns:
+        Dict[str, str]: 이번 실행에서 새로 얻은 Summary Nr → Inspection Nr.
+    """
+    done = read_done_ids(output_file)
+    pending = [id for id in ids if id not in done]
+    logger.info(f"{len(done)} IDs already done, {len(pending)} to fetch")
+    return asyncio.run(_run(pending, output_file, concurrency, rate, base_url, cache, max_rate))
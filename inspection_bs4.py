@@ -1,10 +1,12 @@
 # Internal Modules
-from utils import read_ids_from_file, fetch_inspection_nr
+from utils import OSHA_BASE_URL, BatchSizeTuner, read_ids_from_file, fetch_inspection_nrs
+from rate_limit import AdaptiveRateController
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from inspection_async import fetch_inspection_nrs_async, read_done_ids
+from metrics import METRICS, log_sampled
 # External Modules
-from time import sleep
-from random import uniform
 from tqdm import tqdm
-from typing import List
+from typing import Dict, List, Optional
 import argparse
 import logging
 import os
@@ -12,6 +14,16 @@ import os
 
 parser = argparse.ArgumentParser(description='files')
 parser.add_argument('--file', '-F', type=str, default="Summary_Nrs.txt", help='Path to file')  # , required=True)
+parser.add_argument('--mode', '-M', choices=["sync", "async", "batch"], default="sync", help='Fetch sequentially, concurrently with asyncio, or many IDs per request')
+parser.add_argument('--output', '-O', type=str, default=None, help='File the async/batch modes stream `id: inspection_nr` lines to')
+parser.add_argument('--batch-size', '-K', type=int, default=25, help='Initial number of IDs per request in batch mode (auto-tuned)')
+parser.add_argument('--concurrency', '-C', type=int, default=8, help='Maximum concurrent requests in async mode')
+parser.add_argument('--rate', '-R', type=float, default=None, help='Initial request rate (requests/sec), adapted to server responses (default: 0.5 in sync mode, 2 otherwise)')
+parser.add_argument('--max-rate', type=float, default=None, help='Upper bound of the adaptive request rate (default: 4x --rate)')
+parser.add_argument('--base-url', type=str, default=OSHA_BASE_URL, help='Server to query (e.g. a local stub_server.py)')
+parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the raw HTML response cache')
+parser.add_argument('--no-cache', action='store_true', help='Do not write raw responses to the cache')
+parser.add_argument('--metrics-file', type=str, default=None, help='Write per-phase timings and counters to this Prometheus text file at the end of the run')
 args = parser.parse_args()
 
 # Root 
@@ -29,21 +41,50 @@ stream_handler.setLevel(logging.INFO)
 stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
 logger.addHandler(stream_handler)
 
-def main() -> None:
-    ids = read_ids_from_file(args.file)
+def batch_main(ids: List[str], output_file: str, cache: Optional[ResponseCache] = None) -> Dict[str, str]:
+    # 이미 기록된 ID는 건너뛰고, 완료되는 대로 `id: inspection_nr` 형식으로 덧붙입니다.
+    done = read_done_ids(output_file)
+    pending = [id for id in ids if id not in done]
+    results = {}
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, 'a', encoding='utf-8') as file:
+        fetched = fetch_inspection_nrs(pending, tuner=BatchSizeTuner(args.batch_size), bucket=AdaptiveRateController(args.rate or 2.0, max_rate=args.max_rate), base_url=args.base_url, cache=cache)
+        for id, inspection_nr in tqdm(fetched, total=len(pending)):
+            if inspection_nr:
+                results[id] = inspection_nr
+                file.write(f"{id}: {inspection_nr}\n")
+                file.flush()
+            else:
+                logger.error(f"ID: {id}, Inspection Nr not found or error occurred")
+    return results
+
+def fetch(ids: List[str]) -> Dict[str, str]:
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    if args.mode == "async":
+        return fetch_inspection_nrs_async(ids, args.output or "inspection-nrs/Inspection_Nrs(async).txt", args.concurrency, args.rate or 2.0, args.base_url, cache, args.max_rate)
+    if args.mode == "batch":
+        return batch_main(ids, args.output or "inspection-nrs/Inspection_Nrs(batch).txt", cache)
     results = {}
-    
-    for id in tqdm(ids):
-        inspection_nr = fetch_inspection_nr(id)
+
+    # 한 번에 ID 하나씩 요청하되, 요청 간격은 고정된 무작위 지연 대신 서버 응답에 맞춰 조절합니다.
+    controller = AdaptiveRateController(args.rate or 0.5, max_rate=args.max_rate)
+    fetched = fetch_inspection_nrs(ids, tuner=BatchSizeTuner(1, max_size=1), bucket=controller, base_url=args.base_url, cache=cache)
+    for id, inspection_nr in tqdm(fetched, total=len(ids)):
         if inspection_nr:
             results[id] = inspection_nr
-            logger.debug(f"ID: {id}, Inspection Nr: {inspection_nr}")
+            log_sampled(logger, "resolved", id=id, inspection_nr=inspection_nr)
         else:
             logger.error(f"ID: {id}, Inspection Nr not found or error occurred")
-        # 각 요청 사이에 랜덤한 지연을 추가합니다.
-        sleep(uniform(1, 3))
     return results
 
+def main() -> None:
+    try:
+        return fetch(read_ids_from_file(args.file))
+    finally:
+        logger.info(METRICS.summary())
+        if args.metrics_file:
+            METRICS.write_textfile(args.metrics_file)
+
 # Main
 if __name__ == '__main__':
     main()
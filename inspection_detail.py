@@ -1,19 +1,33 @@
+# Internal Modules
+from utils import INSPECTION_DETAIL_PATH, OSHA_BASE_URL
+from extraction_spec import SPEC
+from inspection_http import OSHAHttpScraper, ReplayScraper, parse_page
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from driver_pool import PROFILES, DriverPool
+from work_ledger import WorkLedger
+from id_index import DEFAULT_INDEX, IdIndex
+from output_sinks import OutputSink, SINKS, create_sinks, export_batches
+from rate_limit import AdaptiveRateController, backoff_delay
+from metrics import METRICS, count, log_sampled, observe, timer
+# External Modules
 import logging
 import os
 import time
 import pandas as pd
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import multiprocessing
+import threading
 import argparse
-import re
-import pickle
 
 # Logger 설정
 logger_name = 'inspection_detail'
@@ -32,274 +46,377 @@ stream_handler.setLevel(logging.INFO)
 stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
 logger.addHandler(stream_handler)
 
-def sanitize_string(input_string: str) -> str:
-    """Remove illegal characters for Excel and control characters."""
-    illegal_characters = re.compile(r'[\x00-\x1F\x7F-\x9F]')
-    return illegal_characters.sub("", input_string)
-
 class OSHAWebScraper:
-    def __init__(self, driver_service: Service, chrome_options: Options, retry_count: int = 3) -> None:
+    def __init__(self, driver_service: Service, chrome_options: Options, retry_count: int = 3, pool: Optional[DriverPool] = None, cache: Optional[ResponseCache] = None, limiter: Optional[Any] = None, base_url: str = OSHA_BASE_URL) -> None:
         self.driver_service = driver_service
         self.chrome_options = chrome_options
         self.retry_count = retry_count
-
-    def _start_driver(self) -> webdriver.Chrome:
-        return webdriver.Chrome(service=self.driver_service, options=self.chrome_options)
-
-    def _extract_text(self, driver: webdriver.Chrome, name: str, xpath: str, transform: bool = False) -> Dict[str, str]:
-        try:
-            text = driver.find_element(By.XPATH, xpath).text
-            if transform:
-                text = text.replace("\n", ", ")
-            return {name: sanitize_string(text.split(": ")[1] if ": " in text else text.split(":")[1] if ":" in text else text)}
-        except Exception as e:
-            logger.error(e)
-            logger.warning(f"Failed to extract {name} using xpath: {xpath}")
-            return {name: ''}
+        self.cache = cache
+        self.base_url = base_url
+        # 페이지를 열기 전마다 `limiter.acquire()`로 전체 요청 속도를 맞추고, 결과를 `limiter.record()`로 알립니다.
+        self.limiter = limiter
+        # 레코드마다 Chrome을 새로 띄우지 않도록 드라이버 풀을 재사용합니다.
+        self.pool = pool or DriverPool(driver_service, chrome_options)
 
     def _retry_get(self, driver: webdriver.Chrome, url: str):
         for attempt in range(self.retry_count):
+            if self.limiter:
+                self.limiter.acquire()
+            started = time.perf_counter()
             try:
-                driver.get(url)
-                return True
+                with timer("osha_driver_seconds", phase="load"):
+                    driver.get(url)
             except Exception as e:
+                # 브라우저로는 상태 코드를 알 수 없으므로 페이지를 열지 못한 경우만 실패로 알립니다.
+                if self.limiter:
+                    self.limiter.record(None, time.perf_counter() - started)
                 logger.warning(f"Retrying ({attempt + 1}/{self.retry_count}) to load URL: {url}")
-                time.sleep(2)
+                time.sleep(backoff_delay(attempt))
+            else:
+                if self.limiter:
+                    self.limiter.record(200, time.perf_counter() - started)
+                return True
         return False
 
     def fetch_inspection_details(self, inspection_nr: str) -> Dict[str, Any]:
-        driver = self._start_driver()
-        url = f"https://www.osha.gov/ords/imis/establishment.inspection_detail?id={inspection_nr}"
+        with self.pool.lease() as driver:
+            return self._fetch_inspection_details(driver, inspection_nr)
+
+    def _fetch_inspection_details(self, driver: webdriver.Chrome, inspection_nr: str) -> Dict[str, Any]:
+        url = f"{self.base_url}{INSPECTION_DETAIL_PATH}?id={inspection_nr}"
 
         if not self._retry_get(driver, url):
             logger.error(f"Failed to load page for Inspection Nr: {inspection_nr} after retries.")
-            driver.quit()
+            self.pool.discard(driver)
             return None
 
-        data = {}
         try:
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.row-fluid"))
-            )
-
-            # 기본 정보 추출
-            data["Inspection Office"] = sanitize_string(driver.find_element(By.XPATH, "//p/strong[contains(text(), 'Inspection Information - Office')]").text.split(": ")[-1])
-            data.update(self._extract_text(driver, "Inspection Nr", "//div[@class='span4'][strong[text()='Inspection Nr']]"))
-            data.update(self._extract_text(driver, "Report ID", "//div[@class='span4'][strong[text()='Report ID']]"))
-            data.update(self._extract_text(driver, "Date Opened", "//div[@class='span4'][strong[text()='Date Opened']]"))
-            data.update(self._extract_text(driver, "Case Status", "//div[@class='well well-small']"))
-            data.update(self._extract_text(driver, "Site Address", "//p[strong[text()='Site Address']]", transform=True))
-            data.update(self._extract_text(driver, "Mailing Address", "//p[strong[text()='Mailing Address']]", transform=True))
-            data.update(self._extract_text(driver, "Union Status", "//div[@class='span4'][p[strong[text()='Union Status']]]"))
-            data.update(self._extract_text(driver, "SIC", "//p[strong[text()='SIC']]"))
-            data.update(self._extract_text(driver, "NAICS", "//p[strong[text()='NAICS']]"))
-            data.update(self._extract_text(driver, "Inspection Type", "//p[strong[text()='Inspection Type']]"))
-            data.update(self._extract_text(driver, "Scope", "//p[strong[text()='Scope']]"))
-            data.update(self._extract_text(driver, "Advanced Notice", "//p[strong[text()='Advanced Notice']]"))
-            data.update(self._extract_text(driver, "Ownership", "//p[strong[text()='Ownership']]"))
-            data.update(self._extract_text(driver, "Safety/Health", "//p[strong[text()='Safety/Health']]"))
-            data.update(self._extract_text(driver, "Close Conference", "//p[strong[text()='Close Conference']]"))
-            data.update(self._extract_text(driver, "Emphasis", "//p[strong[text()='Emphasis']]"))
-            data.update(self._extract_text(driver, "Case Closed", "//p[strong[text()='Case Closed']]"))
-
-            # Related Activity 테이블 추출
-            try:
-                related_activity = driver.find_element(By.XPATH, "//table[caption[text()='Related Activity']]")
-                related_activity_rows = related_activity.find_elements(By.TAG_NAME, "tr")[1:]  # 첫 번째 행은 헤더이므로 건너뜀
-                for idx, row in enumerate(related_activity_rows, start=1):
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    data.update({
-                        f"Related Activity Type {idx}": sanitize_string(cells[0].text),
-                        f"Related Activity Nr {idx}": sanitize_string(cells[1].text),
-                        f"Related Activity Safety {idx}": sanitize_string(cells[2].text),
-                        f"Related Activity Health {idx}": sanitize_string(cells[3].text),
-                    })
-            except Exception:
-                logger.warning(f"Related Activity table not found for Inspection Nr: {inspection_nr}")
-
-            # Violation Summary 추출
-            try:
-                violation_summary = driver.find_element(By.XPATH, "//table[caption[text()='Violation Summary']]")
-                rows = violation_summary.find_elements(By.TAG_NAME, "tr")
-                for row in rows[1:]:
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    label = row.find_element(By.TAG_NAME, "th").text
-                    data.update({
-                        f'{label} Serious': sanitize_string(cells[0].text),
-                        f'{label} Willful': sanitize_string(cells[1].text),
-                        f'{label} Repeat': sanitize_string(cells[2].text),
-                        f'{label} Other': sanitize_string(cells[3].text),
-                        f'{label} Unclass': sanitize_string(cells[4].text),
-                        f'{label} Total': sanitize_string(cells[5].text)
-                    })
-            except Exception:
-                logger.warning(f"Violation Summary table not found for Inspection Nr: {inspection_nr}")
-
-            # Violation Items 추출 (누락된 부분 추가)
-            try:
-                violation_items = driver.find_element(By.XPATH, "//table[caption[text()='Violation Items']]")
-                rows = violation_items.find_elements(By.TAG_NAME, "tr")
-                for idx, row in enumerate(rows[1:], start=1):
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    data.update({
-                        f"Violation Item {idx} Citation ID": sanitize_string(cells[0].text),
-                        f"Violation Item {idx} Citation Type": sanitize_string(cells[1].text),
-                        f"Violation Item {idx} Standard Cited": sanitize_string(cells[2].text),
-                        f"Violation Item {idx} Issuance Date": sanitize_string(cells[3].text),
-                        f"Violation Item {idx} Abatement Due Date": sanitize_string(cells[4].text),
-                        f"Violation Item {idx} Current Penalty": sanitize_string(cells[5].text),
-                        f"Violation Item {idx} Initial Penalty": sanitize_string(cells[6].text),
-                        f"Violation Item {idx} FTA Penalty": sanitize_string(cells[7].text),
-                        f"Violation Item {idx} Contest": sanitize_string(cells[8].text),
-                        f"Violation Item {idx} Latest Event": sanitize_string(cells[9].text),
-                        f"Violation Item {idx} Note": sanitize_string(cells[10].text),
-                    })
-            except Exception:
-                logger.warning(f"Violation Items table not found for Inspection Nr: {inspection_nr}")
-
-            # Investigation Summary 추출
-            try:
-                investigation_summary = driver.find_element(By.XPATH, "//h4[strong[text()='Investigation Summary']]")
-                investigation_rows = investigation_summary.find_elements(By.XPATH, ".//following-sibling::div[contains(@class, 'row-fluid')]/div")
-                for idx, div in enumerate(investigation_rows):
-                    if ": " in div.text:
-                        text = div.text.split(": ")
-                        data[text[0]] = sanitize_string(text[1])
-                    else:
-                        data["Investigation Summary Short"] = sanitize_string(div.text)
-                data["Investigation Summary Long"] = sanitize_string(investigation_summary.find_elements(By.XPATH, ".//following-sibling::p")[0].text)
-                # Keywords 추출
-                try:
-                    data.update(self._extract_text(driver, "Keywords", "//p[strong[text()='Keywords:']]"))
-                except:
-                    data.update(self._extract_text(driver, "Keywords", "//p[strong[text()='Keywords']]"))
-            except Exception:
-                logger.warning(f"Investigation Summary not found for Inspection Nr: {inspection_nr}")
-
+            with timer("osha_driver_seconds", phase="wait"):
+                WebDriverWait(driver, 15).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.row-fluid"))
+                )
+            with timer("osha_driver_seconds", phase="page_source"):
+                page = driver.page_source
+            if self.cache:
+                self.cache.put(url, page.encode("utf-8"))
+            # 렌더링된 페이지를 HTTP 엔진과 같은 추출 명세로 한 번에 파싱합니다.
+            with timer("osha_parse_seconds", page="inspection_detail"):
+                return SPEC.extract(page, inspection_nr)
         except Exception as e:
             logger.error(f"Error occurred for Inspection Nr: {inspection_nr}, {str(e)}")
+            if isinstance(e, WebDriverException):
+                # 페이지를 연 뒤에 세션이 죽었을 수도 있으므로 반납할 때 드라이버를 새로 띄웁니다.
+                self.pool.discard(driver)
+            return {}
 
-        driver.quit()
-        return data
+def default_parse_workers() -> int:
+    """파싱 프로세스 수의 기본값. 가져오기 스레드와 원장 쓰기를 위해 코어 하나를 남기고, 코어가 하나뿐이면 0 (스레드에서 파싱)."""
+    return max(0, (os.cpu_count() or 1) - 1)
 
 class InspectionDataProcessor:
-    def __init__(self, scraper: OSHAWebScraper, checkpoint_file: str) -> None:
+    def __init__(self, scraper: OSHAWebScraper, ledger: WorkLedger, sinks: List[OutputSink], parse_workers: int = 0) -> None:
+        """Args:
+            scraper (OSHAWebScraper): `fetch_inspection_details`를 가진 엔진. `fetch_page`/`unparsable`도 있으면
+                (HTTP, replay 엔진) 가져오기와 파싱을 나눌 수 있습니다.
+            ledger (WorkLedger): 작업 원장.
+            sinks (List[OutputSink]): 배치를 쓸 출력 형식들.
+            parse_workers (int): 0보다 크면 가져오기 스레드는 원본 바이트만 받고, 파싱은 이 수만큼의 프로세스에서 합니다.
+        """
         self.scraper = scraper
-        self.checkpoint_file = checkpoint_file
-
-    def _load_checkpoint(self) -> int:
-        if os.path.exists(self.checkpoint_file):
-            with open(self.checkpoint_file, 'r') as file:
-                return int(file.read().strip())
-        return 0
-
-    def _save_checkpoint(self, index: int) -> None:
-        with open(self.checkpoint_file, 'w') as file:
-            file.write(str(index))
-
-    def _get_last_processed_index(self, output_dir: str) -> int:
-        files = sorted([f for f in os.listdir(output_dir) if f.endswith('.xlsx')])
-        if files:
-            last_file = files[-1]
-            last_index = int(last_file.split('(')[-1].split('~')[0])
-            return last_index + 1
-        return 0
-
-    def _save_pickle(self, data: List[Dict[str, Any]], i: int, output_dir: str) -> None:
-        pickle_file = os.path.join(output_dir, f"pkls/Inspection_Detail({i}).pkl")
-        os.makedirs(os.path.dirname(pickle_file), exist_ok=True)
-        with open(pickle_file, 'wb') as file:
-            pickle.dump(data, file)
-        logger.info(f"Saved batch {i} as pickle to {pickle_file}")
-
-    def _load_latest_pickle(self, output_dir: str) -> Optional[List[Dict[str, Any]]]:
-        pickle_files = sorted([f for f in os.listdir(os.path.join(output_dir, 'pkls')) if f.endswith('.pkl')])
-        if pickle_files:
-            latest_pickle_file = pickle_files[-1]
-            pickle_path = os.path.join(output_dir, 'pkls', latest_pickle_file)
-            with open(pickle_path, 'rb') as file:
-                data = pickle.load(file)
-            logger.info(f"Loaded data from {pickle_path}")
-            return data
-        return None
-
-    def process_inspections(self, inspection_nrs: List[str], output_dir: str, batch_size: int, sleep_time: int) -> None:
-        last_processed = max(self._load_checkpoint(), self._get_last_processed_index(output_dir))
-
-        for i in tqdm(range(last_processed, len(inspection_nrs), batch_size)):
-            batch_inspection_nrs = inspection_nrs[i:i + batch_size]
-            results = []
-
-            for inspection_nr in tqdm(batch_inspection_nrs, desc=f"{i}th batch"):
-                details = self.scraper.fetch_inspection_details(inspection_nr)
-                logger.debug(f"{details = }")
-                if details:
-                    results.append(details)
-
-                time.sleep(sleep_time)
-
-            if results:
-                df = pd.DataFrame(results)
-                output_file_path = os.path.join(output_dir, f"Inspection_Detail({i}~{i + len(batch_inspection_nrs)}).xlsx")
-                os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-                try:
-                    df.to_excel(output_file_path, index=False)
-                    logger.info(f"Saved batch {i} to {output_file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to save batch {i} to Excel due to error: {e}")
-                self._save_pickle(results, i, output_dir)
-
-            self._save_checkpoint(i)
-
-        # Check for any remaining unsaved pickle files
-        latest_pickle_data = self._load_latest_pickle(output_dir)
-        if latest_pickle_data:
-            df = pd.DataFrame(latest_pickle_data)
-            output_file_path = os.path.join(output_dir, f"Inspection_Detail({last_processed}).xlsx")
+        self.ledger = ledger
+        self.sinks = sinks
+        self.parse_workers = parse_workers if hasattr(scraper, "fetch_page") else 0
+
+    def _seed_from_outputs(self, output_dir: str) -> None:
+        # 원장이 처음 만들어졌다면, 이전 방식으로 이미 저장된 결과의 Inspection Nr을 done으로 표시합니다.
+        done = []
+        for file in sorted(f for f in os.listdir(output_dir) if f.endswith('.xlsx')):
+            try:
+                done.extend(pd.read_excel(os.path.join(output_dir, file), usecols=['Inspection Nr'], dtype=str)['Inspection Nr'].dropna())
+            except Exception as e:
+                logger.warning(f"Could not read Inspection Nrs from {file}: {e}")
+        if done:
+            self.ledger.mark_done(done)
+            logger.info(f"Marked {len(set(done))} Inspection Nrs from existing outputs as done")
+
+    def export(self, output_dir: str, batch_size: int, partial: bool = True) -> None:
+        """원장에서 아직 내보내지 않은 done 레코드를 배치 단위로 모든 싱크에 씁니다 (`output_sinks.export_batches`).
+
+        Args:
+            output_dir (str): 출력 폴더 (싱크들이 쓰는 폴더).
+            batch_size (int): 배치 하나의 레코드 수.
+            partial (bool): False이면 batch_size만큼 모이지 않은 나머지는 다음 호출로 미룹니다.
+        """
+        export_batches(self.ledger, self.sinks, batch_size, partial)
+
+    def _error(self, inspection_nr: str, e: Exception) -> None:
+        logger.error(f"Error occurred for Inspection Nr: {inspection_nr}, {e}")
+        self.ledger.fail(inspection_nr, repr(e))
+        count("osha_records_total", result="error")
+
+    def _record(self, inspection_nr: str, details: Optional[Dict[str, Any]]) -> None:
+        log_sampled(logger, "record", inspection_nr=inspection_nr, fields=len(details or {}), case_status=(details or {}).get("Case Status", ""))
+        # 레코드는 하나씩 바로 커밋되므로 배치 도중 중단되어도 잃지 않습니다.
+        if details:
+            self.ledger.complete(inspection_nr, details)
+        else:
+            self.ledger.fail(inspection_nr, "no details returned")
+        count("osha_records_total", result="done" if details else "failed")
+
+    def fetch_one(self, inspection_nr: str, sleep_time: int = 0) -> None:
+        """Inspection Nr 하나를 가져와 결과(또는 오류)를 원장에 기록합니다. 원장에서 가져간(claim) 항목에 씁니다."""
+        try:
+            details = self.scraper.fetch_inspection_details(inspection_nr)
+        except Exception as e:
+            self._error(inspection_nr, e)
+        else:
+            self._record(inspection_nr, details)
+        time.sleep(sleep_time)
+
+    def _fetch_page(self, inspection_nr: str, sleep_time: int, parsers: ProcessPoolExecutor, fallbacks: ThreadPoolExecutor, slots: threading.Semaphore) -> "Future[None]":
+        # 가져오기 스레드는 원본 바이트만 받아 파싱 프로세스에 넘기고 바로 다음 항목으로 넘어갑니다.
+        # 돌려주는 Future는 레코드가 원장에 기록되면 끝납니다.
+        done: "Future[None]" = Future()
+        try:
+            page = self.scraper.fetch_page(inspection_nr)
+        except Exception as e:
+            self._error(inspection_nr, e)
+            page = None
+        else:
+            if page is None:
+                self._record(inspection_nr, None)
+        if page is None:
+            done.set_result(None)
+            time.sleep(sleep_time)
+            return done
+
+        def stored(future: "Future[Optional[Dict[str, Any]]]") -> None:
             try:
-                df.to_excel(output_file_path, index=False)
-                logger.info(f"Updated Excel file from latest pickle at {output_file_path}")
+                self._record(inspection_nr, future.result())
             except Exception as e:
-                logger.error(f"Failed to update Excel from latest pickle due to error: {e}")
+                self._error(inspection_nr, e)
+            finally:
+                done.set_result(None)
 
-def main(input_file_path: str, output_dir: str, checkpoint: str, batch_size: int, sleep_time: int) -> None:
-    # 출력 디렉터리가 없으면 생성
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
+        def parsed(future: "Future[Tuple[Optional[Dict[str, Any]], Optional[str], float]]") -> None:
+            # 파싱 프로세스 풀의 결과 스레드에서 실행되므로, 오래 걸리는 대체 엔진(Selenium)은 별도 스레드에 넘깁니다.
+            slots.release()
+            try:
+                details, error, seconds = future.result()
+                observe("osha_parse_seconds", seconds, page="inspection_detail")
+                if error is not None:
+                    fallbacks.submit(self.scraper.unparsable, inspection_nr, error).add_done_callback(stored)
+                    return
+                self._record(inspection_nr, details)
+            except Exception as e:
+                self._error(inspection_nr, e)
+            done.set_result(None)
+
+        # 파싱이 밀리면 받아 둔 페이지가 메모리에 쌓이지 않도록 가져오기를 멈춥니다.
+        slots.acquire()
+        try:
+            parsers.submit(parse_page, page, inspection_nr).add_done_callback(parsed)
+        except Exception as e:
+            slots.release()
+            self._error(inspection_nr, e)
+            done.set_result(None)
+        time.sleep(sleep_time)
+        return done
+
+    def prepare(self, inspection_nrs: List[str], output_dir: str) -> None:
+        """입력 Inspection Nr들을 원장에 추가합니다. 원장이 새로 만들어졌다면 기존 출력물로 채웁니다."""
+        os.makedirs(output_dir, exist_ok=True)
+        stale = self.ledger.reset_exports()
+        if stale:
+            logger.info(f"Reset {stale} records left mid-export by a previous run")
+        if self.ledger.is_empty():
+            self.ledger.add(inspection_nrs)
+            self._seed_from_outputs(output_dir)
+        else:
+            self.ledger.add(inspection_nrs)
+
+    def run(self, batch_size: int, sleep_time: int, workers: int = 1, output_dir: Optional[str] = None, wait: bool = False, poll_interval: float = 5) -> None:
+        """원장에서 항목을 가져와 처리합니다.
+
+        Args:
+            batch_size (int): 한 번에 가져갈 항목 수.
+            sleep_time (int): 항목마다 쉬는 시간(초).
+            workers (int): 동시에 가져올 스레드 수.
+            output_dir (Optional[str]): 주어지면 배치마다 결과를 내보냅니다. 코디네이터 워커처럼 내보내기를
+                다른 프로세스가 맡는 경우 None.
+            wait (bool): True이면 가져갈 항목이 없어도 다른 워커가 처리 중인 항목이 남아 있는 동안
+                기다렸다가 (실패하거나 임대가 만료된 항목을) 다시 가져갑니다.
+            poll_interval (float): `wait`일 때 다시 확인하기까지의 시간(초).
+        """
+        if self.parse_workers:
+            self._run_split(batch_size, sleep_time, workers, output_dir, wait, poll_interval)
+            return
+        with tqdm(total=self.ledger.remaining()) as progress, ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # 끝나지 않은 항목만 배치 크기만큼 가져갑니다 (다른 워커와 겹치지 않음).
+                batch_inspection_nrs = self.ledger.claim(batch_size)
+                if not batch_inspection_nrs:
+                    if wait and self.ledger.remaining():
+                        time.sleep(poll_interval)
+                        continue
+                    break
+                # workers > 1이면 드라이버 풀의 드라이버 수만큼 동시에 가져옵니다.
+                for _ in executor.map(lambda nr: self.fetch_one(nr, sleep_time), batch_inspection_nrs):
+                    progress.update()
+                if output_dir is not None:
+                    self.export(output_dir, batch_size)
+
+    def _run_split(self, batch_size: int, sleep_time: int, workers: int, output_dir: Optional[str], wait: bool, poll_interval: float) -> None:
+        # `run`과 같지만, 가져오기(스레드 `workers`개)와 파싱(프로세스 `parse_workers`개)을 나눠 실행합니다.
+        # 자식 프로세스는 스레드와 SQLite 연결을 물려받지 않도록 spawn으로 띄웁니다.
+        slots = threading.Semaphore(self.parse_workers * 4)
+        context = multiprocessing.get_context("spawn")
+        with tqdm(total=self.ledger.remaining()) as progress, ThreadPoolExecutor(max_workers=workers) as fetchers, \
+                ThreadPoolExecutor(max_workers=workers) as fallbacks, ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as parsers:
+            while True:
+                batch_inspection_nrs = self.ledger.claim(batch_size)
+                if not batch_inspection_nrs:
+                    if wait and self.ledger.remaining():
+                        time.sleep(poll_interval)
+                        continue
+                    break
+                fetched = [fetchers.submit(self._fetch_page, nr, sleep_time, parsers, fallbacks, slots) for nr in batch_inspection_nrs]
+                for future in fetched:
+                    future.result().result()
+                    progress.update()
+                if output_dir is not None:
+                    self.export(output_dir, batch_size)
+
+    def process_inspections(self, inspection_nrs: List[str], output_dir: str, batch_size: int, sleep_time: int, workers: int = 1) -> None:
+        self.prepare(inspection_nrs, output_dir)
+        self.export(output_dir, batch_size)
+        self.run(batch_size, sleep_time, workers, output_dir)
+        logger.info(f"Ledger state: {self.ledger.counts()}")
+
+def create_chrome_options() -> Options:
     chrome_options = Options()
     chrome_options.add_argument("--incognito")
     chrome_options.add_argument(f"--user-data-dir={os.path.join(os.getcwd(), 'chrome_user_data')}")
     chrome_options.add_argument("--no-first-run")
     chrome_options.add_argument("--no-default-browser-check")
     chrome_options.add_argument("--disable-extensions")
-
-    driver_service = Service(ChromeDriverManager().install())
-    scraper = OSHAWebScraper(driver_service, chrome_options)
-
-    processor = InspectionDataProcessor(scraper, checkpoint)
+    return chrome_options
+
+def create_scraper(engine: str = "http", fallback: bool = True, drivers: int = 1, max_pages: int = 200, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, limiter: Optional[Any] = None, profile: str = "full", base_url: str = OSHA_BASE_URL) -> Tuple[Any, Optional[DriverPool]]:
+    """엔진 이름에 맞는 스크레이퍼와 (사용한다면) 드라이버 풀을 만듭니다.
+
+    http 엔진은 브라우저 없이 동작하고, 파싱할 수 없는 페이지만 Selenium 엔진으로 넘깁니다.
+    모든 엔진은 원본 HTML을 캐시에 기록하고, replay 엔진은 캐시만으로 결과를 다시 만듭니다.
+    `profile`은 Chrome 드라이버의 프로필입니다 (`driver_pool.PROFILES`, lean이면 HTML 외의 리소스를 받지 않음).
+    `base_url`은 요청할 서버 주소로, 스텁 서버로 시험할 때 바꿉니다 (캐시 키에도 쓰입니다).
+
+    Returns:
+        Tuple[Any, Optional[DriverPool]]: (스크레이퍼, 닫아야 할 드라이버 풀).
+
+    Raises:
+        ValueError: replay 엔진인데 캐시 폴더가 없는 경우.
+    """
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    scraper = None
+    pool = None
+    if engine == "replay":
+        if cache is None:
+            raise ValueError("The replay engine needs a cache directory.")
+        return ReplayScraper(cache, base_url=base_url), None
+    if engine == "selenium" or fallback:
+        chrome_options = create_chrome_options()
+        driver_service = Service(ChromeDriverManager().install())
+        pool = DriverPool(driver_service, chrome_options, size=drivers, max_pages=max_pages, profile=profile)
+        scraper = OSHAWebScraper(driver_service, chrome_options, pool=pool, cache=cache, limiter=limiter, base_url=base_url)
+    if engine == "http":
+        scraper = OSHAHttpScraper(fallback=scraper, cache=cache, limiter=limiter, base_url=base_url)
+    return scraper, pool
+
+def read_inspection_nrs(input_file_path: str) -> Optional[List[str]]:
+    """입력 파일(ID 인덱스 .sqlite, .txt 또는 'Inspection Nr' 컬럼이 있는 .xlsx)에서 Inspection Nr 목록을 읽습니다."""
     # 입력 파일 확장자에 따라 처리 방식 결정
-    if input_file_path.endswith('.txt'):
+    if input_file_path.endswith('.sqlite'):
+        # ID 인덱스에서 중복 없는 Inspection Nr을 읽습니다 (`python inspection-nrs`가 만든 인덱스).
+        if not os.path.exists(input_file_path):
+            logger.error(f"ID index not found: {input_file_path}. Run `python inspection-nrs` first.")
+            return None
+        index = IdIndex(input_file_path)
+        try:
+            return index.inspection_nrs()
+        finally:
+            index.close()
+    elif input_file_path.endswith('.txt'):
         # 텍스트 파일에서 각 라인을 읽어서 리스트로 변환
         with open(input_file_path, 'r') as file:
-            inspection_nrs = file.read().splitlines()
+            return file.read().splitlines()
     elif input_file_path.endswith('.xlsx'):
         # 엑셀 파일에서 'Inspection Nr' 컬럼을 읽어서 리스트로 변환
-        inspection_nrs = pd.read_excel(input_file_path)['Inspection Nr'].tolist()
-    else:
-        logger.error("Unsupported file format. Please provide a .txt or .xlsx file.")
+        return pd.read_excel(input_file_path)['Inspection Nr'].tolist()
+    logger.error("Unsupported file format. Please provide a .sqlite, .txt or .xlsx file.")
+    return None
+
+def main(input_file_path: str, output_dir: str, ledger_path: str, batch_size: int, sleep_time: int, engine: str = "http", fallback: bool = True, drivers: int = 1, max_pages: int = 200, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, formats: Optional[List[str]] = None, rate: float = 0.5, max_rate: Optional[float] = None, metrics_file: Optional[str] = None, metrics_port: Optional[int] = None, profile: str = "full", parse_workers: Optional[int] = None, base_url: str = OSHA_BASE_URL) -> None:
+    # 출력 형식을 지정하지 않으면 Parquet만 씁니다.
+    if formats is None:
+        formats = ["parquet"]
+    # 출력 디렉터리가 없으면 생성
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # 요청 간격은 서버 응답(429/5xx, Retry-After, 지연 시간)에 맞춰 조절합니다. 모든 fetch 스레드가 공유합니다.
+    limiter = None if engine == "replay" else AdaptiveRateController(rate, max_rate=max_rate)
+    try:
+        scraper, pool = create_scraper(engine, fallback, drivers, max_pages, cache_dir, limiter=limiter, profile=profile, base_url=base_url)
+    except ValueError as e:
+        logger.error(str(e))
+        return
+    if engine == "replay":
+        sleep_time = 0
+
+    # HTTP/replay 엔진은 받은 바이트를 프로세스 풀에서 파싱해, 가져오기 스레드가 GIL을 두고 파싱과 다투지 않게 합니다.
+    parse_workers = default_parse_workers() if parse_workers is None else parse_workers
+    processor = InspectionDataProcessor(scraper, WorkLedger(ledger_path), create_sinks(formats, output_dir), parse_workers=parse_workers)
+    inspection_nrs = read_inspection_nrs(input_file_path)
+    if inspection_nrs is None:
         return
 
-    processor.process_inspections(inspection_nrs, output_dir, batch_size, sleep_time)
+    if metrics_port is not None:
+        METRICS.serve(metrics_port)
+    if metrics_file:
+        METRICS.write_periodically(metrics_file)
+    try:
+        processor.process_inspections(inspection_nrs, output_dir, batch_size, sleep_time, workers=drivers)
+    finally:
+        if pool is not None:
+            pool.close()
+        if limiter is not None:
+            logger.info(f"Rate controller: {limiter.stats()}")
+        logger.info(METRICS.summary())
+        if metrics_file:
+            METRICS.write_textfile(metrics_file)
 
 # Main
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scrape OSHA inspection details.")
-    parser.add_argument('--input-file_path', '-I', default="Inspection Nrs.txt", type=str, help='Path to the input file containing Inspection Nrs')
+    parser.add_argument('--input-file_path', '-I', default=DEFAULT_INDEX, type=str, help='ID index (.sqlite) or file (.txt, .xlsx) containing Inspection Nrs')
     parser.add_argument('--output-directory', '-O', default="inspection-detail", type=str, help='Path to the output folder')
-    parser.add_argument('--checkpoint', '-P', default="inspection-detail/checkpoint", type=str, help='Checkpoint')
+    parser.add_argument('--ledger', '-P', default="inspection-detail/ledger.sqlite", type=str, help='SQLite work ledger tracking the state of each Inspection Nr')
     parser.add_argument("--batch-size", '-B', type=int, default=1_000, help="Number of inspections to process in one batch.")
-    parser.add_argument("--sleep-time", '-S', type=int, default=2, help="Time to sleep between processing each inspection.")
+    parser.add_argument("--rate", '-R', type=float, default=0.5, help="Initial requests per second, adapted to server responses.")
+    parser.add_argument("--max-rate", type=float, default=None, help="Upper bound of the adaptive request rate (default: 4x --rate).")
+    parser.add_argument("--sleep-time", '-S', type=int, default=0, help="Extra fixed pause after each inspection (pacing is adaptive, see --rate).")
+    parser.add_argument("--engine", '-E', choices=["http", "selenium", "replay"], default="http", help="Extraction engine: plain HTTP + lxml, a Chrome browser, or cached HTML only.")
+    parser.add_argument("--no-fallback", action="store_true", help="Do not fall back to Selenium for pages the HTTP engine cannot parse.")
+    parser.add_argument("--drivers", '-N', type=int, default=1, help="Number of long-lived Chrome drivers (and fetch workers).")
+    parser.add_argument("--max-pages", type=int, default=200, help="Recycle each Chrome driver after this many pages.")
+    parser.add_argument("--base-url", type=str, default=OSHA_BASE_URL, help="Server to query (e.g. a local stub_server.py).")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes parsing fetched pages (http and replay engines). Default: CPU count - 1; 0 parses in the fetch threads.")
+    parser.add_argument("--browser-profile", choices=PROFILES, default="full", help="Chrome profile: full page loads, or lean (headless, eager page load, no images/fonts/CSS/analytics).")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Folder of the raw HTML response cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read from or write to the response cache.")
+    parser.add_argument("--format", '-F', nargs="+", choices=list(SINKS), default=["parquet"], help="Output formats for each batch: normalized Parquet tables, the legacy wide Excel sheet, long-format Excel sheets (xlsx-long), and/or a pickle.")
+    parser.add_argument("--metrics-file", type=str, default=None, help="Write per-phase timings and counters to this Prometheus text file (refreshed while running).")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve the same metrics at http://127.0.0.1:PORT/metrics while running.")
     args = parser.parse_args()
 
-    main(args.input_file_path, args.output_directory, args.checkpoint, args.batch_size, args.sleep_time)
+    main(args.input_file_path, args.output_directory, args.ledger, args.batch_size, args.sleep_time, args.engine, not args.no_fallback, args.drivers, args.max_pages, None if args.no_cache else args.cache_dir, args.format, args.rate, args.max_rate, args.metrics_file, args.metrics_port, args.browser_profile, args.parse_workers, args.base_url)
@@ -0,0 +1,168 @@
+# Internal Modules
+from utils import INSPECTION_DETAIL_PATH, OSHA_BASE_URL, create_session, timed_get
+from http_cache import ResponseCache
+from extraction_spec import SPEC, InspectionPageError
+from rate_limit import backoff_delay
+from metrics import count, timer
+# External Modules
+from typing import Any, Dict, Optional, Tuple, Union
+import requests
+import logging
+import time
+
+# Logger 설정
+logger_name = 'inspection_http'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+
+# File Handler 설정
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+
+# Stream Handler 설정
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+def parse_inspection_detail(page: Union[str, bytes], inspection_nr: str = "") -> Dict[str, Any]:
+    """inspection_detail 페이지의 HTML을 `extraction_spec`의 명세대로 dict로 변환합니다.
+
+    Args:
+        page (Union[str, bytes]): `establishment.inspection_detail` 응답 본문.
+        inspection_nr (str): 로그에 남길 Inspection Nr.
+
+    Returns:
+        Dict[str, Any]: Selenium 엔진과 같은 키를 갖는 결과.
+
+    Raises:
+        InspectionPageError: 본문 레이아웃(`div.row-fluid`, Office 문단)을 찾을 수 없는 경우.
+    """
+    with timer("osha_parse_seconds", page="inspection_detail"):
+        return SPEC.extract(page, inspection_nr)
+
+
+def parse_page(page: bytes, inspection_nr: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[str], float]:
+    """파싱 프로세스 풀에서 실행하는 `parse_inspection_detail`.
+
+    원본 바이트를 디코딩하지 않고 그대로 받아 파싱합니다. 자식 프로세스의 메트릭은 부모에 모이지 않으므로
+    걸린 시간을 함께 돌려주고, 레이아웃 오류는 예외 대신 메시지로 돌려줘 부모가 대체 엔진을 쓸지 정하게 합니다.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str], float]: (결과, `InspectionPageError` 메시지, 파싱 시간(초)).
+    """
+    started = time.perf_counter()
+    try:
+        return SPEC.extract(page, inspection_nr), None, time.perf_counter() - started
+    except InspectionPageError as e:
+        return None, str(e), time.perf_counter() - started
+
+
+class OSHAHttpScraper:
+    """브라우저 없이 `requests` 세션으로 inspection_detail 페이지를 가져와 파싱하는 엔진.
+
+    `OSHAWebScraper`와 같은 `fetch_inspection_details` 인터페이스를 제공하므로
+    `InspectionDataProcessor`에 그대로 넘길 수 있습니다. HTTP 파서가 처리하지 못한
+    페이지는 `fallback` 스크레이퍼(보통 Selenium 엔진)에 위임합니다. `cache`가 주어지면
+    받은 원본 HTML을 저장하고, 아직 유효한 캐시가 있으면 요청하지 않습니다.
+
+    가져오기와 파싱을 나눠 쓸 수도 있습니다: `fetch_page`로 원본 바이트를 받고, `parse_page`로 (다른 프로세스에서)
+    파싱한 뒤, 레이아웃 오류가 나면 `unparsable`로 대체 엔진에 넘깁니다.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, retry_count: int = 3, timeout: float = 30, fallback: Optional[Any] = None, cache: Optional[ResponseCache] = None, limiter: Optional[Any] = None, base_url: str = OSHA_BASE_URL) -> None:
+        self.session = session or create_session()
+        self.retry_count = retry_count
+        self.timeout = timeout
+        self.fallback = fallback
+        self.cache = cache
+        self.limiter = limiter
+        # 요청할 서버 주소. 스텁 서버로 시험할 때 바꿉니다.
+        self.base_url = base_url
+
+    def _retry_get(self, url: str) -> Optional[bytes]:
+        # 응답마다 `limiter.record()`로 상태 코드와 지연 시간을 알려 `AdaptiveRateController`가 속도를 조절하게 하고,
+        # 재시도 사이에는 고정된 2초 대신 jitter를 넣은 지수 백오프만큼 기다립니다.
+        for attempt in range(self.retry_count):
+            if self.limiter:
+                self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = timed_get(self.session, url, "inspection_detail", timeout=self.timeout)
+                if self.limiter:
+                    self.limiter.record(response.status_code, time.perf_counter() - started, response.headers.get("Retry-After"))
+                if response.status_code == 200:
+                    return response.content
+                logger.warning(f"Status code {response.status_code} ({attempt + 1}/{self.retry_count}) for URL: {url}")
+            except requests.RequestException as e:
+                if self.limiter:
+                    self.limiter.record(None, time.perf_counter() - started)
+                logger.warning(f"Retrying ({attempt + 1}/{self.retry_count}) to load URL: {url} ({e})")
+            if attempt + 1 < self.retry_count:
+                time.sleep(backoff_delay(attempt))
+        return None
+
+    def fetch_page(self, inspection_nr: str) -> Optional[bytes]:
+        """파싱하지 않고 inspection_detail 페이지의 원본 바이트만 가져옵니다 (캐시 우선)."""
+        url = f"{self.base_url}{INSPECTION_DETAIL_PATH}?id={inspection_nr}"
+        page = self.cache.get(url) if self.cache else None
+        if self.cache:
+            count("osha_cache_total", page="inspection_detail", result="miss" if page is None else "hit")
+        if page is None:
+            page = self._retry_get(url)
+            if page is None:
+                logger.error(f"Failed to load page for Inspection Nr: {inspection_nr} after retries.")
+                return None
+            if self.cache:
+                self.cache.put(url, page)
+        return page
+
+    def unparsable(self, inspection_nr: str, error: str) -> Optional[Dict[str, Any]]:
+        """HTTP 파서가 처리하지 못한 페이지를 대체 엔진으로 다시 가져옵니다. 대체 엔진이 없으면 None."""
+        if self.fallback is None:
+            logger.error(error)
+            return None
+        logger.warning(f"{error}; falling back to {type(self.fallback).__name__}")
+        return self.fallback.fetch_inspection_details(inspection_nr)
+
+    def fetch_inspection_details(self, inspection_nr: str) -> Optional[Dict[str, Any]]:
+        page = self.fetch_page(inspection_nr)
+        if page is None:
+            return None
+        try:
+            return parse_inspection_detail(page, inspection_nr)
+        except InspectionPageError as e:
+            return self.unparsable(inspection_nr, str(e))
+
+
+class ReplayScraper:
+    """네트워크 없이 캐시된 HTML만으로 inspection_detail을 다시 파싱하는 엔진.
+
+    추출 로직을 고친 뒤 `inspection-detail` 결과를 재생성할 때 사용합니다. 캐시의 TTL은 무시합니다.
+    """
+
+    def __init__(self, cache: ResponseCache, base_url: str = OSHA_BASE_URL) -> None:
+        self.cache = cache
+        # 캐시 키의 서버 주소 (페이지를 받아 온 서버).
+        self.base_url = base_url
+
+    def fetch_page(self, inspection_nr: str) -> Optional[bytes]:
+        page = self.cache.get(f"{self.base_url}{INSPECTION_DETAIL_PATH}?id={inspection_nr}", max_age=None)
+        if page is None:
+            logger.warning(f"No cached page for Inspection Nr: {inspection_nr}")
+        return page
+
+    def unparsable(self, inspection_nr: str, error: str) -> Optional[Dict[str, Any]]:
+        logger.error(error)
+        return None
+
+    def fetch_inspection_details(self, inspection_nr: str) -> Optional[Dict[str, Any]]:
+        page = self.fetch_page(inspection_nr)
+        if page is None:
+            return None
+        try:
+            return parse_inspection_detail(page, inspection_nr)
+        except InspectionPageError as e:
+            return self.unparsable(inspection_nr, str(e))
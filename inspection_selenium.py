@@ -1,11 +1,16 @@
-from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from driver_pool import PROFILES, DriverPool
+from utils import parse_inspection_nrs
+from rate_limit import AdaptiveRateController
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
 from tqdm import tqdm
+import argparse
 import time
 import os
 
@@ -21,10 +26,12 @@ chrome_options.add_argument("--start-maximized")  # 브라우저 창 최대화
 # ChromeDriver 서비스 설정
 service = Service(ChromeDriverManager().install())
 
-# 브라우저를 열고 여러 ID로 웹사이트에 접속합니다.
-def fetch_inspection_nrs(ids):
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
+# 풀에서 빌린 브라우저로 여러 ID의 웹사이트에 접속합니다.
+def fetch_inspection_nrs(ids, pool, cache=None):
+    with pool.lease() as driver:
+        return _fetch_inspection_nrs(driver, ids, cache, pool)
+
+def _fetch_inspection_nrs(driver, ids, cache=None, pool=None):
     # 여러 ID를 &로 묶어서 하나의 URL로 만듭니다.
     ids_param = '&'.join([f"id={id}" for id in ids])
     url = f"https://www.osha.gov/ords/imis/accidentsearch.accident_detail?{ids_param}"
@@ -36,18 +43,21 @@ def fetch_inspection_nrs(ids):
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, "table[name='accidentOverview']"))
         )
+        if cache:
+            cache.put(url, driver.page_source.encode('utf-8'))
 
-        # 각 테이블에서 'Inspection Nr' 값을 추출합니다.
-        tables = driver.find_elements(By.CSS_SELECTOR, "table[name='accidentOverview']")
-        for i, table in enumerate(tables):
-            inspection_nr_element = table.find_element(By.XPATH, ".//tr[2]/td[1]/a")
-            inspection_nr = inspection_nr_element.text.strip()
-            results[ids[i]] = inspection_nr
+        # 각 테이블을 순서가 아닌 내용(Summary Nr)으로 ID와 짝지어 'Inspection Nr' 값을 추출합니다.
+        results = parse_inspection_nrs(driver.page_source, ids)
+        missing = [id for id in ids if id not in results]
+        if missing:
+            print(f"Inspection Nr not matched for IDs: {missing}")
 
     except Exception as e:
         print(f"Error occurred for IDs: {ids}, {str(e)}")
+        # 세션이 죽었을 수도 있으므로 반납할 때 드라이버를 새로 띄웁니다.
+        if pool is not None and isinstance(e, WebDriverException):
+            pool.discard(driver)
 
-    driver.quit()
     return results
 
 # 텍스트 파일에서 ID 목록을 읽어옵니다.
@@ -63,32 +73,49 @@ def save_inspection_nrs_to_file(results, output_file_path):
             file.write(f"{id}: {inspection_nr}\n")
 
 # 메인 함수
-def main(input_file_path):
+# browser_profile이 lean이면 headless로 HTML만 받아 와서 페이지마다 받는 양과 시간을 줄입니다.
+# cache_dir이 None이면 받은 페이지 HTML을 응답 캐시에 기록하지 않습니다.
+def main(input_file_path, browser_profile="full", cache_dir=DEFAULT_CACHE_DIR):
     ids = read_ids_from_file(input_file_path)
     results = {}
+    controller = AdaptiveRateController(0.5)
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    # 그룹마다 Chrome을 새로 띄우지 않도록 드라이버를 재사용합니다.
+    pool = DriverPool(service, chrome_options, profile=browser_profile)
     batch_size = 1_000
     group_size = 25  # 한 번에 10개씩 처리
 
-    for i in tqdm(range(0, len(ids), batch_size)):
-        batch_ids = ids[i:i + batch_size]
-
-        for j in range(0, len(batch_ids), group_size):
-            group_ids = batch_ids[j:j + group_size]
-            group_results = fetch_inspection_nrs(group_ids)
-            results.update(group_results)
-
-            # 각 요청 사이에 지연 시간을 추가합니다.
-            time.sleep(2)
-
-        # 중간 결과 저장
-        output_file_path = f"inspection-nrs/Inspection_Nrs({i}~{i + len(batch_ids)}).txt"
-        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-        save_inspection_nrs_to_file(results, output_file_path)
-
-        # 배치 완료 후 결과 초기화
-        results = {}
+    try:
+        for i in tqdm(range(0, len(ids), batch_size)):
+            batch_ids = ids[i:i + batch_size]
+
+            for j in range(0, len(batch_ids), group_size):
+                group_ids = batch_ids[j:j + group_size]
+                # 고정된 2초 대신 페이지 로드 결과에 맞춰 요청 간격을 조절합니다.
+                controller.acquire()
+                started = time.perf_counter()
+                group_results = fetch_inspection_nrs(group_ids, pool, cache)
+                # 브라우저로는 상태 코드를 알 수 없으므로 아무 결과도 얻지 못한 요청을 실패로 봅니다.
+                controller.record(200 if group_results else None, time.perf_counter() - started)
+                results.update(group_results)
+
+            # 중간 결과 저장
+            output_file_path = f"inspection-nrs/Inspection_Nrs({i}~{i + len(batch_ids)}).txt"
+            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+            save_inspection_nrs_to_file(results, output_file_path)
+
+            # 배치 완료 후 결과 초기화
+            results = {}
+    finally:
+        pool.close()
 
 # 파일 경로를 지정하고 함수를 호출합니다.
 if __name__ == "__main__":
-    input_file_path = "Summary_Nrs.txt"  # 입력 텍스트 파일의 경로를 입력하세요.
-    main(input_file_path)
+    parser = argparse.ArgumentParser(description='Fetch Inspection Nrs for Summary Nrs with a pooled Chrome browser')
+    parser.add_argument('--file', '-F', type=str, default="Summary_Nrs.txt", help='Text file of Summary Nrs')
+    parser.add_argument('--browser-profile', choices=PROFILES, default="full", help='Chrome profile: full page loads, or lean (headless, eager page load, no images/fonts/CSS/analytics)')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the raw HTML response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Do not write loaded pages to the cache')
+    args = parser.parse_args()
+
+    main(args.file, args.browser_profile, None if args.no_cache else args.cache_dir)
@@ -0,0 +1,247 @@
+"""단계별 소요 시간과 처리 수를 모으는 계측 모듈.
+
+요청(TTFB, 본문 다운로드), Chrome 드라이버(시작, 페이지 열기, `WebDriverWait`, `page_source`), 파싱, 출력
+쓰기처럼 시간이 드는 구간을 `timer()`로 감싸면 히스토그램에, 처리 수는 `count()`로 카운터에 쌓입니다.
+쌓인 값은 Prometheus 텍스트 형식으로 파일에 쓰거나(`write_textfile`, node_exporter textfile collector 용)
+로컬 `/metrics` 엔드포인트로 내보내고(`serve`), 실행이 끝나면 `summary()`로 단계별 요약을 남깁니다.
+
+반복 구간의 로그는 `log_sampled()`로 `event key=value ...` 형식의 한 줄로 남기며, 같은 이벤트는 처음 한 번과
+그 뒤 `every`번마다 한 번만 기록합니다.
+
+Usage:
+    >>> from metrics import METRICS, timer, count, log_sampled
+    >>> with timer("osha_parse_seconds", page="inspection_detail"):
+    ...     data = parse_inspection_detail(page)
+    >>> count("osha_requests_total", page="inspection_detail", status="200")
+    >>> log_sampled(logger, "record", inspection_nr=nr, fields=len(data))
+    >>> METRICS.write_textfile("logs/metrics.prom")
+    >>> print(METRICS.summary())
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger('metrics')
+
+# 초 단위 히스토그램 구간 (Prometheus 기본값에 1ms 미만의 파싱/다운로드와 느린 페이지 로드를 위한 구간을 더함)
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (key + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for key, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    """구간별 개수와 합계, 최솟값, 최댓값을 보관하는 히스토그램 하나 (레이블 조합 하나)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막은 +Inf 구간
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """구간 안에서 선형 보간한 분위수 추정값."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else min(self.min, self.buckets[0])
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, max(self.min, lower + (upper - lower) * (rank - seen) / n))
+            seen += n
+        return self.max
+
+
+class Metrics:
+    """카운터와 히스토그램 모음. 여러 스레드에서 함께 사용할 수 있습니다."""
+
+    def __init__(self, help: Optional[Dict[str, str]] = None) -> None:
+        """Args:
+            help (Optional[Dict[str, str]]): 메트릭 이름 → `# HELP` 설명.
+        """
+        self.help: Dict[str, str] = dict(help or {})
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1, **labels: object) -> None:
+        """카운터 `name`에 `value`를 더합니다."""
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        """히스토그램 `name`에 값 하나를 기록합니다."""
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        """`with` 블록의 소요 시간(초)을 히스토그램 `name`에 기록합니다. 예외가 나도 기록합니다."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식(0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """`render()` 결과를 임시 파일에 쓴 뒤 바꿔치기하여, 읽는 쪽이 쓰다 만 파일을 보지 않게 합니다."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(tmp_path, path)
+
+    def write_periodically(self, path: str, interval: float = 15.0) -> threading.Thread:
+        """백그라운드 스레드에서 `interval`초마다 `write_textfile(path)`를 호출합니다 (프로세스가 끝나면 함께 끝남)."""
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_textfile(path)
+                except OSError as e:
+                    logger.warning(f"Failed to write metrics to {path}: {e}")
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """백그라운드 스레드에서 `http://host:port/metrics`로 `render()` 결과를 내보냅니다."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def summary(self) -> str:
+        """실행 요약: 히스토그램마다 횟수, 합계, 평균, p50/p95, 최댓값, 그리고 카운터 값."""
+        lines = [f"Run summary ({time.time() - self.started:,.1f}s wall time)"]
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                for labels, h in sorted(series.items()):
+                    lines.append(
+                        f"  {name}{_format_labels(labels)}: n={h.count:,} total={h.sum:,.2f}s mean={h.sum / h.count * 1000:,.1f}ms "
+                        f"p50={h.quantile(0.5) * 1000:,.1f}ms p95={h.quantile(0.95) * 1000:,.1f}ms max={h.max * 1000:,.1f}ms"
+                    )
+            for name, series in sorted(self.counters.items()):
+                for labels, value in sorted(series.items()):
+                    lines.append(f"  {name}{_format_labels(labels)}: {value:,g}")
+        return "\n".join(lines)
+
+
+METRICS = Metrics({
+    "osha_request_seconds": "HTTP request phases: ttfb (until response headers) and download (body).",
+    "osha_requests_total": "HTTP responses by page and status (status=error for network errors).",
+    "osha_cache_total": "Response cache lookups by page and result.",
+    "osha_driver_seconds": "Chrome driver phases: startup, load, wait (WebDriverWait) and page_source.",
+    "osha_parse_seconds": "Parsing time by page type.",
+    "osha_write_seconds": "Output batch write time by sink.",
+    "osha_records_written_total": "Records written by sink.",
+    "osha_records_total": "Scraped records by result.",
+})
+
+timer = METRICS.timer
+count = METRICS.count
+observe = METRICS.observe
+
+_sample_counts: Dict[Tuple[str, str], int] = {}
+_sample_lock = threading.Lock()
+
+
+def log_sampled(log: logging.Logger, event: str, every: int = 100, level: int = logging.DEBUG, **fields: object) -> bool:
+    """`event key=value ...` 한 줄을 남기되, 같은 로거의 같은 이벤트는 처음 한 번과 그 뒤 `every`번마다 한 번만 남깁니다.
+
+    Returns:
+        bool: 이번 호출을 기록했는지 여부.
+    """
+    key = (log.name, event)
+    with _sample_lock:
+        n = _sample_counts.get(key, 0)
+        _sample_counts[key] = n + 1
+    if n % max(1, every) or not log.isEnabledFor(level):
+        return False
+    pairs = " ".join(f"{name}={value!r}" if isinstance(value, str) and (" " in value or not value) else f"{name}={value}" for name, value in fields.items())
+    log.log(level, f"{event} {pairs} sampled=1/{every} seen={n + 1}", stacklevel=2)
+    return True
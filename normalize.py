@@ -0,0 +1,217 @@
+"""정규화된 inspection_detail 테이블의 문자열 값을 분석용 타입으로 바꾸는 변환 단계.
+
+스크레이퍼는 모든 값을 화면에 보이는 문자열 그대로(`04/22/2021`, `$13,653`, `238160/Roofing Contractors`)
+저장합니다. 여기서는 `records.SCHEMAS`의 네 테이블을 배치 단위로 받아 열마다 `pyarrow.compute` 커널로 한 번에
+변환하므로 행마다 파이썬 코드를 돌지 않습니다.
+
+- 날짜 (`MM/DD/YYYY`): `timestamp[s]` (pandas에서는 `datetime64[s]`)
+- 금액 (`$12,345`): 센트 단위 `int64`. Violation Summary는 `Penalty` 행만 센트이고 나머지 행은 건수입니다.
+- SIC: `int16`, NAICS: `NAICS Code` (`int32`)와 `NAICS Description` (dictionary)로 나눔
+- Related Activity의 Safety/Health: `Yes`이면 True, 빈 값이면 False
+
+빈 값(공백, `&nbsp;` 포함)은 null이 되고, 값이 있는데 변환하지 못한 경우는 null로 두고
+`(table, column, Inspection Nr, value)` 행으로 따로 모아 돌려줍니다.
+
+Usage:
+    >>> from normalize import normalize_tables
+    >>> typed, failures = normalize_tables(normalize_records(records))
+
+    $ python normalize.py output/parquet -o output/typed
+"""
+# Internal Modules
+from records import SCHEMAS
+# External Modules
+from typing import Callable, Dict, List, Tuple
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow as pa
+import argparse
+import logging
+import os
+
+# Root
+logger_name = 'normalize'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DATE_FORMAT = "%m/%d/%Y"
+DATE_TYPE = pa.timestamp("s")
+MONEY_PATTERN = r'^-?\$?-?[0-9][0-9,]*(\.[0-9]{1,2})?$'
+NAICS_PATTERN = r'^(?P<code>[0-9]+)\s*(?:/\s*(?P<description>.*))?$'
+
+# 테이블 → 열 → 변환 종류. 여기 없는 열은 그대로 둡니다.
+CONVERSIONS: Dict[str, Dict[str, str]] = {
+    "inspections": {"Date Opened": "date", "Close Conference": "date", "Case Closed": "date", "SIC": "sic", "NAICS": "naics"},
+    "related_activity": {"Safety": "flag", "Health": "flag"},
+    "violation_summary": {name: "summary" for name in ("Serious", "Willful", "Repeat", "Other", "Unclass", "Total")},
+    "violation_items": {
+        "Issuance Date": "date", "Abatement Due Date": "date", "Contest": "date",
+        "Current Penalty": "money", "Initial Penalty": "money", "FTA Penalty": "money",
+    },
+}
+
+FAILURE_SCHEMA = pa.schema([("table", pa.string()), ("column", pa.string()), ("Inspection Nr", pa.string()), ("value", pa.string())])
+
+
+def _clean(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # dictionary 열은 풀고, 앞뒤 공백(&nbsp; 포함)을 지운 뒤 빈 문자열은 null로 바꿉니다.
+    if pa.types.is_dictionary(column.type):
+        column = pc.cast(column, pa.string())
+    column = pc.utf8_trim_whitespace(column)
+    return pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+
+
+def _to_date(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.strptime(values, format=DATE_FORMAT, unit="s", error_is_null=True)
+
+
+def _to_amount(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    # `$`와 천 단위 쉼표를 지운 숫자 (float64). 형식이 맞지 않는 값은 null.
+    valid = pc.match_substring_regex(values, MONEY_PATTERN)
+    digits = pc.replace_substring_regex(values, r'[$,]', "")
+    return pc.cast(pc.if_else(valid, digits, pa.scalar(None, pa.string())), pa.float64())
+
+
+def _to_cents(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.cast(pc.round(pc.multiply(_to_amount(values), 100)), pa.int64())
+
+
+def _to_sic(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    valid = pc.match_substring_regex(values, r'^[0-9]{1,4}$')
+    return pc.cast(pc.if_else(valid, values, pa.scalar(None, pa.string())), pa.int16())
+
+
+def _to_flag(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    # 빈 값은 표에서 체크되지 않은 칸이므로 False입니다. Yes/No 외의 값만 null(변환 실패)이 됩니다.
+    lowered = pc.utf8_lower(values)
+    flag = pc.if_else(pc.equal(lowered, "yes"), True, pc.if_else(pc.equal(lowered, "no"), False, pa.scalar(None, pa.bool_())))
+    return pc.if_else(pc.is_null(values), False, flag)
+
+
+CONVERTERS: Dict[str, Callable[[pa.ChunkedArray], pa.ChunkedArray]] = {"date": _to_date, "money": _to_cents, "sic": _to_sic, "flag": _to_flag}
+
+
+def _split_naics(values: pa.ChunkedArray) -> Tuple[pa.ChunkedArray, pa.ChunkedArray]:
+    # `238160/Roofing Contractors` → (238160, "Roofing Contractors"). `/` 앞뒤 공백은 무시하고, 설명 없이 코드만 있을 수도 있습니다.
+    parts = pc.extract_regex(values, NAICS_PATTERN)
+    code = pc.cast(pc.struct_field(parts, "code"), pa.int32())
+    description = pc.utf8_trim_whitespace(pc.struct_field(parts, "description"))
+    description = pc.if_else(pc.equal(description, ""), pa.scalar(None, pa.string()), description)
+    return code, pc.dictionary_encode(description)
+
+
+def _failures(table_name: str, column_name: str, nrs: pa.ChunkedArray, raw: pa.ChunkedArray, typed: pa.ChunkedArray) -> pa.Table:
+    failed = pc.and_(pc.is_valid(raw), pc.is_null(typed))
+    count = pc.sum(failed).as_py() or 0
+    return pa.table({
+        "table": pa.array([table_name] * count, pa.string()),
+        "column": pa.array([column_name] * count, pa.string()),
+        "Inspection Nr": pc.filter(nrs, failed),
+        "value": pc.filter(raw, failed),
+    }, schema=FAILURE_SCHEMA)
+
+
+def _typed_schema(name: str) -> pa.Schema:
+    fields: List[pa.Field] = []
+    for field in SCHEMAS[name]:
+        conversion = CONVERSIONS[name].get(field.name)
+        if conversion == "naics":
+            fields += [pa.field("NAICS Code", pa.int32()), pa.field("NAICS Description", pa.dictionary(pa.int32(), pa.string()))]
+        elif conversion is not None:
+            fields.append(pa.field(field.name, {"date": DATE_TYPE, "money": pa.int64(), "summary": pa.int64(), "sic": pa.int16(), "flag": pa.bool_()}[conversion]))
+        else:
+            fields.append(field)
+    return pa.schema(fields)
+
+
+TYPED_SCHEMAS: Dict[str, pa.Schema] = {name: _typed_schema(name) for name in SCHEMAS}
+
+
+def normalize_table(name: str, table: pa.Table) -> Tuple[pa.Table, pa.Table]:
+    """`SCHEMAS[name]` 형식의 테이블 하나를 `TYPED_SCHEMAS[name]`으로 변환합니다.
+
+    Returns:
+        Tuple[pa.Table, pa.Table]: (변환된 테이블, 변환하지 못한 값들 (`FAILURE_SCHEMA`)).
+    """
+    nrs = table.column("Inspection Nr")
+    columns: List[pa.ChunkedArray] = []
+    failures: List[pa.Table] = []
+    if name == "violation_summary":
+        # Penalty 행(`Initial Penalty` 등)의 값은 금액이므로 센트로, 나머지 행은 건수 그대로 둡니다.
+        scale = pc.if_else(pc.match_substring(_clean(table.column("Label")), "Penalty"), 100.0, 1.0)
+    for field in table.schema:
+        column = table.column(field.name)
+        conversion = CONVERSIONS[name].get(field.name)
+        if conversion is None:
+            columns.append(column)
+            continue
+        raw = _clean(column)
+        if conversion == "naics":
+            code, description = _split_naics(raw)
+            columns += [code, description]
+            typed = code
+        elif conversion == "summary":
+            typed = pc.cast(pc.round(pc.multiply(_to_amount(raw), pc.fill_null(scale, 1.0))), pa.int64())
+            columns.append(typed)
+        else:
+            typed = CONVERTERS[conversion](raw)
+            columns.append(typed)
+        failures.append(_failures(name, field.name, nrs, raw, typed))
+    typed_table = pa.Table.from_arrays(columns, schema=TYPED_SCHEMAS[name])
+    return typed_table, pa.concat_tables(failures) if failures else FAILURE_SCHEMA.empty_table()
+
+
+def normalize_tables(tables: Dict[str, pa.Table]) -> Tuple[Dict[str, pa.Table], pa.Table]:
+    """`normalize_records` 결과의 네 테이블을 모두 변환합니다.
+
+    Returns:
+        Tuple[Dict[str, pa.Table], pa.Table]: (테이블 이름 → 변환된 테이블, 변환하지 못한 값들).
+    """
+    typed: Dict[str, pa.Table] = {}
+    failures: List[pa.Table] = []
+    for name, table in tables.items():
+        typed[name], failed = normalize_table(name, table)
+        failures.append(failed)
+    return typed, pa.concat_tables(failures)
+
+
+def summarize_failures(failures: pa.Table, samples: int = 3) -> List[str]:
+    """변환 실패를 `table.column: 건수 (예: 값, ...)` 줄들로 요약합니다."""
+    lines = []
+    for row in failures.group_by(["table", "column"]).aggregate([("value", "count"), ("value", "distinct")]).to_pylist():
+        examples = ", ".join(repr(value) for value in row["value_distinct"][:samples])
+        lines.append(f"{row['table']}.{row['column']}: {row['value_count']:,} (e.g. {examples})")
+    return lines
+
+
+def main(args: argparse.Namespace) -> None:
+    os.makedirs(args.output, exist_ok=True)
+    tables = {name: pq.read_table(os.path.join(args.input, name), schema=SCHEMAS[name]) for name in SCHEMAS}
+    typed, failures = normalize_tables(tables)
+    for name, table in typed.items():
+        path = os.path.join(args.output, f"{name}.parquet")
+        pq.write_table(table, path, compression="zstd")
+        logger.info(f"Wrote {table.num_rows:,} rows to {path}")
+    pq.write_table(failures, os.path.join(args.output, "parse_failures.parquet"), compression="zstd")
+    logger.info(f"{failures.num_rows:,} values could not be parsed")
+    for line in summarize_failures(failures):
+        logger.info(f"  {line}")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert normalized inspection_detail tables to typed columns')
+    parser.add_argument('input', type=str, help='Folder with one sub-folder of Parquet files per table (e.g. output/parquet)')
+    parser.add_argument('-o', '--output', type=str, default="output/typed", help='Output folder for typed tables and parse_failures.parquet')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,195 @@
+"""inspection_detail 결과를 저장하는 출력 싱크들.
+
+`InspectionDataProcessor`는 배치를 내보낼 때마다 설정된 모든 싱크의 `write(name, records)`를 호출합니다.
+
+- `ParquetSink`: 기본 저장 형식. 넓은 레코드를 `inspections` 테이블과 Inspection Nr로 연결되는
+  `violation_items`, `related_activity`, `violation_summary` 자식 테이블로 정규화하고,
+  배치마다 테이블별로 row group 하나짜리 Parquet 파일을 씁니다.
+- `ExcelSink`, `PickleSink`: 기존과 같은 `.xlsx` / `pkls/*.pkl` 내보내기 (선택).
+- `StreamingExcelSink`: 네 테이블을 시트별 긴 형식으로 `xlsx/*.xlsx`에 스트리밍 (`excel_export`, 선택).
+
+레코드는 `fetch_inspection_details`의 dict나 `records.InspectionRecord` 어느 쪽으로 넘겨도 됩니다.
+"""
+# Internal Modules
+from records import InspectionRecord, RecordBatchBuilder, as_dict, loads_record
+from work_ledger import WorkLedger
+from metrics import count, timer
+from normalize import normalize_tables
+from excel_export import StreamingWorkbook
+
+# External Modules
+from typing import Any, Dict, Iterable, List, Union
+import pyarrow.parquet as pq
+import pyarrow as pa
+import pandas as pd
+import logging
+import pickle
+import time
+import os
+
+logger = logging.getLogger('inspection_detail')
+
+
+def normalize_records(records: Iterable[Union[InspectionRecord, Dict[str, Any]]]) -> Dict[str, pa.Table]:
+    """레코드 목록을 `SCHEMAS`의 네 테이블로 정규화합니다.
+
+    행 dict를 만들지 않고 `RecordBatchBuilder`의 열 목록에 바로 쌓습니다.
+
+    Returns:
+        Dict[str, pa.Table]: 테이블 이름 → Arrow 테이블.
+    """
+    return RecordBatchBuilder().extend(records).finish()
+
+
+class OutputSink:
+    """배치 단위로 레코드를 저장하는 싱크의 기본 클래스."""
+
+    def write(self, name: str, records: List[Union[InspectionRecord, Dict[str, Any]]]) -> None:
+        """한 배치를 저장합니다.
+
+        Args:
+            name (str): 배치 이름 (예: `0~1000`). 파일 이름에 쓰입니다.
+            records (List[Union[InspectionRecord, Dict[str, Any]]]): `fetch_inspection_details` 결과 목록.
+        """
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        """같은 이름의 배치가 이미 저장되어 있는지 여부."""
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetSink(OutputSink):
+    """정규화된 네 개의 테이블을 `output_dir/parquet/<table>/Inspection_Detail(<name>).parquet`로 씁니다."""
+
+    def __init__(self, output_dir: str, compression: str = "zstd") -> None:
+        self.root = os.path.join(output_dir, "parquet")
+        self.compression = compression
+
+    def _path(self, table_name: str, name: str) -> str:
+        return os.path.join(self.root, table_name, f"Inspection_Detail({name}).parquet")
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path("inspections", name))
+
+    def _write_table(self, table_name: str, name: str, table: pa.Table) -> None:
+        path = self._path(table_name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        # 배치 하나 = row group 하나. 임시 파일에 쓴 뒤 바꿔치기하여 중간에 끊겨도 깨진 파일이 남지 않습니다.
+        with pq.ParquetWriter(tmp_path, table.schema, compression=self.compression) as writer:
+            writer.write_table(table, row_group_size=max(1, table.num_rows))
+        os.replace(tmp_path, path)
+
+    def write(self, name: str, records: List[Union[InspectionRecord, Dict[str, Any]]]) -> None:
+        # `inspections`를 마지막에 써서, 그 파일이 있으면 배치의 네 테이블이 모두 쓰인 것으로 볼 수 있게 합니다 (병합기가 의존).
+        tables = normalize_records(records)
+        for table_name in sorted(tables, key=lambda table_name: table_name == "inspections"):
+            self._write_table(table_name, name, tables[table_name])
+        logger.info(f"Saved batch {name} as Parquet to {self.root}")
+
+
+class ExcelSink(OutputSink):
+    """기존과 같은 넓은 형식의 `Inspection_Detail(<name>).xlsx`를 씁니다."""
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.output_dir, f"Inspection_Detail({name}).xlsx"))
+
+    def write(self, name: str, records: List[Union[InspectionRecord, Dict[str, Any]]]) -> None:
+        output_file_path = os.path.join(self.output_dir, f"Inspection_Detail({name}).xlsx")
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        try:
+            pd.DataFrame(as_dict(record) for record in records).to_excel(output_file_path, index=False)
+            logger.info(f"Saved batch {name} to {output_file_path}")
+        except Exception as e:
+            logger.error(f"Failed to save batch {name} to Excel due to error: {e}")
+
+
+class StreamingExcelSink(OutputSink):
+    """`xlsx/Inspection_Detail(<name>).xlsx`에 테이블마다 긴 형식 시트 하나를 씁니다.
+
+    넓은 형식과 달리 위반 항목이 늘어도 열이 늘지 않고, 타입을 변환한 값(날짜, 달러 금액)으로 씁니다.
+    파트 파일로 다시 읽히지 않도록 기존 `.xlsx`와 다른 폴더에 둡니다.
+    """
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = os.path.join(output_dir, "xlsx")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.output_dir, f"Inspection_Detail({name}).xlsx")
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def write(self, name: str, records: List[Union[InspectionRecord, Dict[str, Any]]]) -> None:
+        typed, _ = normalize_tables(normalize_records(records))
+        with StreamingWorkbook(self._path(name)) as workbook:
+            for table_name, table in typed.items():
+                workbook.write(table_name, table)
+        logger.info(f"Saved batch {name} as long-format Excel to {self._path(name)}")
+
+
+class PickleSink(OutputSink):
+    """레코드 리스트를 그대로 `pkls/Inspection_Detail(<name>).pkl`로 씁니다."""
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.output_dir, f"pkls/Inspection_Detail({name}).pkl"))
+
+    def write(self, name: str, records: List[Union[InspectionRecord, Dict[str, Any]]]) -> None:
+        pickle_file = os.path.join(self.output_dir, f"pkls/Inspection_Detail({name}).pkl")
+        os.makedirs(os.path.dirname(pickle_file), exist_ok=True)
+        with open(pickle_file, 'wb') as file:
+            pickle.dump([as_dict(record) for record in records], file)
+        logger.info(f"Saved batch {name} as pickle to {pickle_file}")
+
+
+SINKS = {"parquet": ParquetSink, "xlsx": ExcelSink, "xlsx-long": StreamingExcelSink, "pkl": PickleSink}
+
+
+def create_sinks(formats: List[str], output_dir: str) -> List[OutputSink]:
+    """`--format` 값들(`parquet`, `xlsx`, `xlsx-long`, `pkl`)로 싱크 목록을 만듭니다."""
+    return [SINKS[fmt](output_dir) for fmt in formats]
+
+
+def export_batches(ledger: WorkLedger, sinks: List[OutputSink], batch_size: int, partial: bool = True) -> None:
+    """원장에서 아직 내보내지 않은 done 레코드를 배치 단위로 모든 싱크에 씁니다 (중단 후 재시작 시에도).
+
+    배치는 모든 싱크에 쓴 뒤에야 내보낸 것으로 확정하고, 도중에 실패하면 다음 호출에서 다시 씁니다.
+
+    Args:
+        ledger (WorkLedger): 작업 원장.
+        sinks (List[OutputSink]): 배치를 쓸 싱크들.
+        batch_size (int): 배치 하나의 레코드 수.
+        partial (bool): False이면 batch_size만큼 모이지 않은 나머지는 다음 호출로 미룹니다.
+    """
+    while True:
+        if not partial and ledger.unexported() < batch_size:
+            return
+        token = f"{os.getpid()}-{time.time_ns()}"
+        # 원장의 JSON을 읽으면서 바로 압축된 레코드로 바꿔, 배치 하나가 넓은 dict로 메모리에 쌓이지 않게 합니다.
+        rows = ledger.take_unexported(token, batch_size, loads=loads_record)
+        if not rows:
+            return
+        results = [record for _, record in rows]
+        name = f"{rows[0][0]}~{rows[-1][0] + 1}"
+        if any(sink.exists(name) for sink in sinks):
+            name = f"{name}-{int(time.time())}"
+        try:
+            for sink in sinks:
+                sink_name = type(sink).__name__
+                with timer("osha_write_seconds", sink=sink_name):
+                    sink.write(name, results)
+                count("osha_records_written_total", len(results), sink=sink_name)
+        except BaseException:
+            # 모든 싱크에 쓰기 전에는 내보낸 것으로 치지 않고, 다음 내보내기에서 다시 씁니다.
+            ledger.abort_export(token)
+            raise
+        ledger.finish_export(token)
@@ -0,0 +1,339 @@
+"""검색 결과 페이지 → Summary Nr → Inspection Nr → inspection_detail을 한 번에 실행하는 스트리밍 파이프라인.
+
+단계 사이를 텍스트 파일 대신 크기가 제한된 큐로 잇기 때문에, 앞 단계가 모두 끝나기를 기다리지 않고
+첫 Inspection Nr이 나오자마자 상세 정보 수집이 시작됩니다. 뒤 단계가 밀리면 큐가 차서 앞 단계가
+멈추므로(backpressure) 메모리 사용량이 일정합니다.
+
+- summary: 검색 결과 HTML(`--directory`)을 스트리밍으로 읽거나 `--summary-nrs` 파일을 읽어 Summary Nr을 내보냅니다.
+- nrs: `--nrs-workers`개의 스레드가 큐에서 Summary Nr을 최대 K개씩 꺼내 accident_detail 묶음 요청으로
+  Inspection Nr을 얻습니다. 결과는 `--nrs-output`에 `id: inspection_nr`으로 덧붙이고 `--id-index`에도
+  기록하며, 다시 실행하면 인덱스에 이미 있는 Summary Nr은 요청하지 않습니다.
+- detail: `--detail-workers`개의 스레드가 Inspection Nr을 작업 원장에 추가하고 가져가 `inspection_detail`
+  엔진으로 수집합니다. `--batch-size`개가 모일 때마다 설정된 형식으로 내보냅니다.
+
+두 네트워크 단계는 `AdaptiveRateController` 하나를 함께 쓰므로 전체 요청 속도는 `--rate`에서 시작해
+서버 응답에 맞춰 조절됩니다. 단계마다 진행 막대에 처리 수, 처리량, 입력 큐 크기가 표시됩니다.
+
+Usage:
+    $ python pipeline.py --directory ./ --nrs-workers 2 --detail-workers 2 --rate 1
+    $ python pipeline.py --summary-nrs Summary_Nrs.txt --engine http --no-fallback
+"""
+# Internal Modules
+from utils import OSHA_BASE_URL, BatchSizeTuner, create_session, fetch_inspection_nrs, get_htmls, iter_report_ids, read_ids_from_file
+from rate_limit import AdaptiveRateController
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from work_ledger import WorkLedger
+from id_index import DEFAULT_INDEX, IdIndex
+from metrics import METRICS
+from output_sinks import SINKS, create_sinks
+# External Modules
+from typing import Any, Callable, Dict, List, Optional, Set
+from tqdm import tqdm
+import threading
+import argparse
+import logging
+import queue
+import time
+import os
+
+# Root
+logger_name = 'pipeline'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DONE = object()  # 앞 단계가 끝났음을 알리는 표식
+
+
+class Stage:
+    """파이프라인의 한 단계. 입력 큐, 워커 스레드, 처리 수와 진행 막대를 가집니다.
+
+    워커 함수는 입력 큐에서 항목을 꺼내 처리하고 `emit()`으로 다음 단계에 넘깁니다. 마지막 워커가 끝나면
+    다음 단계의 워커 수만큼 `DONE`을 넣어 종료를 알립니다.
+    """
+
+    def __init__(self, name: str, work: Callable[["Stage"], None], workers: int = 1, queue_size: int = 0, position: int = 0) -> None:
+        """Stage 클래스의 초기화 메서드.
+
+        Args:
+            name (str): 진행 막대와 로그에 쓰는 이름.
+            work (Callable[[Stage], None]): 워커 스레드에서 실행할 함수. `DONE`을 받을 때까지 입력을 처리합니다.
+            workers (int): 워커 스레드 수.
+            queue_size (int): 입력 큐의 최대 크기. 0이면 입력 큐가 없는 첫 단계입니다.
+            position (int): 진행 막대의 줄 위치.
+        """
+        self.name = name
+        self.work = work
+        self.workers = workers
+        self.input: Optional[queue.Queue] = queue.Queue(maxsize=queue_size) if queue_size else None
+        self.next: Optional["Stage"] = None
+        self.processed = 0
+        self.emitted = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.progress = tqdm(desc=f"{name:<7}", unit="item", position=position, dynamic_ncols=True)
+        self._running = workers
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 워커 스레드마다 DONE을 받았는지
+        self._threads: List[threading.Thread] = []
+
+    def emit(self, item: Any) -> None:
+        """다음 단계로 항목을 넘깁니다. 다음 단계의 큐가 가득 차 있으면 빌 때까지 기다립니다."""
+        with self._lock:
+            self.emitted += 1
+        if self.next is not None:
+            self.next.input.put(item)
+
+    def count(self, failed: bool = False) -> None:
+        """입력 항목 하나를 처리했음을 기록합니다."""
+        with self._lock:
+            self.processed += 1
+            self.failed += failed
+        self.progress.update()
+        postfix = {"out": self.emitted, "failed": self.failed}
+        if self.input is not None:
+            postfix["queue"] = f"{self.input.qsize()}/{self.input.maxsize}"
+        self.progress.set_postfix(postfix, refresh=False)
+
+    def get(self, block: bool = True) -> Any:
+        """입력 큐에서 항목을 꺼냅니다. `block`이 False이고 큐가 비어 있으면 `queue.Empty`를 던집니다."""
+        item = self.input.get(block)
+        if item is DONE:
+            self._local.done = True
+        return item
+
+    def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    self.work(self)
+                    break
+                except Exception as e:
+                    logger.exception(f"{self.name} worker crashed: {e!r}")
+                    # 입력 큐가 있는 단계는 워커를 다시 돌려, 앞 단계가 가득 찬 큐에 막히지 않게 합니다.
+                    # 이미 DONE을 받은 워커는 더 받을 DONE이 없어 영원히 기다리게 되므로 다시 돌리지 않습니다.
+                    if self.input is None or getattr(self._local, "done", False):
+                        break
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last:
+                self.finished = time.perf_counter()
+                if self.next is not None:
+                    for _ in range(self.next.workers):
+                        self.next.input.put(DONE)
+
+    def start(self) -> None:
+        self._threads = [threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+        self.progress.close()
+
+    def summary(self) -> str:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return f"{self.name}: {self.processed:,} in, {self.emitted:,} out, {self.failed:,} failed, {elapsed:.1f}s, {self.processed / max(elapsed, 1e-9):.2f} items/s"
+
+
+def read_resolved(path: str) -> Dict[str, str]:
+    """이전 실행에서 `path`에 기록한 Summary Nr → Inspection Nr."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return dict(line.split(': ', 1) for line in file.read().splitlines() if ': ' in line)
+
+
+class Pipeline:
+    """summary → nrs → detail 세 단계를 큐로 잇고 실행합니다."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.limiter = AdaptiveRateController(args.rate, max_rate=args.max_rate)
+        self.cache = None if args.no_cache else ResponseCache(args.cache_dir)
+        self.ledger = WorkLedger(args.ledger)
+        self.index = IdIndex(args.id_index)
+        # 인덱스가 없던 이전 실행의 결과 파일도 인덱스에 합칩니다.
+        self.index.add(read_resolved(args.nrs_output).items())
+        self.tuner = BatchSizeTuner(args.nrs_batch_size, max_size=max(args.nrs_batch_size, 100))
+        self._seen_summary: Set[str] = set()
+        self._seen_inspection: Set[str] = set()
+        self._lock = threading.Lock()
+        self._since_export = 0  # 마지막으로 내보내기를 확인한 뒤 detail 단계가 처리한 항목 수
+        self._nrs_file = None
+        self.processor = None
+        self.pool = None
+
+    # summary 단계
+    def _summary_nrs(self, stage: Stage) -> None:
+        if self.args.summary_nrs:
+            sources = [read_ids_from_file(self.args.summary_nrs)]
+        else:
+            sources = (iter_report_ids(html) for html in sorted(get_htmls(self.args.directory)))
+        for source in sources:
+            for summary_nr in source:
+                summary_nr = summary_nr.strip()
+                duplicate = not summary_nr or summary_nr in self._seen_summary
+                if not duplicate:
+                    self._seen_summary.add(summary_nr)
+                    stage.emit(summary_nr)
+                stage.count()
+
+    def _forward(self, stage: Stage, inspection_nr: str) -> None:
+        # 여러 Summary Nr이 같은 Inspection Nr을 가리킬 수 있으므로 한 번만 넘깁니다.
+        with self._lock:
+            if inspection_nr in self._seen_inspection:
+                return
+            self._seen_inspection.add(inspection_nr)
+        stage.emit(inspection_nr)
+
+    # nrs 단계
+    def _inspection_nrs(self, stage: Stage) -> None:
+        session = create_session()
+        finished = False
+        while not finished:
+            # 하나는 기다려서 받고, 나머지는 이미 큐에 있는 만큼만 묶습니다.
+            batch: List[str] = []
+            item = stage.get()
+            while item is not DONE:
+                resolved = self.index.inspection_nr(item)
+                if resolved:
+                    self._forward(stage, resolved)
+                    stage.count()
+                else:
+                    batch.append(item)
+                if len(batch) >= self.tuner.batch_size:
+                    break
+                try:
+                    item = stage.get(block=False)
+                except queue.Empty:
+                    break
+            finished = item is DONE
+            if not batch:
+                continue
+            pairs = []
+            for summary_nr, inspection_nr in fetch_inspection_nrs(batch, session, self.tuner, self.limiter, base_url=self.args.base_url, cache=self.cache):
+                if inspection_nr:
+                    pairs.append((summary_nr, inspection_nr))
+                    with self._lock:
+                        self._nrs_file.write(f"{summary_nr}: {inspection_nr}\n")
+                        self._nrs_file.flush()
+                    self._forward(stage, inspection_nr)
+                stage.count(failed=not inspection_nr)
+            self.index.add(pairs)
+
+    # detail 단계
+    def _details(self, stage: Stage) -> None:
+        while True:
+            item = stage.get()
+            if item is DONE:
+                return
+            self.ledger.add([item], append=True)
+            # 원장에서 가져가야 시도 횟수와 임대가 기록됩니다. 이미 끝났거나 처리 중이면 건너뜁니다.
+            for inspection_nr in self.ledger.claim_nrs([item]):
+                self.processor.fetch_one(inspection_nr)
+                stage.emit(inspection_nr)
+            stage.count()
+            # 항목마다 원장을 세지 않고, 배치 하나만큼 처리할 때마다 꽉 찬 배치가 있는지 확인해 내보냅니다.
+            with self._lock:
+                self._since_export += 1
+                due = self._since_export >= self.args.batch_size
+                if due:
+                    self._since_export = 0
+            if due:
+                self.processor.export(self.args.output, self.args.batch_size, partial=False)
+
+    def run(self) -> None:
+        from inspection_detail import InspectionDataProcessor, create_scraper
+
+        args = self.args
+        scraper, self.pool = create_scraper(args.engine, not args.no_fallback, args.drivers, args.max_pages, None if args.no_cache else args.cache_dir, limiter=self.limiter, profile=args.browser_profile, base_url=args.base_url)
+        self.processor = InspectionDataProcessor(scraper, self.ledger, create_sinks(args.format, args.output))
+        os.makedirs(args.output, exist_ok=True)
+        os.makedirs(os.path.dirname(args.nrs_output) or ".", exist_ok=True)
+        # 이전 실행에서 끝났지만 내보내지 않은 레코드를 (내보내다 멈춘 것까지) 먼저 내보냅니다.
+        self.ledger.reset_exports()
+        self.processor.export(args.output, args.batch_size)
+
+        stages = [
+            Stage("summary", self._summary_nrs, 1, position=0),
+            Stage("nrs", self._inspection_nrs, args.nrs_workers, args.queue_size, position=1),
+            Stage("detail", self._details, args.detail_workers, args.queue_size, position=2),
+        ]
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+        if args.metrics_port is not None:
+            METRICS.serve(args.metrics_port)
+        if args.metrics_file:
+            METRICS.write_periodically(args.metrics_file)
+        try:
+            with open(args.nrs_output, 'a', encoding='utf-8') as self._nrs_file:
+                for stage in reversed(stages):
+                    stage.start()
+                for stage in stages:
+                    stage.join()
+            # 파이프라인 도중 실패한 항목을 원장의 재시도 횟수만큼 다시 시도하고 남은 레코드를 모두 내보냅니다.
+            self.processor.run(args.batch_size, 0, args.detail_workers, args.output)
+            self.processor.export(args.output, args.batch_size)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+        for stage in stages:
+            logger.info(stage.summary())
+        summary_count, inspection_count = self.index.counts()
+        logger.info(f"ID index: {summary_count:,} Summary Nrs -> {inspection_count:,} unique Inspection Nrs")
+        logger.info(f"Ledger state: {self.ledger.counts()}, rate controller: {self.limiter.stats()}")
+        logger.info(METRICS.summary())
+        if args.metrics_file:
+            METRICS.write_textfile(args.metrics_file)
+
+
+def main(args: argparse.Namespace) -> None:
+    if not args.summary_nrs and not args.directory:
+        logger.error("Provide the search result pages (--directory) or a Summary Nr file (--summary-nrs).")
+        return
+    Pipeline(args).run()
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream search pages -> Summary Nrs -> Inspection Nrs -> inspection details through bounded queues')
+    parser.add_argument('--directory', '-D', type=str, default=None, help='Folder of saved accident search result pages')
+    parser.add_argument('--summary-nrs', '-S', type=str, default=None, help='Text file of Summary Nrs to start from instead of search pages')
+    parser.add_argument('--nrs-output', type=str, default="inspection-nrs/Inspection_Nrs(pipeline).txt", help='File the resolved `id: inspection_nr` lines are appended to (also used to resume)')
+    parser.add_argument('--id-index', type=str, default=DEFAULT_INDEX, help='SQLite Summary Nr <-> Inspection Nr index (see id_index.py)')
+    parser.add_argument('--output', '-O', type=str, default="inspection-detail", help='Output folder of the detail batches')
+    parser.add_argument('--ledger', '-P', type=str, default="inspection-detail/ledger.sqlite", help='SQLite work ledger of the detail stage')
+    parser.add_argument('--queue-size', '-Q', type=int, default=200, help='Maximum number of items waiting between two stages')
+    parser.add_argument('--nrs-workers', type=int, default=2, help='Concurrent Summary Nr -> Inspection Nr requests')
+    parser.add_argument('--nrs-batch-size', '-K', type=int, default=25, help='Initial number of Summary Nrs per request (auto-tuned)')
+    parser.add_argument('--detail-workers', type=int, default=2, help='Concurrent inspection detail fetches')
+    parser.add_argument('--rate', '-R', type=float, default=1.0, help='Initial total requests per second of both network stages, adapted to server responses')
+    parser.add_argument('--max-rate', type=float, default=None, help='Upper bound of the adaptive request rate (default: 4x --rate)')
+    parser.add_argument('--batch-size', '-B', type=int, default=1_000, help='Number of records per exported batch')
+    parser.add_argument('--format', '-F', nargs="+", choices=list(SINKS), default=["parquet"], help='Output formats of the detail batches')
+    parser.add_argument('--engine', '-E', choices=["http", "selenium", "replay"], default="http", help='Extraction engine of the detail stage')
+    parser.add_argument('--no-fallback', action='store_true', help='Do not fall back to Selenium for pages the HTTP engine cannot parse')
+    parser.add_argument('--drivers', '-N', type=int, default=1, help='Number of pooled Chrome drivers')
+    parser.add_argument('--max-pages', type=int, default=200, help='Recycle each Chrome driver after this many pages')
+    parser.add_argument('--browser-profile', choices=["full", "lean"], default="full", help='Chrome profile: full page loads, or lean (headless, eager page load, no images/fonts/CSS/analytics)')
+    parser.add_argument('--base-url', type=str, default=OSHA_BASE_URL, help='Server of the Summary Nr and detail stages (e.g. a local stub_server.py)')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the raw response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read from or write to the response cache')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Write per-phase timings and counters to this Prometheus text file (refreshed while running)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Serve the same metrics at http://127.0.0.1:PORT/metrics while running')
+    args = parser.parse_args()
+
+    main(args)
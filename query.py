@@ -0,0 +1,368 @@
+"""병합된 inspection_detail 데이터셋 위의 SQLite 조회 인덱스.
+
+`inspection_detail_merger.py`가 만든 `output/merged/<table>/*.parquet`(또는 `ParquetSink`의 `parquet/<table>/`)을
+파트 파일 단위로 SQLite에 옮기고, 자주 거르는 열(Inspection Nr, Report ID, NAICS, SIC, Date Opened, Case Status,
+Standard Cited)에 인덱스를, `Investigation Summary Long`과 `Keywords`에 FTS5 전문 검색 인덱스를 둡니다.
+다시 빌드하면 바뀌거나 사라진 파트만 지우고 다시 넣습니다.
+
+열 이름은 원래 이름을 snake_case로 바꾼 것(`Date Opened` → `date_opened`)이고, 값은 `normalize.TYPED_SCHEMAS`의
+타입을 따릅니다. 날짜는 `YYYY-MM-DD` 문자열, 금액은 센트 단위 정수입니다.
+
+Usage:
+    >>> from query import QueryIndex
+    >>> index = QueryIndex("output/query.sqlite")
+    >>> index.build("output/merged")
+    >>> index.search(naics="2361", min_serious=1, opened_from="2023-01-01", opened_to="2023-12-31")
+    >>> index.inspection("1716316.015")["violation_items"]
+
+    $ python query.py build output/merged
+    $ python query.py search --naics 2361xx --min-serious 1 --opened-from 2023-01-01 --opened-to 2023-12-31
+    $ python query.py search --text "fall AND roof" --columns inspection_nr,keywords
+    $ python query.py get 1716316.015
+    $ python query.py sql "SELECT case_status, COUNT(*) FROM inspections GROUP BY 1"
+"""
+# Internal Modules
+from records import SCHEMAS
+from normalize import TYPED_SCHEMAS, normalize_table
+# External Modules
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow as pa
+import threading
+import argparse
+import logging
+import sqlite3
+import json
+import glob
+import time
+import re
+import os
+
+# Root
+logger_name = 'query'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DEFAULT_INDEX = "output/query.sqlite"
+DEFAULT_SOURCE = "output/merged"
+DEFAULT_COLUMNS = ["inspection_nr", "report_id", "date_opened", "case_status", "naics_code", "sic", "inspection_type"]
+NAICS_DIGITS = 6
+
+# 테이블 → 인덱스를 둘 열 묶음
+INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "inspections": [("report_id",), ("naics_code",), ("sic",), ("date_opened",), ("case_status",), ("part",)],
+    "related_activity": [("inspection_nr",), ("part",)],
+    "violation_summary": [("inspection_nr", "label", "serious"), ("part",)],
+    "violation_items": [("inspection_nr",), ("standard_cited",), ("part",)],
+}
+FTS_COLUMNS = ("investigation_summary_long", "keywords")
+
+
+def column_name(name: str) -> str:
+    """원래 열 이름을 SQL 열 이름으로 바꿉니다 (`Safety/Health` → `safety_health`)."""
+    return re.sub(r'\W+', '_', name.lower()).strip('_')
+
+
+def _sql_type(data_type: pa.DataType) -> str:
+    if pa.types.is_integer(data_type) or pa.types.is_boolean(data_type):
+        return "INTEGER"
+    return "TEXT"
+
+
+def _python_columns(table: pa.Table) -> List[List[Any]]:
+    # Arrow 열을 SQLite에 넣을 수 있는 파이썬 값 목록으로 바꿉니다 (날짜는 ISO 문자열, 맵은 JSON).
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_timestamp(field.type):
+            column = pc.strftime(column, format="%Y-%m-%d")
+        elif pa.types.is_dictionary(field.type):
+            column = pc.cast(column, pa.string())
+        elif pa.types.is_boolean(field.type):
+            column = pc.cast(column, pa.int8())
+        values = column.to_pylist()
+        if pa.types.is_map(field.type):
+            values = [json.dumps(dict(value), ensure_ascii=False) if value else None for value in values]
+        columns.append(values)
+    return columns
+
+
+def _naics_range(prefix: str) -> Tuple[int, int]:
+    # `2361`, `2361xx` → 236100 ~ 236199 (인덱스를 쓰는 범위 조건)
+    digits = prefix.rstrip("xX*")
+    if not digits.isdigit() or len(digits) > NAICS_DIGITS:
+        raise ValueError(f"Invalid NAICS prefix: {prefix}")
+    scale = 10 ** (NAICS_DIGITS - len(digits))
+    return int(digits) * scale, (int(digits) + 1) * scale - 1
+
+
+def _prefix_upper(prefix: str) -> str:
+    # 문자열 접두사 조건을 인덱스 범위 조건(`>= prefix AND < upper`)으로 바꿀 때의 상한
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class QueryIndex:
+    """병합된 데이터셋의 SQLite 조회 인덱스. 여러 스레드에서 함께 사용할 수 있습니다."""
+
+    def __init__(self, path: str = DEFAULT_INDEX) -> None:
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db
+        for name, schema in TYPED_SCHEMAS.items():
+            columns = [f"{column_name(field.name)} {_sql_type(field.type)}" for field in schema]
+            if name == "inspections":
+                columns = [f"{column} PRIMARY KEY" if column.startswith("inspection_nr ") else column for column in columns]
+            db.execute(f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(columns + ['part TEXT NOT NULL'])})")
+            for columns_ in INDEXES[name]:
+                db.execute(f"CREATE INDEX IF NOT EXISTS {name}_{'_'.join(columns_)} ON {name} ({', '.join(columns_)})")
+        # Investigation Summary 전문 검색 (inspections를 원본으로 하는 external content FTS5 테이블과 동기화 트리거)
+        fts_columns = ", ".join(FTS_COLUMNS)
+        old_columns = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+        db.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS inspections_fts USING fts5({fts_columns}, content='inspections', content_rowid='rowid')")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS inspections_fts_insert AFTER INSERT ON inspections BEGIN
+            INSERT INTO inspections_fts (rowid, {fts_columns}) VALUES (new.rowid, {", ".join(f"new.{column}" for column in FTS_COLUMNS)}); END""")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS inspections_fts_delete AFTER DELETE ON inspections BEGIN
+            INSERT INTO inspections_fts (inspections_fts, rowid, {fts_columns}) VALUES ('delete', old.rowid, {old_columns}); END""")
+        db.execute("CREATE TABLE IF NOT EXISTS parts (name TEXT PRIMARY KEY, mtime REAL NOT NULL)")
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않으므로 스레드마다 따로 엽니다.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _delete_part(self, db: sqlite3.Connection, part: str) -> None:
+        for name in TYPED_SCHEMAS:
+            db.execute(f"DELETE FROM {name} WHERE part = ?", (part,))
+        db.execute("DELETE FROM parts WHERE name = ?", (part,))
+
+    def _insert(self, db: sqlite3.Connection, name: str, table: pa.Table, part: str) -> None:
+        if table.schema.equals(SCHEMAS[name]):
+            # 타입 변환 전의 테이블(ParquetSink 출력)은 여기서 변환합니다.
+            table, _ = normalize_table(name, table)
+        table = table.select([field.name for field in TYPED_SCHEMAS[name]])
+        names = [column_name(field.name) for field in TYPED_SCHEMAS[name]] + ["part"]
+        rows = zip(*_python_columns(table), [part] * table.num_rows)
+        db.executemany(f"INSERT INTO {name} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", rows)
+
+    def _load_part(self, source: str, part: str, mtime: float) -> int:
+        db = self._db
+        tables = {name: pq.read_table(path) for name in TYPED_SCHEMAS if os.path.exists(path := os.path.join(source, name, f"{part}.parquet"))}
+        nrs = [(nr,) for nr in tables["inspections"].column("Inspection Nr").to_pylist()]
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # 같은 Inspection Nr이 이전 파트에 있으면 (병합하지 않은 싱크 출력) 나중 파트의 행으로 바꿉니다.
+            for name in TYPED_SCHEMAS:
+                db.executemany(f"DELETE FROM {name} WHERE inspection_nr = ?", nrs)
+            for name, table in tables.items():
+                self._insert(db, name, table, part)
+            db.execute("INSERT INTO parts (name, mtime) VALUES (?, ?)", (part, mtime))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return len(nrs)
+
+    def build(self, source: str = DEFAULT_SOURCE) -> int:
+        """`source/<table>/<part>.parquet`과 인덱스를 맞춥니다. 새로 생겼거나 바뀐 파트만 다시 읽습니다.
+
+        Args:
+            source (str): 테이블별 하위 폴더가 있는 폴더 (예: `output/merged`, `inspection-detail/parquet`).
+
+        Returns:
+            int: 다시 읽은 파트 수.
+        """
+        current: Dict[str, float] = {}
+        for path in glob.glob(os.path.join(source, "inspections", "*.parquet")):
+            part = os.path.basename(path)[:-len(".parquet")]
+            current[part] = max(os.path.getmtime(p) for name in TYPED_SCHEMAS if os.path.exists(p := os.path.join(source, name, f"{part}.parquet")))
+        db = self._db
+        known = dict(db.execute("SELECT name, mtime FROM parts").fetchall())
+        changed = sorted((part for part, mtime in current.items() if known.get(part) != mtime), key=lambda part: (current[part], part))
+        # 바뀌거나 사라진 파트를 먼저 모두 지워야, 파트 사이를 옮겨 간 Inspection Nr이 충돌하지 않습니다.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for part in set(known) - set(current) | set(changed):
+                self._delete_part(db, part)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        rows = 0
+        for part in changed:
+            rows += self._load_part(source, part, current[part])
+        db.execute("ANALYZE")
+        logger.info(f"Loaded {len(changed)} parts ({rows:,} inspections), removed {len(set(known) - set(current))}; {self.count():,} inspections indexed")
+        return len(changed)
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM inspections").fetchone()[0]
+
+    def sql(self, query: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """임의의 SQL을 실행해 행을 dict로 돌려줍니다."""
+        return [dict(row) for row in self._db.execute(query, params)]
+
+    def inspection(self, inspection_nr: str) -> Optional[Dict[str, Any]]:
+        """Inspection Nr 하나의 기본 정보와 자식 테이블 행들 (`related_activity`, `violation_summary`, `violation_items`)."""
+        rows = self.sql("SELECT * FROM inspections WHERE inspection_nr = ?", (inspection_nr,))
+        if not rows:
+            return None
+        record = rows[0]
+        for name in ("related_activity", "violation_summary", "violation_items"):
+            record[name] = self.sql(f"SELECT * FROM {name} WHERE inspection_nr = ? ORDER BY rowid", (inspection_nr,))
+        return record
+
+    def search(
+        self,
+        naics: Optional[str] = None,
+        sic: Optional[int] = None,
+        report_id: Optional[str] = None,
+        case_status: Optional[str] = None,
+        opened_from: Optional[str] = None,
+        opened_to: Optional[str] = None,
+        standard: Optional[str] = None,
+        min_serious: Optional[int] = None,
+        summary_label: str = "Initial Violations",
+        text: Optional[str] = None,
+        columns: Optional[Iterable[str]] = None,
+        limit: Optional[int] = 100,
+    ) -> List[Dict[str, Any]]:
+        """조건에 맞는 점검을 Date Opened 순서로 찾습니다. 모든 조건은 AND로 묶이며 인덱스를 사용합니다.
+
+        Args:
+            naics (Optional[str]): NAICS 코드 접두사 (`2361`, `2361xx`).
+            sic (Optional[int]): SIC 코드.
+            report_id (Optional[str]): Report ID (점검 사무소).
+            case_status (Optional[str]): `OPEN`, `CLOSED` 등.
+            opened_from (Optional[str]): Date Opened 하한 (`YYYY-MM-DD`, 포함).
+            opened_to (Optional[str]): Date Opened 상한 (`YYYY-MM-DD`, 포함).
+            standard (Optional[str]): Standard Cited 접두사 (`1926` → 건설업 기준 위반이 있는 점검).
+            min_serious (Optional[int]): Violation Summary의 `summary_label` 행 Serious 건수 하한.
+            summary_label (str): `min_serious`를 적용할 Violation Summary 행 (`Initial Violations`, `Current Violations`).
+            text (Optional[str]): `Investigation Summary Long`/`Keywords`에 대한 FTS5 검색식 (`fall AND roof`).
+            columns (Optional[Iterable[str]]): 돌려줄 inspections 열. 없으면 모든 열.
+            limit (Optional[int]): 최대 행 수. None이면 제한 없음.
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        if naics:
+            where.append("i.naics_code BETWEEN ? AND ?")
+            params += _naics_range(naics)
+        if sic is not None:
+            where.append("i.sic = ?")
+            params.append(sic)
+        if report_id:
+            where.append("i.report_id = ?")
+            params.append(report_id)
+        if case_status:
+            where.append("i.case_status = ?")
+            params.append(case_status)
+        if opened_from:
+            where.append("i.date_opened >= ?")
+            params.append(opened_from)
+        if opened_to:
+            where.append("i.date_opened <= ?")
+            params.append(opened_to)
+        if standard:
+            where.append("EXISTS (SELECT 1 FROM violation_items v WHERE v.inspection_nr = i.inspection_nr AND v.standard_cited >= ? AND v.standard_cited < ?)")
+            params += [standard, _prefix_upper(standard)]
+        if min_serious is not None:
+            where.append("EXISTS (SELECT 1 FROM violation_summary s WHERE s.inspection_nr = i.inspection_nr AND s.label = ? AND s.serious >= ?)")
+            params += [summary_label, min_serious]
+        if text:
+            where.append("i.rowid IN (SELECT rowid FROM inspections_fts WHERE inspections_fts MATCH ?)")
+            params.append(text)
+        select = ", ".join(f"i.{column_name(column)}" for column in columns) if columns else "i.*"
+        query = f"SELECT {select} FROM inspections i"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY i.date_opened, i.inspection_nr"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.sql(query, params)
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def _print_rows(rows: List[Dict[str, Any]]) -> None:
+    # 탭으로 구분한 표 (첫 줄은 열 이름)
+    if not rows:
+        return
+    print("\t".join(rows[0]))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row.values()))
+
+
+def main(args: argparse.Namespace) -> None:
+    index = QueryIndex(args.index)
+    started = time.perf_counter()
+    if args.command == "build":
+        index.build(args.source)
+        return
+    if args.command == "get":
+        for nr in args.nrs:
+            record = index.inspection(nr)
+            print(json.dumps(record, ensure_ascii=False, indent=2) if record else f"{nr}: not found")
+        rows = args.nrs
+    elif args.command == "sql":
+        rows = index.sql(args.query)
+        _print_rows(rows)
+    else:
+        rows = index.search(
+            naics=args.naics, sic=args.sic, report_id=args.report_id, case_status=args.case_status,
+            opened_from=args.opened_from, opened_to=args.opened_to, standard=args.standard,
+            min_serious=args.min_serious, summary_label=args.summary_label, text=args.text,
+            columns=args.columns.split(","), limit=args.limit or None,
+        )
+        _print_rows(rows)
+    logger.info(f"{len(rows):,} rows in {(time.perf_counter() - started) * 1000:,.1f} ms")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query index over the merged inspection_detail dataset')
+    parser.add_argument('--index', type=str, default=DEFAULT_INDEX, help='Path to the query index SQLite file')
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help='Load new or changed Parquet parts into the index')
+    build.add_argument('source', nargs="?", default=DEFAULT_SOURCE, help='Folder with one sub-folder of Parquet files per table')
+    get = commands.add_parser("get", help='Show inspections with all child rows as JSON')
+    get.add_argument('nrs', nargs="+", help='Inspection Nrs')
+    sql = commands.add_parser("sql", help='Run an SQL query against the index')
+    sql.add_argument('query', type=str)
+    search = commands.add_parser("search", help='Filter inspections')
+    search.add_argument('--naics', type=str, help='NAICS code prefix (e.g. 2361 or 2361xx)')
+    search.add_argument('--sic', type=int, help='SIC code')
+    search.add_argument('--report-id', type=str, help='Report ID')
+    search.add_argument('--case-status', type=str, help='Case status (OPEN, CLOSED)')
+    search.add_argument('--opened-from', type=str, help='Earliest Date Opened (YYYY-MM-DD)')
+    search.add_argument('--opened-to', type=str, help='Latest Date Opened (YYYY-MM-DD)')
+    search.add_argument('--standard', type=str, help='Standard Cited prefix (e.g. 1926)')
+    search.add_argument('--min-serious', type=int, help='Minimum Serious violations')
+    search.add_argument('--summary-label', type=str, default="Initial Violations", help='Violation Summary row used by --min-serious')
+    search.add_argument('--text', type=str, help='FTS5 query on Investigation Summary Long and Keywords')
+    search.add_argument('--columns', type=str, default=",".join(DEFAULT_COLUMNS), help='Comma-separated inspections columns to print')
+    search.add_argument('--limit', type=int, default=100, help='Maximum rows (0 for no limit)')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,421 @@
+from email.utils import parsedate_to_datetime
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Union
+import threading
+import logging
+import asyncio
+import sqlite3
+import random
+import time
+import os
+
+logger = logging.getLogger('rate_limit')
+
+
+class TokenBucket:
+    """요청 속도를 제한하는 토큰 버킷.
+
+    요청마다 무작위로 `sleep`하는 대신, 모든 요청이 하나의 버킷을 공유하여 전체 요청 속도가
+    `rate`(초당 요청 수)를 넘지 않도록 합니다. 토큰은 예약 방식으로 차감되므로 여러 스레드나
+    코루틴이 동시에 기다려도 순서대로 간격을 두고 깨어납니다.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """TokenBucket 클래스의 초기화 메서드.
+
+        Args:
+            rate (float): 초당 채워지는 토큰 수 (= 허용하는 초당 요청 수).
+            capacity (Optional[float]): 한 번에 몰아서 쓸 수 있는 최대 토큰 수. 기본값은 `max(1, rate)`.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float = 1) -> float:
+        """토큰을 예약하고, 토큰이 채워질 때까지 기다려야 하는 시간(초)을 반환합니다."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        """토큰을 얻을 때까지 현재 스레드를 멈춥니다."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """토큰을 얻을 때까지 현재 코루틴을 멈춥니다."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float) -> None:
+        """속도를 바꿉니다. 이미 쌓인 토큰은 새 용량을 넘지 않도록 잘라냅니다."""
+        with self._lock:
+            self._set_rate(rate)
+
+    def _set_rate(self, rate: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def adjust(self, factor: float, step: float, min_rate: float, max_rate: float, cooldown: Optional[float] = None) -> Optional[float]:
+        """속도를 `rate * factor + step`으로 바꾸고 (`min_rate`~`max_rate`) 새 속도를 반환합니다.
+
+        `cooldown`이 주어지면 줄이는 조정으로 보고, 마지막으로 줄인 지 `cooldown`초가 지나지 않았다면
+        바꾸지 않고 None을 반환합니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if cooldown is not None:
+                if now - self._last_decrease < cooldown:
+                    return None
+                self._last_decrease = now
+            self._set_rate(min(max_rate, max(min_rate, self.rate * factor + step)))
+            return self.rate
+
+    def record(self, status: Optional[int], latency: Optional[float] = None, retry_after: Optional[str] = None) -> None:
+        """고정 속도 버킷은 응답을 보고 속도를 바꾸지 않습니다 (`AdaptiveRateController`와 같은 인터페이스)."""
+
+
+class SharedTokenBucket:
+    """한 머신의 여러 프로세스가 함께 쓰는 토큰 버킷.
+
+    버킷 상태(남은 토큰, 갱신 시각, 속도)를 SQLite 파일에 두고 `BEGIN IMMEDIATE` 트랜잭션 안에서
+    예약하므로, 워커가 몇 개든 전체 요청 속도는 `rate`를 넘지 않습니다. WAL 모드는 네트워크 파일
+    시스템에서 동작하지 않으므로 파일은 로컬 디스크에 두어야 합니다.
+    """
+
+    def __init__(self, path: str, rate: Optional[float] = None, capacity: Optional[float] = None, name: str = "default") -> None:
+        """SharedTokenBucket 클래스의 초기화 메서드.
+
+        Args:
+            path (str): 버킷 상태를 저장할 SQLite 파일 경로.
+            rate (Optional[float]): 전체 초당 요청 수. None이면 파일에 이미 설정된 값(코디네이터가 정한 값)을 씁니다.
+            capacity (Optional[float]): 한 번에 몰아서 쓸 수 있는 최대 토큰 수. 기본값은 `max(1, rate)`.
+            name (str): 한 파일에 여러 버킷을 둘 때의 이름.
+        """
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, rate REAL NOT NULL, capacity REAL NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, last_decrease REAL NOT NULL DEFAULT 0)")
+        if "last_decrease" not in {row[1] for row in db.execute("PRAGMA table_info(buckets)")}:
+            # 쿨다운 열이 생기기 전에 만들어진 파일
+            db.execute("ALTER TABLE buckets ADD COLUMN last_decrease REAL NOT NULL DEFAULT 0")
+        if rate is not None:
+            capacity = capacity if capacity is not None else max(1.0, rate)
+            db.execute(
+                """INSERT INTO buckets (name, rate, capacity, tokens, updated) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET rate = excluded.rate, capacity = excluded.capacity, tokens = MIN(tokens, excluded.capacity)""",
+                (name, rate, capacity, capacity, time.time()),
+            )
+        elif db.execute("SELECT 1 FROM buckets WHERE name = ?", (name,)).fetchone() is None:
+            raise ValueError(f"Rate for bucket {name!r} is not set in {path}")
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    @property
+    def rate(self) -> float:
+        return self._db.execute("SELECT rate FROM buckets WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def _reserve(self, tokens: float = 1) -> float:
+        """토큰을 예약하고, 토큰이 채워질 때까지 기다려야 하는 시간(초)을 반환합니다."""
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rate, capacity, available, updated = db.execute("SELECT rate, capacity, tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            available = min(capacity, available + max(0.0, now - updated) * rate) - tokens
+            db.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (available, max(now, updated), self.name))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return 0.0 if available >= 0 else -available / rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        """토큰을 얻을 때까지 현재 스레드를 멈춥니다."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """토큰을 얻을 때까지 현재 코루틴을 멈춥니다."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float) -> None:
+        """모든 워커가 함께 쓰는 속도를 바꿉니다."""
+        capacity = max(1.0, rate)
+        self._db.execute("UPDATE buckets SET rate = ?, capacity = ?, tokens = MIN(tokens, ?) WHERE name = ?", (rate, capacity, capacity, self.name))
+
+    def adjust(self, factor: float, step: float, min_rate: float, max_rate: float, cooldown: Optional[float] = None) -> Optional[float]:
+        """`TokenBucket.adjust`와 같지만, 쿨다운 확인과 속도 변경을 한 `BEGIN IMMEDIATE` 트랜잭션에서 합니다.
+
+        마지막으로 줄인 시각도 파일에 두므로, 같은 장애를 여러 워커가 동시에 보더라도 전체 속도는
+        쿨다운마다 한 번만 줄어듭니다.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rate, last_decrease = db.execute("SELECT rate, last_decrease FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            if cooldown is not None and now - last_decrease < cooldown:
+                db.execute("COMMIT")
+                return None
+            rate = min(max_rate, max(min_rate, rate * factor + step))
+            capacity = max(1.0, rate)
+            db.execute(
+                "UPDATE buckets SET rate = ?, capacity = ?, tokens = MIN(tokens, ?), last_decrease = ? WHERE name = ?",
+                (rate, capacity, capacity, now if cooldown is not None else last_decrease, self.name),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return rate
+
+    def record(self, status: Optional[int], latency: Optional[float] = None, retry_after: Optional[str] = None) -> None:
+        """고정 속도 버킷은 응답을 보고 속도를 바꾸지 않습니다 (`AdaptiveRateController`와 같은 인터페이스)."""
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """지수 백오프에 full jitter를 적용한 대기 시간: `[0, min(cap, base * 2**attempt)]` 사이의 난수.
+
+    여러 워커가 같은 순간에 실패해도 재시도가 한꺼번에 몰리지 않습니다.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value: Union[str, float, None]) -> Optional[float]:
+    """`Retry-After` 헤더 값(초 또는 HTTP 날짜)을 기다려야 하는 시간(초)으로 바꿉니다."""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_failure(status: Optional[int]) -> bool:
+    """속도를 낮춰야 하는 응답인지 여부. 네트워크 오류(`None`), 429, 5xx가 실패입니다.
+
+    404 같은 다른 4xx는 요청 자체의 문제이므로 서버 상태와 무관한 것으로 봅니다.
+    """
+    return status is None or status == 429 or status >= 500
+
+
+class AdaptiveRateController:
+    """서버 응답을 보고 요청 속도를 조절하는 AIMD(additive increase, multiplicative decrease) 제어기.
+
+    모든 fetcher가 `TokenBucket` 대신 이 제어기 하나를 공유합니다. 요청 전에 `acquire()`를,
+    응답을 받은 뒤 `record(status, latency, retry_after)`를 호출하면 됩니다.
+
+    - 성공이 이어지면 초당 요청 수를 대략 1초에 `increase`씩 늘립니다 (`max_rate`까지).
+    - 429/5xx/네트워크 오류나, 최근 지연 시간의 p95가 `target_latency`를 넘으면 `decrease`배로
+      줄입니다 (`min_rate`까지). 한 번 줄인 뒤 `cooldown`초 동안은 다시 줄이지 않으므로 한꺼번에
+      들어온 실패 응답들에 과하게 반응하지 않습니다.
+    - `Retry-After` 헤더가 오면 그 시간 동안 모든 요청을 멈춥니다.
+    - 5xx나 네트워크 오류가 `failure_threshold`번 연속되면 회로 차단기를 열어 `open_timeout`초 동안 요청을 멈추고,
+      그 뒤 요청 하나만 시험 삼아(half-open) 보냅니다. 시험 요청이 실패하면 대기 시간을 두 배로 늘리고,
+      `open_timeout`초 안에 결과가 기록되지 않으면 다음 요청을 시험 요청으로 보냅니다.
+
+    `bucket`에 `SharedTokenBucket`을 넘기면 조절된 속도를 여러 프로세스가 함께 씁니다. 각 프로세스의
+    제어기는 버킷에 저장된 현재 속도를 기준으로 올리고 내리며, 줄일 때의 쿨다운도 버킷에서 함께 확인합니다.
+    """
+
+    def __init__(self, rate: Optional[float] = None, min_rate: float = 0.05, max_rate: Optional[float] = None, increase: float = 0.1, decrease: float = 0.5, target_latency: float = 5.0, window: int = 100, cooldown: float = 2.0, failure_threshold: int = 5, open_timeout: float = 30.0, max_open_timeout: float = 600.0, bucket: Optional[Any] = None) -> None:
+        """AdaptiveRateController 클래스의 초기화 메서드.
+
+        Args:
+            rate (Optional[float]): 시작 초당 요청 수. `bucket`이 주어지면 None일 때 버킷의 현재 속도를 씁니다.
+            min_rate (float): 줄일 수 있는 최저 속도.
+            max_rate (Optional[float]): 늘릴 수 있는 최고 속도. 기본값은 시작 속도의 4배.
+            increase (float): 성공이 이어질 때 대략 1초마다 더하는 초당 요청 수.
+            decrease (float): 실패하거나 느려졌을 때 속도에 곱하는 값.
+            target_latency (float): 최근 응답의 p95 지연 시간(초)이 이 값을 넘으면 속도를 줄입니다.
+            window (int): 지연 시간과 오류율을 계산할 최근 응답 수.
+            cooldown (float): 속도를 줄인 뒤 다시 줄이기까지 기다리는 시간(초).
+            failure_threshold (int): 회로 차단기를 여는 연속 실패(429 제외) 횟수.
+            open_timeout (float): 회로 차단기가 열린 뒤 시험 요청을 보내기까지의 시간(초).
+            max_open_timeout (float): 시험 요청이 계속 실패할 때 늘어나는 대기 시간의 상한(초).
+            bucket (Optional[Any]): 속도를 적용할 버킷 (`TokenBucket`, `SharedTokenBucket`). 기본값은 새 `TokenBucket`.
+        """
+        if bucket is None:
+            bucket = TokenBucket(rate if rate is not None else 1.0)
+        elif rate is not None:
+            bucket.set_rate(rate)
+        self.bucket = bucket
+        start = bucket.rate
+        self.min_rate = min(min_rate, start)
+        self.max_rate = max_rate if max_rate is not None else start * 4
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.base_open_timeout = open_timeout
+        self.open_timeout = open_timeout
+        self.max_open_timeout = max_open_timeout
+        self.state = "closed"
+        self._rate = start
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _adjust(self, factor: float, step: float, cooldown: Optional[float] = None) -> bool:
+        # 공유 버킷이면 다른 프로세스가 바꾼 속도를 기준으로, 버킷 안에서 한 번에 조절합니다.
+        rate = self.bucket.adjust(factor, step, self.min_rate, self.max_rate, cooldown)
+        if rate is None:
+            return False
+        self._rate = rate
+        return True
+
+    def _gate(self) -> float:
+        """지금 요청을 보내도 되면 0, 아니면 다시 확인할 때까지 기다릴 시간(초)을 반환합니다."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self._opened_at + self.open_timeout:
+                    return self._opened_at + self.open_timeout - now
+                self.state = "half-open"
+                logger.info("Circuit half-open; sending a probe request")
+            if self.state == "half-open":
+                # 시험 요청 하나의 결과가 나올 때까지 나머지는 기다립니다. 시험 요청을 보낸 쪽이 `record()` 없이
+                # 사라지면(예외, 취소된 코루틴) `open_timeout`이 지난 뒤 다른 호출이 시험 요청을 넘겨받습니다.
+                if self._probing and now < self._probe_started + self.open_timeout:
+                    return min(0.5, self._probe_started + self.open_timeout - now)
+                if self._probing:
+                    logger.warning(f"No result from the probe request after {self.open_timeout:.0f}s; sending another")
+                self._probing = True
+                self._probe_started = now
+                return 0.0
+            return max(0.0, self._paused_until - now)
+
+    def acquire(self, tokens: float = 1) -> None:
+        """회로가 닫혀 있고 `Retry-After` 대기가 끝난 뒤, 토큰을 얻을 때까지 현재 스레드를 멈춥니다."""
+        while True:
+            wait = self._gate()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.bucket.acquire(tokens)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """`acquire`의 코루틴 버전."""
+        while True:
+            wait = self._gate()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await self.bucket.acquire_async(tokens)
+
+    def _decrease(self, reason: str) -> bool:
+        if not self._adjust(self.decrease, 0.0, self.cooldown):
+            return False
+        self._successes = 0
+        logger.info(f"Rate decreased to {self._rate:.3g} req/s ({reason})")
+        return True
+
+    def _open(self, now: float) -> None:
+        if self.state == "half-open":
+            self.open_timeout = min(self.max_open_timeout, self.open_timeout * 2)
+        self.state = "open"
+        self._opened_at = now
+        self._probing = False
+        logger.warning(f"Circuit open after {self._consecutive_failures} consecutive failures; pausing {self.open_timeout:.0f}s")
+
+    def record(self, status: Optional[int], latency: Optional[float] = None, retry_after: Union[str, float, None] = None) -> None:
+        """응답 하나의 결과를 반영합니다.
+
+        Args:
+            status (Optional[int]): HTTP 상태 코드. 네트워크 오류나 시간 초과는 None.
+            latency (Optional[float]): 응답까지 걸린 시간(초).
+            retry_after (Union[str, float, None]): 응답의 `Retry-After` 헤더 값.
+        """
+        failure = is_failure(status)
+        with self._lock:
+            now = time.monotonic()
+            self._outcomes.append(not failure)
+            pause = parse_retry_after(retry_after)
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+                logger.info(f"Server asked to retry after {pause:.1f}s")
+            if failure:
+                # 429는 속도를 줄이고 Retry-After만큼 쉬는 것으로 충분하므로, 회로 차단기는 장애(5xx, 네트워크 오류)로만 엽니다.
+                if status != 429:
+                    self._consecutive_failures += 1
+                self._decrease(f"status {status}")
+                if self.state == "half-open" or self._consecutive_failures >= self.failure_threshold:
+                    self._open(now)
+                return
+
+            self._consecutive_failures = 0
+            if self.state == "half-open":
+                self.state = "closed"
+                self._probing = False
+                self.open_timeout = self.base_open_timeout
+                logger.info("Circuit closed; probe request succeeded")
+            if latency is not None:
+                self._latencies.append(latency)
+                if len(self._latencies) >= 10 and self._percentile(0.95) > self.target_latency:
+                    # 같은 느린 응답들로 쿨다운마다 다시 줄이지 않도록, 줄인 뒤에는 새로 쌓인 지연 시간만 봅니다.
+                    if self._decrease(f"p95 latency {self._percentile(0.95):.2f}s"):
+                        self._latencies.clear()
+                    return
+            # 현재 속도만큼(대략 1초 분량) 성공이 쌓일 때마다 increase씩 올립니다.
+            self._successes += 1
+            if self._successes >= max(1.0, self._rate):
+                self._successes = 0
+                self._adjust(1.0, self.increase)
+
+    def _percentile(self, q: float) -> float:
+        values = sorted(self._latencies)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+    def percentile(self, q: float) -> float:
+        """최근 `window`개 응답 지연 시간의 분위수(`q`는 0~1)."""
+        with self._lock:
+            return self._percentile(q)
+
+    def stats(self) -> Dict[str, Any]:
+        """현재 속도, 회로 상태, 최근 오류율과 지연 시간 분위수."""
+        with self._lock:
+            errors = self._outcomes.count(False)
+            return {
+                "rate": self._rate,
+                "state": self.state,
+                "error_rate": errors / len(self._outcomes) if self._outcomes else 0.0,
+                "p50": self._percentile(0.5),
+                "p95": self._percentile(0.95),
+            }
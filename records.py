@@ -0,0 +1,280 @@
+"""inspection_detail 레코드의 압축된 메모리 표현과 Arrow 열 빌더.
+
+`fetch_inspection_details`가 돌려주는 넓은 dict는 `Violation Item 37 Initial Penalty` 같은 키를 레코드마다
+수백 개씩 새로 만들고 해시합니다. 여기서는 레코드를 한 번만 훑어
+- 기본 정보는 `HEADER_FIELDS` 순서의 튜플 하나로,
+- 관련 활동, 위반 요약, 위반 항목은 `__slots__` 데이터클래스의 목록으로,
+- 값 종류가 적은 필드(`CATEGORICAL_FIELDS`)의 값은 `sys.intern`으로 같은 문자열 객체를 공유하도록
+바꿔 둡니다. 키 문자열은 레코드에 남지 않습니다.
+
+`RecordBatchBuilder`는 이 레코드들을 테이블별 열 목록에 바로 쌓고 `chunk_size` 행마다 Arrow 배열로
+바꾸므로, 내보낼 때 행 dict를 다시 만들지 않고 파이썬 객체로 쌓이는 양도 청크 하나로 제한됩니다.
+
+Usage:
+    >>> from records import InspectionRecord, RecordBatchBuilder
+    >>> record = InspectionRecord.from_dict(details)
+    >>> builder = RecordBatchBuilder()
+    >>> builder.append(record)
+    >>> tables = builder.finish()  # {"inspections": pa.Table, "related_activity": ..., ...}
+"""
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple, Union
+import pyarrow as pa
+import json
+import sys
+import re
+
+# 레코드의 기본 정보 필드 (fetch_inspection_details가 추출하는 순서)
+HEADER_FIELDS: List[str] = [
+    "Inspection Office", "Inspection Nr", "Report ID", "Date Opened", "Case Status", "Site Address", "Mailing Address",
+    "Union Status", "SIC", "NAICS", "Inspection Type", "Scope", "Advanced Notice", "Ownership", "Safety/Health",
+    "Close Conference", "Emphasis", "Case Closed", "Investigation Summary Short", "Investigation Summary Long", "Keywords",
+]
+RELATED_ACTIVITY_FIELDS: List[str] = ["Type", "Nr", "Safety", "Health"]
+VIOLATION_SUMMARY_FIELDS: List[str] = ["Serious", "Willful", "Repeat", "Other", "Unclass", "Total"]
+VIOLATION_ITEM_FIELDS: List[str] = [
+    "Citation ID", "Citation Type", "Standard Cited", "Issuance Date", "Abatement Due Date", "Current Penalty",
+    "Initial Penalty", "FTA Penalty", "Contest", "Latest Event", "Note",
+]
+# 값의 종류가 적어 dictionary 인코딩하는 필드
+CATEGORICAL_FIELDS = {
+    "Inspection Office", "Case Status", "Union Status", "Inspection Type", "Scope", "Advanced Notice", "Ownership",
+    "Safety/Health", "Emphasis", "Type", "Safety", "Health", "Label", "Citation Type", "Contest", "Latest Event",
+}
+
+RELATED_ACTIVITY_KEY = re.compile(r'^Related Activity (Type|Nr|Safety|Health) (\d+)$')
+VIOLATION_ITEM_KEY = re.compile(r'^Violation Item (\d+) (.+)$')
+VIOLATION_SUMMARY_KEY = re.compile(r'^(.+) (Serious|Willful|Repeat|Other|Unclass|Total)$')
+
+# 추출 순서상 테이블과 Investigation Summary 뒤에 오는 기본 정보 필드
+_TRAILING_FIELDS = ("Investigation Summary Short", "Investigation Summary Long", "Keywords")
+_HEADER_INDEX = {name: i for i, name in enumerate(HEADER_FIELDS)}
+_CATEGORICAL_HEADER = tuple(name in CATEGORICAL_FIELDS for name in HEADER_FIELDS)
+
+
+def _field_type(name: str) -> pa.DataType:
+    return pa.dictionary(pa.int32(), pa.string()) if name in CATEGORICAL_FIELDS else pa.string()
+
+
+SCHEMAS: Dict[str, pa.Schema] = {
+    "inspections": pa.schema([(name, _field_type(name)) for name in HEADER_FIELDS] + [("Extra", pa.map_(pa.string(), pa.string()))]),
+    "related_activity": pa.schema([("Inspection Nr", pa.string()), ("Item", pa.int32())] + [(name, _field_type(name)) for name in RELATED_ACTIVITY_FIELDS]),
+    "violation_summary": pa.schema([("Inspection Nr", pa.string()), ("Label", _field_type("Label"))] + [(name, pa.string()) for name in VIOLATION_SUMMARY_FIELDS]),
+    "violation_items": pa.schema([("Inspection Nr", pa.string()), ("Item", pa.int32())] + [(name, _field_type(name)) for name in VIOLATION_ITEM_FIELDS]),
+}
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass
+class RelatedActivity:
+    """Related Activity 테이블의 한 행."""
+    __slots__ = ("item", "type", "nr", "safety", "health")
+    FIELDS: ClassVar[Tuple[str, ...]] = ("Item",) + tuple(RELATED_ACTIVITY_FIELDS)
+    item: int
+    type: Optional[str]
+    nr: Optional[str]
+    safety: Optional[str]
+    health: Optional[str]
+
+
+@dataclass
+class ViolationSummary:
+    """Violation Summary 테이블의 한 행 (`Label`은 행 머리글, 예: `Initial Violations`)."""
+    __slots__ = ("label", "serious", "willful", "repeat", "other", "unclass", "total")
+    FIELDS: ClassVar[Tuple[str, ...]] = ("Label",) + tuple(VIOLATION_SUMMARY_FIELDS)
+    label: str
+    serious: Optional[str]
+    willful: Optional[str]
+    repeat: Optional[str]
+    other: Optional[str]
+    unclass: Optional[str]
+    total: Optional[str]
+
+
+@dataclass
+class ViolationItem:
+    """Violation Items 테이블의 한 행."""
+    __slots__ = ("item", "citation_id", "citation_type", "standard_cited", "issuance_date", "abatement_due_date", "current_penalty", "initial_penalty", "fta_penalty", "contest", "latest_event", "note")
+    FIELDS: ClassVar[Tuple[str, ...]] = ("Item",) + tuple(VIOLATION_ITEM_FIELDS)
+    item: int
+    citation_id: Optional[str]
+    citation_type: Optional[str]
+    standard_cited: Optional[str]
+    issuance_date: Optional[str]
+    abatement_due_date: Optional[str]
+    current_penalty: Optional[str]
+    initial_penalty: Optional[str]
+    fta_penalty: Optional[str]
+    contest: Optional[str]
+    latest_event: Optional[str]
+    note: Optional[str]
+
+
+def _row(cls: type, key: Any, fields: Dict[str, Any]) -> Any:
+    # FIELDS[0]은 행 번호나 머리글이고, 나머지는 열 이름 순서입니다. 없는 열은 None입니다.
+    return cls(key, *(_intern(fields[name]) if name in CATEGORICAL_FIELDS and name in fields else fields.get(name) for name in cls.FIELDS[1:]))
+
+
+def _values(row: Any) -> List[Any]:
+    return [getattr(row, slot) for slot in row.__slots__]
+
+
+@dataclass
+class InspectionRecord:
+    """inspection_detail 레코드 하나.
+
+    Attributes:
+        header (Tuple[Optional[str], ...]): `HEADER_FIELDS` 순서의 기본 정보. 없는 필드는 None.
+        related (List[RelatedActivity]): 관련 활동 (번호 순).
+        summary (List[ViolationSummary]): 위반 요약 (페이지에 나온 순서).
+        items (List[ViolationItem]): 위반 항목 (번호 순).
+        extra (Tuple[Tuple[str, str], ...]): 위에 속하지 않는 나머지 키와 값 (Investigation Summary의 `Label: value` 등).
+    """
+    __slots__ = ("header", "related", "summary", "items", "extra")
+    header: Tuple[Optional[str], ...]
+    related: List[RelatedActivity]
+    summary: List[ViolationSummary]
+    items: List[ViolationItem]
+    extra: Tuple[Tuple[str, str], ...]
+
+    @property
+    def inspection_nr(self) -> str:
+        return self.header[_HEADER_INDEX["Inspection Nr"]] or ""
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """기본 정보 필드 값 (dict 레코드의 `get`과 같은 용도)."""
+        value = self.header[_HEADER_INDEX[name]] if name in _HEADER_INDEX else None
+        return default if value is None else value
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "InspectionRecord":
+        """넓은 레코드(`Violation Item 37 Initial Penalty` 등)를 한 번 훑어 압축된 레코드로 바꿉니다."""
+        header: List[Any] = [None] * len(HEADER_FIELDS)
+        extra: List[Tuple[str, str]] = []
+        related: Dict[int, Dict[str, Any]] = {}
+        items: Dict[int, Dict[str, Any]] = {}
+        summary: Dict[str, Dict[str, Any]] = {}
+        for key, value in record.items():
+            index = _HEADER_INDEX.get(key)
+            if index is not None:
+                header[index] = _intern(value) if _CATEGORICAL_HEADER[index] else value
+                continue
+            match = RELATED_ACTIVITY_KEY.match(key)
+            if match:
+                related.setdefault(int(match[2]), {})[match[1]] = value
+                continue
+            match = VIOLATION_ITEM_KEY.match(key)
+            if match and match[2] in VIOLATION_ITEM_FIELDS:
+                items.setdefault(int(match[1]), {})[match[2]] = value
+                continue
+            match = VIOLATION_SUMMARY_KEY.match(key)
+            if match:
+                summary.setdefault(match[1], {})[match[2]] = value
+                continue
+            extra.append((key, "" if value is None else str(value)))
+        return cls(
+            tuple(header),
+            [_row(RelatedActivity, idx, fields) for idx, fields in sorted(related.items())],
+            [_row(ViolationSummary, _intern(label), fields) for label, fields in summary.items()],
+            [_row(ViolationItem, idx, fields) for idx, fields in sorted(items.items())],
+            tuple(extra),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """`fetch_inspection_details`와 같은 넓은 dict로 되돌립니다 (Excel/pickle 출력용, 키 순서도 추출 순서와 같음)."""
+        record: Dict[str, Any] = {}
+        trailing = {}
+        for name, value in zip(HEADER_FIELDS, self.header):
+            if value is None:
+                continue
+            if name in _TRAILING_FIELDS:
+                trailing[name] = value
+            else:
+                record[name] = value
+        for row in self.related:
+            for name, value in zip(RELATED_ACTIVITY_FIELDS, _values(row)[1:]):
+                if value is not None:
+                    record[f"Related Activity {name} {row.item}"] = value
+        for row in self.summary:
+            for name, value in zip(VIOLATION_SUMMARY_FIELDS, _values(row)[1:]):
+                if value is not None:
+                    record[f"{row.label} {name}"] = value
+        for row in self.items:
+            for name, value in zip(VIOLATION_ITEM_FIELDS, _values(row)[1:]):
+                if value is not None:
+                    record[f"Violation Item {row.item} {name}"] = value
+        record.update(self.extra)
+        record.update(trailing)
+        return record
+
+
+def as_record(record: Union[InspectionRecord, Dict[str, Any]]) -> InspectionRecord:
+    return record if isinstance(record, InspectionRecord) else InspectionRecord.from_dict(record)
+
+
+def as_dict(record: Union[InspectionRecord, Dict[str, Any]]) -> Dict[str, Any]:
+    return record.to_dict() if isinstance(record, InspectionRecord) else record
+
+
+def loads_record(raw: str) -> InspectionRecord:
+    """작업 원장에 저장된 JSON 레코드를 dict를 거쳐 바로 압축된 레코드로 읽습니다 (dict는 바로 버려집니다)."""
+    return InspectionRecord.from_dict(json.loads(raw))
+
+
+class TableBuilder:
+    """한 테이블의 열 목록에 값을 쌓고 `chunk_size` 행마다 Arrow 레코드 배치로 바꿉니다."""
+
+    def __init__(self, schema: pa.Schema, chunk_size: int = 10_000) -> None:
+        self.schema = schema
+        self.chunk_size = chunk_size
+        self.columns: List[List[Any]] = [[] for _ in schema]
+        self.batches: List[pa.RecordBatch] = []
+        self.rows = 0
+
+    def append(self, values: Iterable[Any]) -> None:
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        self.rows += 1
+        if len(self.columns[0]) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.columns[0]:
+            return
+        arrays = [pa.array(column, type=field.type) for column, field in zip(self.columns, self.schema)]
+        self.batches.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.columns = [[] for _ in self.schema]
+
+    def finish(self) -> pa.Table:
+        self._flush()
+        table = pa.Table.from_batches(self.batches, schema=self.schema)
+        self.batches = []
+        return table
+
+
+class RecordBatchBuilder:
+    """`InspectionRecord`를 `SCHEMAS`의 네 테이블 열에 바로 쌓습니다."""
+
+    def __init__(self, chunk_size: int = 10_000) -> None:
+        self.tables = {name: TableBuilder(schema, chunk_size) for name, schema in SCHEMAS.items()}
+
+    def append(self, record: Union[InspectionRecord, Dict[str, Any]]) -> None:
+        record = as_record(record)
+        inspection_nr = record.inspection_nr
+        self.tables["inspections"].append(record.header + (list(record.extra),))
+        for table, rows in (("related_activity", record.related), ("violation_summary", record.summary), ("violation_items", record.items)):
+            builder = self.tables[table]
+            for row in rows:
+                builder.append([inspection_nr] + _values(row))
+
+    def extend(self, records: Iterable[Union[InspectionRecord, Dict[str, Any]]]) -> "RecordBatchBuilder":
+        for record in records:
+            self.append(record)
+        return self
+
+    def finish(self) -> Dict[str, pa.Table]:
+        """Returns: 테이블 이름 → Arrow 테이블."""
+        return {name: builder.finish() for name, builder in self.tables.items()}
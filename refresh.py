@@ -0,0 +1,393 @@
+"""이미 수집한 inspection_detail 페이지를 조건부 요청으로 점진적으로 갱신합니다.
+
+Case Status, Current Penalty, Contest, Latest Event 같은 값은 시간이 지나면서 바뀌지만, 전체 29k건을
+다시 수집하지 않고 바뀔 가능성이 높은 레코드만 골라 확인합니다.
+
+- Inspection Nr마다 마지막으로 받은 페이지의 SHA-256 해시, `ETag`/`Last-Modified`(서버가 준다면),
+  열린 사건인지 여부, 마지막으로 확인한 시각과 그때의 레코드를 `refresh.sqlite`에 기록합니다.
+- 열린 사건(`Case Status`가 OPEN이거나 `Case Closed`가 비어 있는 경우)은 `--open-age`일마다,
+  닫힌 사건은 `--closed-age`일마다 다시 확인하며, 열린 사건과 오래전에 확인한 레코드를 먼저 가져옵니다.
+- `If-None-Match`/`If-Modified-Since`로 요청해 304이면 내려받지 않고, 200이어도 해시가 같으면 파싱하지
+  않습니다. 해시가 바뀐 페이지만 `extraction_spec`으로 다시 파싱해 필드 단위로 비교합니다.
+- 바뀐 필드는 `changes/Changes(<시각>).jsonl`에 `Inspection Nr, Field, Old, New, Detected At`으로 남기고,
+  `--ledger`가 주어지면 원장의 레코드를 바꾼 뒤 `--output`에 새 배치로 내보냅니다
+  (`inspection_detail_merger.py`는 가장 최근 파트의 값을 남기므로 병합 결과도 갱신됩니다).
+
+Usage:
+    $ python refresh.py seed --parts inspection-detail
+    $ python refresh.py run --limit 2000 --rate 0.5
+    $ python refresh.py stats
+"""
+# Internal Modules
+from utils import INSPECTION_DETAIL_PATH, OSHA_BASE_URL, create_session, timed_get
+from extraction_spec import SPEC, InspectionPageError
+from rate_limit import AdaptiveRateController, backoff_delay
+from http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from work_ledger import WorkLedger
+from detail_loader import convert_part, find_parts
+from output_sinks import SINKS, create_sinks, export_batches
+# External Modules
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import pyarrow.feather as feather
+from tqdm import tqdm
+import threading
+import argparse
+import requests
+import hashlib
+import logging
+import sqlite3
+import json
+import time
+import os
+
+# Root
+logger_name = 'refresh'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+DAY = 24 * 60 * 60
+NOT_MODIFIED = "not_modified"  # 304
+UNCHANGED = "unchanged"        # 200이지만 해시가 같음 (파싱하지 않음)
+REPARSED = "reparsed"          # 해시는 바뀌었지만 추출한 필드는 같음
+CHANGED = "changed"            # 필드가 바뀜
+FAILED = "failed"
+
+
+def clean_record(record: Dict[str, Any]) -> Dict[str, str]:
+    """비교할 수 있도록 빈 값(None, NaN, "")을 빼고 값을 문자열로 맞춥니다."""
+    return {key: str(value) for key, value in record.items() if value is not None and value == value and value != ""}
+
+
+def is_open(record: Dict[str, Any]) -> bool:
+    """열린 사건인지 여부. `Case Status`가 있으면 그 값을, 없으면 `Case Closed` 날짜가 비었는지를 봅니다."""
+    status = record.get("Case Status")
+    if status:
+        return str(status).strip().upper() != "CLOSED"
+    return not record.get("Case Closed")
+
+
+def diff_records(old: Dict[str, str], new: Dict[str, str]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """두 레코드의 필드 단위 차이 `(필드, 이전 값, 새 값)`. 없어진 필드는 새 값이 None입니다."""
+    return [(key, old.get(key), new.get(key)) for key in sorted(old.keys() | new.keys()) if old.get(key) != new.get(key)]
+
+
+class RefreshIndex:
+    """Inspection Nr별 마지막 페이지 해시, 검증자(ETag/Last-Modified), 확인 시각, 레코드를 저장하는 SQLite 인덱스."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db
+        db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            inspection_nr TEXT PRIMARY KEY,
+            digest TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            is_open INTEGER NOT NULL,
+            checked_at REAL NOT NULL,
+            changed_at REAL,
+            record TEXT NOT NULL)""")
+        db.execute("CREATE INDEX IF NOT EXISTS pages_due ON pages (is_open, checked_at)")
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않으므로 스레드마다 따로 엽니다.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def seed(self, rows: Iterable[Tuple[str, Dict[str, Any], float, Optional[str]]]) -> int:
+        """아직 인덱스에 없는 레코드를 기준값으로 추가합니다.
+
+        Args:
+            rows (Iterable[Tuple[str, Dict[str, Any], float, Optional[str]]]): (Inspection Nr, 레코드, 수집 시각, 페이지 해시).
+
+        Returns:
+            int: 새로 추가된 항목 수.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO pages (inspection_nr, digest, is_open, checked_at, record) VALUES (?, ?, ?, ?, ?)",
+                ((nr, digest, int(is_open(record)), checked_at, json.dumps(clean_record(record), ensure_ascii=False)) for nr, record, checked_at, digest in rows if nr),
+            )
+            added = db.total_changes - before
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return added
+
+    def known(self) -> Set[str]:
+        return {nr for nr, in self._db.execute("SELECT inspection_nr FROM pages")}
+
+    def due(self, limit: Optional[int] = None, open_age: float = 0.5 * DAY, closed_age: float = 90 * DAY) -> List[str]:
+        """다시 확인할 때가 된 Inspection Nr들. 열린 사건을 먼저, 그다음 오래전에 확인한 순서로 나열합니다."""
+        now = time.time()
+        rows = self._db.execute(
+            """SELECT inspection_nr FROM pages
+            WHERE (is_open = 1 AND checked_at < ?) OR (is_open = 0 AND checked_at < ?)
+            ORDER BY is_open DESC, checked_at LIMIT ?""",
+            (now - open_age, now - closed_age, -1 if limit is None else limit),
+        ).fetchall()
+        return [nr for nr, in rows]
+
+    def get(self, inspection_nr: str) -> Optional[Tuple[Optional[str], Optional[str], Optional[str], Dict[str, str]]]:
+        """Returns: (해시, ETag, Last-Modified, 레코드). 없으면 None."""
+        row = self._db.execute("SELECT digest, etag, last_modified, record FROM pages WHERE inspection_nr = ?", (inspection_nr,)).fetchone()
+        return None if row is None else (row[0], row[1], row[2], json.loads(row[3]))
+
+    def touch(self, inspection_nr: str, digest: Optional[str] = None, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """내용이 그대로임을 확인한 시각(과 새 검증자)을 기록합니다."""
+        self._db.execute(
+            """UPDATE pages SET checked_at = ?, digest = COALESCE(?, digest), etag = COALESCE(?, etag),
+            last_modified = COALESCE(?, last_modified) WHERE inspection_nr = ?""",
+            (time.time(), digest, etag, last_modified, inspection_nr),
+        )
+
+    def update(self, inspection_nr: str, digest: str, etag: Optional[str], last_modified: Optional[str], record: Dict[str, str], changed: bool) -> None:
+        """다시 파싱한 레코드와 새 검증자를 저장합니다."""
+        now = time.time()
+        self._db.execute(
+            """UPDATE pages SET digest = ?, etag = ?, last_modified = ?, is_open = ?, checked_at = ?,
+            changed_at = CASE WHEN ? THEN ? ELSE changed_at END, record = ? WHERE inspection_nr = ?""",
+            (digest, etag, last_modified, int(is_open(record)), now, changed, now, json.dumps(record, ensure_ascii=False), inspection_nr),
+        )
+
+    def stats(self, open_age: float = 0.5 * DAY, closed_age: float = 90 * DAY) -> Dict[str, int]:
+        """전체, 열린 사건, 지금 확인할 때가 된 항목, 검증자가 있는 항목 수."""
+        now = time.time()
+        total, open_count, due, validators = self._db.execute(
+            """SELECT COUNT(*), COALESCE(SUM(is_open), 0),
+            COALESCE(SUM((is_open = 1 AND checked_at < ?) OR (is_open = 0 AND checked_at < ?)), 0),
+            COALESCE(SUM(etag IS NOT NULL OR last_modified IS NOT NULL), 0) FROM pages""",
+            (now - open_age, now - closed_age),
+        ).fetchone()
+        return {"total": total, "open": open_count, "due": due, "with_validators": validators}
+
+
+def seed_from_ledger(index: RefreshIndex, ledger: WorkLedger, cache: Optional[ResponseCache] = None, base_url: str = OSHA_BASE_URL) -> int:
+    """원장의 `done` 레코드 중 인덱스에 없는 것을 기준값으로 추가합니다. 캐시에 페이지가 있으면 그 해시를 씁니다."""
+    known = index.known()
+    updated_at = ledger.updated_at()
+    rows = []
+    for nr, record in ledger.records():
+        if nr in known:
+            continue
+        cached = cache.digest(detail_url(nr, base_url)) if cache else None
+        rows.append((nr, record, updated_at.get(nr) or 0.0, cached[0] if cached else None))
+    return index.seed(rows)
+
+
+def seed_from_parts(index: RefreshIndex, folder: str, ext: Iterable[str] = ("xlsx",), cache: Optional[ResponseCache] = None, base_url: str = OSHA_BASE_URL) -> int:
+    """예전 파트 파일(`Inspection_Detail(...).xlsx` 등)의 레코드를 기준값으로 추가합니다.
+
+    수집 시각은 파트 파일의 수정 시각으로 봅니다. 같은 Inspection Nr은 가장 최근 파트의 값을 씁니다.
+    """
+    known = index.known()
+    latest: Dict[str, Tuple[Dict[str, Any], float]] = {}
+    for path in find_parts(folder, tuple(ext)):
+        mtime = os.path.getmtime(path)
+        for record in feather.read_table(convert_part(path), memory_map=True).to_pylist():
+            nr = record.get("Inspection Nr")
+            if nr and nr not in known:
+                latest[nr] = (record, mtime)
+    rows = []
+    for nr, (record, mtime) in latest.items():
+        cached = cache.digest(detail_url(nr, base_url)) if cache else None
+        rows.append((nr, record, mtime, cached[0] if cached else None))
+    return index.seed(rows)
+
+
+def detail_url(inspection_nr: str, base_url: str = OSHA_BASE_URL) -> str:
+    """`OSHAHttpScraper`가 캐시에 쓰는 것과 같은 형식의 inspection_detail URL."""
+    return f"{base_url}{INSPECTION_DETAIL_PATH}?id={inspection_nr}"
+
+
+class Refresher:
+    """인덱스의 검증자로 조건부 요청을 보내고, 해시가 바뀐 페이지만 다시 파싱해 필드 차이를 기록합니다."""
+
+    def __init__(self, index: RefreshIndex, changes_file: str, session: Optional[requests.Session] = None, limiter: Optional[Any] = None, cache: Optional[ResponseCache] = None, ledger: Optional[WorkLedger] = None, base_url: str = OSHA_BASE_URL, retry_count: int = 3, timeout: float = 30) -> None:
+        """Refresher 클래스의 초기화 메서드.
+
+        Args:
+            index (RefreshIndex): 해시/검증자/레코드 인덱스.
+            changes_file (str): 필드 단위 변경 내역을 덧붙일 JSON Lines 파일.
+            session (Optional[requests.Session]): 재사용할 세션. 기본값은 `create_session()`.
+            limiter (Optional[Any]): 요청 속도 제어기. 기본값은 초당 0.5회에서 시작하는 `AdaptiveRateController`.
+            cache (Optional[ResponseCache]): 바뀐 페이지를 기록할 원본 응답 캐시.
+            ledger (Optional[WorkLedger]): 주어지면 바뀐 레코드로 원장을 갱신해 다시 내보내게 합니다.
+            base_url (str): 요청할 서버 주소.
+            retry_count (int): 요청당 최대 시도 횟수.
+            timeout (float): 요청 시간 제한(초).
+        """
+        self.index = index
+        self.changes_file = changes_file
+        self.session = session or create_session()
+        self.limiter = limiter or AdaptiveRateController(0.5)
+        self.cache = cache
+        self.ledger = ledger
+        self.base_url = base_url
+        self.retry_count = retry_count
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(changes_file) or ".", exist_ok=True)
+
+    def _get(self, url: str, headers: Dict[str, str]) -> Optional[requests.Response]:
+        for attempt in range(self.retry_count):
+            self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = timed_get(self.session, url, "inspection_detail", headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.limiter.record(None, time.perf_counter() - started)
+                logger.warning(f"Retrying ({attempt + 1}/{self.retry_count}) to load URL: {url} ({e})")
+            else:
+                self.limiter.record(response.status_code, time.perf_counter() - started, response.headers.get("Retry-After"))
+                if response.status_code in (200, 304):
+                    return response
+                logger.warning(f"Status code {response.status_code} ({attempt + 1}/{self.retry_count}) for URL: {url}")
+            if attempt + 1 < self.retry_count:
+                time.sleep(backoff_delay(attempt))
+        return None
+
+    def _emit(self, inspection_nr: str, changes: List[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        detected_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        lines = "".join(
+            json.dumps({"Inspection Nr": inspection_nr, "Field": field, "Old": old, "New": new, "Detected At": detected_at}, ensure_ascii=False) + "\n"
+            for field, old, new in changes
+        )
+        with self._lock, open(self.changes_file, 'a', encoding='utf-8') as file:
+            file.write(lines)
+
+    def refresh(self, inspection_nr: str) -> str:
+        """Inspection Nr 하나를 다시 확인합니다.
+
+        Returns:
+            str: `NOT_MODIFIED`, `UNCHANGED`, `REPARSED`, `CHANGED`, `FAILED` 중 하나.
+        """
+        entry = self.index.get(inspection_nr)
+        if entry is None:
+            return FAILED
+        digest, etag, last_modified, old = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        url = detail_url(inspection_nr, self.base_url)
+        response = self._get(url, headers)
+        if response is None:
+            logger.error(f"Failed to refresh Inspection Nr: {inspection_nr} after retries.")
+            return FAILED
+        if response.status_code == 304:
+            self.index.touch(inspection_nr)
+            return NOT_MODIFIED
+
+        body = response.content
+        new_digest = hashlib.sha256(body).hexdigest()
+        new_etag = response.headers.get("ETag")
+        new_last_modified = response.headers.get("Last-Modified")
+        if new_digest == digest:
+            self.index.touch(inspection_nr, new_digest, new_etag, new_last_modified)
+            return UNCHANGED
+
+        try:
+            new = clean_record(SPEC.extract(body, inspection_nr))
+        except InspectionPageError as e:
+            logger.error(str(e))
+            return FAILED
+        if self.cache:
+            self.cache.put(url, body)
+        changes = diff_records(old, new)
+        self.index.update(inspection_nr, new_digest, new_etag, new_last_modified, new, bool(changes))
+        if not changes:
+            return REPARSED
+        self._emit(inspection_nr, changes)
+        if self.ledger:
+            self.ledger.update_record(inspection_nr, new)
+        logger.debug(f"Inspection Nr: {inspection_nr}, {len(changes)} fields changed")
+        return CHANGED
+
+    def run(self, inspection_nrs: List[str], workers: int = 1) -> Dict[str, int]:
+        """여러 Inspection Nr을 `workers`개의 스레드로 다시 확인하고 결과별 개수를 반환합니다."""
+        counts: Dict[str, int] = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(total=len(inspection_nrs)) as progress:
+            for result in executor.map(self.refresh, inspection_nrs):
+                counts[result] = counts.get(result, 0) + 1
+                progress.update()
+        return counts
+
+
+def main(args: argparse.Namespace) -> None:
+    index = RefreshIndex(args.index)
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    ledger = WorkLedger(args.ledger) if args.ledger and os.path.exists(args.ledger) else None
+    open_age, closed_age = args.open_age * DAY, args.closed_age * DAY
+
+    if args.command == "seed":
+        if ledger:
+            logger.info(f"Seeded {seed_from_ledger(index, ledger, cache, args.base_url):,} records from {args.ledger}")
+        if args.parts:
+            logger.info(f"Seeded {seed_from_parts(index, args.parts, args.ext, cache, args.base_url):,} records from {args.parts}")
+    elif args.command == "run":
+        if ledger:
+            # 마지막 실행 이후 새로 수집된 레코드도 기준값에 넣습니다.
+            seed_from_ledger(index, ledger, cache, args.base_url)
+        due = index.due(args.limit, open_age, closed_age)
+        stats = index.stats(open_age, closed_age)
+        logger.info(f"Refreshing {len(due):,} of {stats['total']:,} records ({stats['due']:,} due, {stats['open']:,} open)")
+        changes_file = os.path.join(args.changes_dir, f"Changes({time.strftime('%Y%m%d-%H%M%S')}).jsonl")
+        limiter = AdaptiveRateController(args.rate, max_rate=args.max_rate)
+        refresher = Refresher(index, changes_file, limiter=limiter, cache=cache, ledger=ledger, base_url=args.base_url)
+        counts = refresher.run(due, args.workers)
+        logger.info(f"Refresh results: {counts}")
+        if counts.get(CHANGED):
+            logger.info(f"Field-level changes written to {changes_file}")
+            if ledger and args.output:
+                # 바뀐 레코드를 기존 출력과 같은 형식의 새 배치로 내보냅니다.
+                export_batches(ledger, create_sinks(args.format, args.output), args.batch_size)
+    logger.info(f"Refresh index: {index.stats(open_age, closed_age)}")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incrementally refresh already scraped inspection details with conditional requests')
+    parser.add_argument('command', choices=["seed", "run", "stats"], help='seed: add baseline records, run: refresh due records, stats: show the index')
+    parser.add_argument('--index', type=str, default="inspection-detail/refresh.sqlite", help='SQLite index of page hashes, validators and records')
+    parser.add_argument('--ledger', '-P', type=str, default="inspection-detail/ledger.sqlite", help='Work ledger to seed from and to update with changed records')
+    parser.add_argument('--parts', type=str, default=None, help='Folder of legacy part files to seed from (seed)')
+    parser.add_argument('--ext', '-E', nargs="+", default=["xlsx"], choices=["xlsx", "pkl"], help='Part file extensions to seed from (seed)')
+    parser.add_argument('--limit', '-L', type=int, default=2_000, help='Maximum number of records to refresh in one run')
+    parser.add_argument('--open-age', type=float, default=0.5, help='Days after which an open case is checked again')
+    parser.add_argument('--closed-age', type=float, default=90, help='Days after which a closed case is checked again')
+    parser.add_argument('--workers', '-W', type=int, default=2, help='Number of concurrent requests')
+    parser.add_argument('--rate', '-R', type=float, default=0.5, help='Initial requests per second, adapted to server responses')
+    parser.add_argument('--max-rate', type=float, default=None, help='Upper bound of the adaptive request rate (default: 4x --rate)')
+    parser.add_argument('--output', '-O', type=str, default="inspection-detail", help='Folder to export changed records to as a new batch (requires --ledger)')
+    parser.add_argument('--format', '-F', nargs="+", choices=list(SINKS), default=["parquet"], help='Output formats of the exported batch')
+    parser.add_argument('--batch-size', '-B', type=int, default=1_000, help='Number of records per exported batch')
+    parser.add_argument('--changes-dir', type=str, default="inspection-detail/changes", help='Folder of the field-level changesets')
+    parser.add_argument('--base-url', type=str, default=OSHA_BASE_URL, help='Server to query (e.g. a local stub_server.py)')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='Folder of the raw response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read from or write to the response cache')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,243 @@
+"""사고 검색(`accidentsearch.search`) 결과를 HTTP로 직접 페이지 단위로 읽어 Summary Nr을 모으는 크롤러.
+
+브라우저에서 검색 결과를 저장해 두고 `summary.py`로 읽는 대신, 첫 페이지에서 전체 결과 수
+(`Results 1 - 100 of 29092`)를 읽고 나머지 페이지(`p_finish` = 시작 위치, `p_show` = 페이지 크기)를
+여러 스레드에서 동시에 요청합니다. 각 응답은 디스크에 쓰지 않고 메모리에서 바로 `get_report_id`로 읽습니다.
+
+페이지마다 작업 원장(`WorkLedger`, 키는 시작 위치)에 결과를 커밋하므로 중단 후 다시 실행하면 끝나지 않은
+페이지만 요청합니다. 원장은 처음 만든 검색 조건과 페이지 크기에 묶이며, 다른 조건으로 이어서 실행하면 오류가 납니다.
+
+결과는 최신순으로 정렬되어 있어 수집 도중 새 사고가 추가되면 페이지 경계가 밀립니다. 출력에서는 중복을
+지우고, 페이지마다 기록한 전체 결과 수가 달라졌으면 경고합니다 (새 원장으로 다시 수집하면 빠진 번호가 없습니다).
+
+Usage:
+    $ python search_crawler.py -O Summary_Nrs.txt
+    $ python search_crawler.py --keyword '"Construction"' --param startyear=2020 --page-size 100 -W 4
+    $ python search_crawler.py --base-url http://127.0.0.1:8000 -P /tmp/search.sqlite
+"""
+# Internal Modules
+from utils import ACCIDENT_SEARCH_PATH, HEADERS, OSHA_BASE_URL, create_session, get_report_id, parse_result_count, timed_get
+from rate_limit import AdaptiveRateController, backoff_delay
+from work_ledger import DONE, WorkLedger
+# External Modules
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from tqdm import tqdm
+import argparse
+import requests
+import logging
+import socket
+import time
+import io
+import os
+
+# Root
+logger_name = 'search_crawler'
+logger = logging.getLogger(logger_name)
+logger.setLevel(logging.DEBUG)
+# File Handler
+file_handler = logging.FileHandler(f'logs/{logger_name}.log', encoding='utf-8-sig')
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter(r'%(asctime)s [%(name)s, line %(lineno)d] %(levelname)s: %(message)s'))
+logger.addHandler(file_handler)
+# Stream Handler
+stream_handler = logging.StreamHandler()
+stream_handler.setLevel(logging.INFO)
+stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
+logger.addHandler(stream_handler)
+
+# 저장된 검색 결과 페이지(`"Construction"` 키워드 검색)의 검색 조건. 페이지 위치(`p_finish`, `p_show`)는 요청마다 붙입니다.
+DEFAULT_QUERY: Dict[str, str] = {
+    "sic": "", "sicgroup": "", "naics": "", "acc_description": "", "acc_abstract": "", "acc_keyword": '"Construction"',
+    "inspnr": "", "fatal": "", "officetype": "", "office": "", "startmonth": "", "startday": "", "startyear": "",
+    "endmonth": "", "endday": "", "endyear": "", "keyword_list": "on", "p_start": "", "p_sort": "", "p_desc": "DESC",
+    "p_direction": "Next",
+}
+
+
+class PageError(Exception):
+    """검색 결과 페이지를 읽을 수 없는 경우 (결과 테이블이나 결과 수가 없는 응답)."""
+
+
+class SearchCrawler:
+    """검색 결과 페이지를 동시에 요청해 Summary Nr을 모으는 크롤러."""
+
+    def __init__(
+        self,
+        ledger: WorkLedger,
+        query: Optional[Dict[str, str]] = None,
+        page_size: int = 100,
+        session: Optional[requests.Session] = None,
+        limiter: Optional[AdaptiveRateController] = None,
+        base_url: str = OSHA_BASE_URL,
+        retry_count: int = 3,
+        timeout: float = 60,
+    ) -> None:
+        """SearchCrawler 클래스의 초기화 메서드.
+
+        Args:
+            ledger (WorkLedger): 페이지(시작 위치)별 작업 원장.
+            query (Optional[Dict[str, str]]): 검색 조건. 없으면 `DEFAULT_QUERY`.
+            page_size (int): 한 페이지의 결과 수 (`p_show`).
+            limiter (Optional[AdaptiveRateController]): 요청 속도 조절기. 없으면 초당 0.5회에서 시작.
+            base_url (str): 요청할 서버 (예: 로컬 `stub_server.py`).
+        """
+        self.ledger = ledger
+        self.query = dict(DEFAULT_QUERY if query is None else query)
+        self.page_size = page_size
+        self.session = session or create_session()
+        self.limiter = limiter or AdaptiveRateController(0.5)
+        self.url = f"{base_url}{ACCIDENT_SEARCH_PATH}"
+        self.retry_count = retry_count
+        self.timeout = timeout
+
+    def _get(self, offset: int) -> requests.Response:
+        params = list(self.query.items()) + [("p_finish", str(offset)), ("p_show", str(self.page_size))]
+        for attempt in range(self.retry_count):
+            self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = timed_get(self.session, self.url, "search", params=params, headers=HEADERS, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.limiter.record(None, time.perf_counter() - started)
+                logger.warning(f"Retrying ({attempt + 1}/{self.retry_count}) search page at {offset} ({e})")
+            else:
+                self.limiter.record(response.status_code, time.perf_counter() - started, response.headers.get("Retry-After"))
+                if response.status_code == 200:
+                    return response
+                logger.warning(f"Status code {response.status_code} ({attempt + 1}/{self.retry_count}) for search page at {offset}")
+            if attempt + 1 < self.retry_count:
+                time.sleep(backoff_delay(attempt))
+        raise PageError(f"search page at {offset} failed after {self.retry_count} attempts")
+
+    def fetch_page(self, offset: int) -> Tuple[List[str], int]:
+        """`offset`부터 한 페이지를 요청합니다.
+
+        Returns:
+            Tuple[List[str], int]: (그 페이지의 Summary Nr들, 페이지에 표시된 전체 결과 수).
+
+        Raises:
+            PageError: 요청이 계속 실패했거나, 전체 결과 수 안쪽인데 결과 행이 없는 경우.
+        """
+        response = self._get(offset)
+        counts = parse_result_count(response.text)
+        if counts is None:
+            raise PageError(f"no result count on search page at {offset}")
+        summary_nrs = get_report_id(io.BytesIO(response.content))
+        if not summary_nrs and offset < counts[2]:
+            raise PageError(f"no result rows on search page at {offset} of {counts[2]}")
+        return summary_nrs, counts[2]
+
+    def _record(self, offset: int, summary_nrs: List[str], total: int) -> Dict[str, Any]:
+        return {"offset": offset, "total": total, "page_size": self.page_size, "query": self.query, "summary_nrs": summary_nrs}
+
+    def plan(self) -> int:
+        """처음 실행이면 첫 페이지를 읽어 전체 페이지를 원장에 추가합니다. 이어서 실행하면 원장의 검색 조건을 확인합니다.
+
+        Returns:
+            int: 전체 페이지 수.
+
+        Raises:
+            ValueError: 원장이 다른 검색 조건이나 페이지 크기로 만들어진 경우.
+        """
+        if not self.ledger.is_empty():
+            first = next(iter(self.ledger.records(DONE)), None)
+            if first is not None and (first[1]["query"], first[1]["page_size"]) != (self.query, self.page_size):
+                raise ValueError(f"{self.ledger.path} was created for another query or page size; use a new ledger")
+            return sum(self.ledger.counts().values())
+        summary_nrs, total = self.fetch_page(0)
+        offsets = list(range(0, max(total, 1), self.page_size))
+        self.ledger.add([str(offset) for offset in offsets])
+        self.ledger.claim(1)
+        self.ledger.complete("0", self._record(0, summary_nrs, total))
+        logger.info(f"{total:,} results in {len(offsets):,} pages of {self.page_size}")
+        return len(offsets)
+
+    def _work(self, progress: tqdm) -> None:
+        while True:
+            claimed = self.ledger.claim(1)
+            if not claimed:
+                return
+            offset = int(claimed[0])
+            try:
+                summary_nrs, total = self.fetch_page(offset)
+            except Exception as e:
+                logger.error(f"Error occurred for search page at {offset}: {e}")
+                self.ledger.fail(claimed[0], repr(e))
+            else:
+                self.ledger.complete(claimed[0], self._record(offset, summary_nrs, total))
+                progress.update(1)
+
+    def run(self, workers: int = 4) -> None:
+        """원장에 남은 페이지를 `workers`개의 스레드로 요청합니다. 페이지마다 바로 커밋됩니다."""
+        pages = self.plan()
+        counts = self.ledger.counts()
+        try:
+            with tqdm(total=pages, initial=counts.get(DONE, 0), unit="page") as progress, ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(self._work, progress) for _ in range(workers)]:
+                    future.result()
+        finally:
+            # 중단된 경우 이 프로세스가 잡고 있던 페이지를 바로 돌려놓아, 다시 실행할 때 임대 시간을 기다리지 않게 합니다.
+            self.ledger.release(f"{socket.gethostname()}:{os.getpid()}:")
+        for offset, attempts, error in self.ledger.failures():
+            logger.error(f"Search page at {offset} failed after {attempts} attempts: {error}")
+
+    def summary_nrs(self) -> List[str]:
+        """완료된 페이지의 Summary Nr을 결과 순서대로, 중복 없이 나열합니다."""
+        summary_nrs: Dict[str, None] = {}
+        totals = set()
+        for _, record in self.ledger.records(DONE):
+            totals.add(record["total"])
+            summary_nrs.update(dict.fromkeys(record["summary_nrs"]))
+        if len(totals) > 1:
+            logger.warning(f"The result count changed during the crawl ({min(totals):,} -> {max(totals):,}); page boundaries shifted, re-crawl with a new ledger to be sure nothing was missed")
+        return list(summary_nrs)
+
+
+def write_summary_nrs(summary_nrs: List[str], output: str) -> None:
+    """Summary Nr을 한 줄에 하나씩 씁니다 (임시 파일에 쓴 뒤 바꿔치기)."""
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.writelines(f"{nr}\n" for nr in summary_nrs)
+    os.replace(tmp_path, output)
+
+
+def parse_params(pairs: List[str]) -> Dict[str, str]:
+    """`key=value` 목록을 검색 조건 dict로 바꿉니다."""
+    params = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or key not in DEFAULT_QUERY:
+            raise ValueError(f"Invalid search parameter: {pair} (expected one of {', '.join(DEFAULT_QUERY)} as key=value)")
+        params[key] = value
+    return params
+
+
+def main(args: argparse.Namespace) -> None:
+    query = {**DEFAULT_QUERY, "acc_keyword": args.keyword, **parse_params(args.param)}
+    ledger = WorkLedger(args.ledger, lease_timeout=args.lease_timeout)
+    limiter = AdaptiveRateController(args.rate, max_rate=args.max_rate)
+    crawler = SearchCrawler(ledger, query, args.page_size, limiter=limiter, base_url=args.base_url, timeout=args.timeout)
+    crawler.run(args.workers)
+    summary_nrs = crawler.summary_nrs()
+    write_summary_nrs(summary_nrs, args.output)
+    logger.info(f"Wrote {len(summary_nrs):,} Summary Nrs to {args.output} ({ledger.counts()})")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawl accident search result pages for Summary Nrs')
+    parser.add_argument('--output', '-O', type=str, default="Summary_Nrs.txt", help='File to write the Summary Nrs to')
+    parser.add_argument('--ledger', '-P', type=str, default="search_ledger.sqlite", help='Per-page work ledger used to resume an interrupted crawl')
+    parser.add_argument('--keyword', type=str, default=DEFAULT_QUERY["acc_keyword"], help='Keyword searched in the accident summaries (acc_keyword)')
+    parser.add_argument('--param', nargs="*", default=[], help='Other search fields as key=value (e.g. startyear=2020 fatal=X)')
+    parser.add_argument('--page-size', '-N', type=int, default=100, help='Results per page (p_show)')
+    parser.add_argument('--workers', '-W', type=int, default=4, help='Number of concurrent page requests')
+    parser.add_argument('--rate', '-R', type=float, default=0.5, help='Initial requests per second, adapted to server responses')
+    parser.add_argument('--max-rate', type=float, default=None, help='Upper bound of the adaptive request rate (default: 4x --rate)')
+    parser.add_argument('--lease-timeout', type=float, default=120, help='Seconds before a page claimed by a killed run can be claimed again')
+    parser.add_argument('--timeout', type=float, default=60, help='Request timeout in seconds')
+    parser.add_argument('--base-url', type=str, default=OSHA_BASE_URL, help='Server to query (e.g. a local stub_server.py)')
+    args = parser.parse_args()
+
+    main(args)
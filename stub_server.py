@@ -0,0 +1,346 @@
+"""로컬 개발/검증용 OSHA 스텁 서버.
+
+osha.gov에 요청하지 않고 fetcher들을 시험할 수 있도록 `accidentsearch.search`, `accidentsearch.accident_detail`,
+`establishment.inspection_detail`과 같은 경로로 응답합니다. 검색 결과는 저장된 샘플 페이지를 틀로 삼아
+`Summary_Nrs.txt`의 Summary Nr들을 `p_finish`(시작 위치)와 `p_show`(페이지 크기)에 맞게 잘라 보여 줍니다. `inspection-nrs/*.txt`에 저장된
+Summary Nr → Inspection Nr 매핑이 있으면 그 값을 사용하고, 없는 ID는 ID로부터 결정적으로 만든
+Inspection Nr을 돌려줍니다. inspection_detail 페이지는 Inspection Nr로부터 결정적으로 만든 값으로 채웁니다.
+
+`FaultInjector`로 느린 응답, 무작위 503, 초당 요청 수 초과 시 429(`Retry-After`), 일정 시간 동안의
+장애를 흉내 내어 `rate_limit.AdaptiveRateController`의 동작을 확인할 수 있습니다.
+
+Usage:
+    $ python stub_server.py --port 8000
+    $ python stub_server.py --port 8000 --fail-rate 0.1 --max-rps 5 --latency 0.2 --outage 30 20
+    $ python inspection_bs4.py --mode async --base-url http://127.0.0.1:8000
+    $ python search_crawler.py --base-url http://127.0.0.1:8000
+"""
+# Internal Modules
+from utils import ACCIDENT_DETAIL_PATH, ACCIDENT_SEARCH_PATH, INSPECTION_DETAIL_PATH, RESULT_COUNT
+# External Modules
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import threading
+import argparse
+import hashlib
+import random
+import time
+import html
+import glob
+import os
+import re
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SEARCH_SAMPLE = os.path.join(ROOT, "(tmp) Accident Search Results _ Occupational Safety and Health Administration osha.gov(sample).html")
+
+
+def load_mapping(folder: str = "inspection-nrs") -> Dict[str, str]:
+    """`inspection-nrs/Inspection_Nrs(*).txt` 파일들에서 Summary Nr → Inspection Nr 매핑을 읽어옵니다."""
+    mapping: Dict[str, str] = {}
+    for file in glob.glob(os.path.join(folder, "Inspection_Nrs(*).txt")):
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if ": " in line:
+                    summary_nr, inspection_nr = line.strip().split(": ", 1)
+                    mapping[summary_nr] = inspection_nr
+    return mapping
+
+
+def load_summary_nrs(file: str = os.path.join(ROOT, "Summary_Nrs.txt"), fallback: int = 1_000) -> List[str]:
+    """검색 결과로 보여 줄 Summary Nr 목록 (중복 제외). 파일이 없으면 `fallback`개의 가짜 번호."""
+    if not os.path.exists(file):
+        return [f"{100_000 + i}.015" for i in range(fallback)]
+    with open(file, 'r', encoding='utf-8') as f:
+        return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+
+class SearchTemplate:
+    """저장된 검색 결과 페이지를 (결과 테이블 앞부분, 행 하나, 뒷부분)으로 나눠 두고 원하는 구간의 페이지를 만듭니다."""
+
+    def __init__(self, path: str = SEARCH_SAMPLE) -> None:
+        with open(path, 'r', encoding='utf-8') as f:
+            page = f.read()
+        body_start = page.index("<tbody>", page.index('<table aria-label=""')) + len("<tbody>")
+        body_end = page.index("</tbody>", body_start)
+        row = re.search(r'<tr>.*?</tr>', page[body_start:body_end], re.S)
+        self.head = page[:body_start]
+        self.tail = page[body_end:]
+        self.row = row.group(0)
+        self.row_nr = re.search(r'value="([^"]+)"', self.row).group(1)
+
+    def render(self, summary_nrs: List[str], offset: int, page_size: int) -> str:
+        rows = summary_nrs[offset:offset + page_size]
+        head = RESULT_COUNT.sub(f"Results {offset + 1 if rows else 0} - {offset + len(rows)} of {len(summary_nrs)}", self.head, count=1)
+        body = "".join(
+            self.row.replace(self.row_nr, html.escape(nr)).replace("<td>1</td>", f"<td>{offset + i + 1}</td>", 1)
+            for i, nr in enumerate(rows)
+        )
+        return head + body + self.tail
+
+
+def fake_inspection_nr(summary_nr: str) -> str:
+    """매핑에 없는 Summary Nr에 대해 항상 같은 가짜 Inspection Nr을 만듭니다."""
+    digest = int(hashlib.sha1(summary_nr.encode()).hexdigest()[:8], 16)
+    return f"{1_000_000 + digest % 900_000}.015"
+
+
+def render_accident_detail(summary_nrs: List[str], mapping: Dict[str, str]) -> str:
+    """accident_detail 페이지처럼 Summary Nr마다 제목과 `accidentOverview` 테이블을 만듭니다."""
+    sections = []
+    for summary_nr in summary_nrs:
+        inspection_nr = mapping.get(summary_nr) or fake_inspection_nr(summary_nr)
+        sections.append(f"""
+<div class="row-fluid">
+  <h4>Accident: {html.escape(summary_nr)} -- Report ID: 0000000 -- Event Date: 01/01/2024</h4>
+  <table class="table table-bordered" name="accidentOverview">
+    <tr><th>Inspection</th><th>Open Date</th><th>SIC</th><th>Establishment Name</th></tr>
+    <tr><td><a href="https://www.osha.gov/ords/imis/establishment.inspection_detail?id={inspection_nr}">{inspection_nr}</a></td><td>01/01/2024</td><td></td><td>Stub Establishment</td></tr>
+  </table>
+</div>""")
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><title>Accident Report Detail | Occupational Safety and Health Administration</title></head>
+<body><div id="maincontain" class="container">{''.join(sections)}
+</div></body></html>"""
+
+
+CITATION_TYPES = ("Serious", "Other", "Repeat", "Willful")
+STANDARDS = ("19260501 B01", "19260651 J02", "19100212 A01", "19040039 A01", "19260451 G01", "5A0001")
+# 실제 페이지처럼 본문 앞뒤에 붙는 탐색 메뉴와 바닥글 (파서 처리량 측정이 본문 크기에만 좌우되지 않도록)
+NAVIGATION = "".join(f'<li><a href="/topics/{i}">Safety and Health Topic {i}</a></li>' for i in range(120))
+FOOTER = "".join(f'<p class="footer-link"><a href="/about/{i}">About OSHA {i}</a> | <a href="/contact/{i}">Contact Us</a></p>' for i in range(60))
+
+
+def render_inspection_detail(inspection_nr: str) -> str:
+    """establishment.inspection_detail 페이지처럼 `extraction_spec`이 읽는 모든 필드와 테이블을 만듭니다.
+
+    관련 활동과 위반 항목의 수, 벌금 등은 Inspection Nr에서 결정적으로 정해지므로 같은 번호는 항상 같은 페이지가 됩니다.
+    """
+    seed = int(hashlib.sha1(inspection_nr.encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    nr = html.escape(inspection_nr)
+    closed = rng.random() < 0.8
+    activities = "".join(
+        f"<tr><td>{rng.choice(('Accident', 'Complaint', 'Referral'))}</td><td>{rng.randint(1_000_000, 2_999_999)}</td><td>Yes</td><td>&nbsp;</td></tr>"
+        for _ in range(rng.randint(1, 3))
+    )
+    items = []
+    counts = {citation_type: 0 for citation_type in CITATION_TYPES}
+    for i in range(rng.randint(0, 8)):
+        citation_type = rng.choice(CITATION_TYPES)
+        counts[citation_type] += 1
+        penalty = rng.randint(0, 40) * 500
+        items.append(
+            f"<tr><td>{i + 1:02d}001</td><td>{citation_type}</td><td>{rng.choice(STANDARDS)}</td><td>05/01/2023</td><td>06/01/2023</td>"
+            f"<td>${penalty * 7 // 10:,}</td><td>${penalty:,}</td><td></td><td>{rng.choice(('', '06/20/2023'))}</td><td>Z - Issued</td><td></td></tr>"
+        )
+    summary_cells = "".join(f"<td>{counts[citation_type] or ''}</td>" for citation_type in ("Serious", "Willful", "Repeat", "Other")) + f"<td></td><td>{sum(counts.values())}</td>"
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><title>Inspection: {nr} | Occupational Safety and Health Administration</title>
+<script src="/themes/osha/js/osha.js"></script><script>window.dataLayer = window.dataLayer || [];</script></head>
+<body><nav><ul>{NAVIGATION}</ul></nav>
+<div id="maincontain" class="container"><div class="row-fluid">
+<p><strong>Inspection Information - Office: Stub Area Office {seed % 90:02d}</strong></p>
+<div class="row-fluid">
+  <div class="span4"><strong>Inspection Nr</strong>: {nr}</div>
+  <div class="span4"><strong>Report ID</strong>: {seed % 10_000_000:07d}</div>
+  <div class="span4"><strong>Date Opened</strong>: {1 + seed % 12:02d}/{1 + seed % 28:02d}/2023</div>
+</div>
+<div class="well well-small"><strong>Case Status:</strong> {'CLOSED' if closed else 'OPEN'}</div>
+<div class="row-fluid"><div class="span4">
+<p><strong>Site Address</strong>:<br>Stub Establishment {seed % 1000}<br>{seed % 9000 + 100} Main Street<br>
+  Springfield, IL 627{seed % 100:02d}</p>
+<p><strong>Mailing Address</strong>:<br>PO Box {seed % 900 + 100}<br>Springfield, IL 62701</p></div>
+<div class="span4"><p><strong>Union Status</strong>: {rng.choice(('NonUnion', 'Union'))}</p></div>
+<div class="span4"><p><strong>SIC</strong>: </p>
+<p><strong>NAICS</strong>: {rng.choice(('236220/Commercial and Institutional Building Construction', '238160/Roofing Contractors', '562991/Septic Tank and Related Services'))}</p>
+</div>
+<div class="span4"><p><strong>Inspection Type</strong>: Accident</p>
+<p><strong>Scope</strong>: Complete</p>
+<p><strong>Advanced Notice</strong>: N</p>
+<p><strong>Ownership</strong>: Private</p>
+<p><strong>Safety/Health</strong>: Safety</p>
+<p><strong>Close Conference</strong>: 05/01/2023</p>
+<p><strong>Emphasis</strong>: </p>
+<p><strong>Case Closed</strong>: {'12/01/2023' if closed else ''}</p></div></div>
+<table class="table"><caption>Related Activity</caption>
+<tr><th>Type</th><th>Activity Nr</th><th>Safety</th><th>Health</th></tr>{activities}</table>
+<table class="table"><caption>Violation Summary</caption>
+<tr><th></th><th>Serious</th><th>Willful</th><th>Repeat</th><th>Other</th><th>Unclass</th><th>Total</th></tr>
+<tr><th>Initial Violations</th>{summary_cells}</tr></table>
+<table class="table"><caption>Violation Items</caption>
+<tr><th>Citation ID</th><th>Citation Type</th><th>Standard Cited</th><th>Issuance Date</th><th>Abatement Due Date</th><th>Current Penalty</th><th>Initial Penalty</th><th>FTA Penalty</th><th>Contest</th><th>Latest Event</th><th>Note</th></tr>{''.join(items)}</table>
+<h4><strong>Investigation Summary</strong></h4>
+<div class="row-fluid"><div class="span4">Inspection Nr: {nr}</div><div class="span8">Employee is injured in a fall from a ladder</div></div>
+<p>{' '.join(f"On the day of the incident an employee of the stub establishment was performing task {i} when the ladder shifted." for i in range(rng.randint(2, 8)))}</p>
+<p><strong>Keywords:</strong> Fall, Ladder, Fracture</p>
+</div></div>
+<footer>{FOOTER}</footer></body></html>"""
+
+
+class FaultInjector:
+    """스텁 서버 응답에 지연과 오류를 섞습니다.
+
+    Args:
+        latency (float): 모든 응답에 더하는 지연 시간(초). 실제 지연은 그 0.5~1.5배 사이에서 흔들립니다.
+        fail_rate (float): 무작위로 503을 돌려줄 확률.
+        max_rps (Optional[float]): 최근 1초 동안의 요청이 이 값을 넘으면 429와 `Retry-After`를 돌려줍니다.
+        retry_after (float): 429 응답의 `Retry-After` 값(초).
+        outage (Optional[Tuple[float, float]]): (시작, 길이). 서버 시작 후 시작 초부터 길이 초 동안 모든 요청에 503.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, max_rps: Optional[float] = None, retry_after: float = 1.0, outage: Optional[Tuple[float, float]] = None) -> None:
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.outage = outage
+        self.started = time.monotonic()
+        self.counts: Dict[int, int] = {}
+        self._recent: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def decide(self) -> Tuple[int, Dict[str, str]]:
+        """이번 요청에 돌려줄 (상태 코드, 추가 헤더). 200이면 정상 응답을 보냅니다."""
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            self._recent.append(now)
+            if self.outage and self.outage[0] <= now - self.started < self.outage[0] + self.outage[1]:
+                status, headers = 503, {}
+            elif self.max_rps is not None and len(self._recent) > self.max_rps:
+                status, headers = 429, {"Retry-After": f"{self.retry_after:g}"}
+            elif random.random() < self.fail_rate:
+                status, headers = 503, {}
+            else:
+                status, headers = 200, {}
+            self.counts[status] = self.counts.get(status, 0) + 1
+        return status, headers
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive 동작을 확인할 수 있도록 HTTP/1.1로 응답합니다.
+    disable_nagle_algorithm = True  # 헤더와 본문을 따로 쓰므로 Nagle + delayed ACK로 응답마다 ~40ms씩 늦어지지 않게 합니다.
+    mapping: Dict[str, str] = {}
+    summary_nrs: List[str] = []
+    search_template: Optional[SearchTemplate] = None
+    faults: Optional[FaultInjector] = None
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8", headers: Optional[Dict[str, str]] = None) -> None:
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if self.faults:
+            status, headers = self.faults.decide()
+            if status != 200:
+                self._send(status, "injected fault", headers=headers)
+                return
+        if url.path == ACCIDENT_SEARCH_PATH:
+            try:
+                offset = int(query.get("p_finish", ["0"])[0] or 0)
+                page_size = int(query.get("p_show", ["20"])[0] or 20)
+            except ValueError:
+                self._send(400, "invalid p_finish or p_show")
+                return
+            self._send(200, self.search_template.render(self.summary_nrs, offset, page_size))
+        elif url.path == ACCIDENT_DETAIL_PATH:
+            ids = [id for id in query.get("id", []) if id]
+            if not ids:
+                self._send(400, "missing id")
+                return
+            self._send(200, render_accident_detail(ids, self.mapping))
+        elif url.path == INSPECTION_DETAIL_PATH:
+            inspection_nr = query.get("id", [""])[0]
+            if not inspection_nr:
+                self._send(400, "missing id")
+                return
+            self._send(200, render_inspection_detail(inspection_nr))
+        else:
+            self._send(404, "not found")
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # 요청마다 stderr에 찍지 않습니다.
+
+
+class StubServer:
+    """백그라운드 스레드에서 동작하는 스텁 서버.
+
+    Example:
+        >>> with StubServer() as server:
+        ...     fetch_inspection_nrs_async(ids, "out.txt", base_url=server.url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, mapping: Optional[Dict[str, str]] = None, faults: Optional[FaultInjector] = None, summary_nrs: Optional[List[str]] = None) -> None:
+        self.faults = faults
+        handler = type("BoundStubHandler", (StubHandler,), {
+            "mapping": load_mapping() if mapping is None else mapping,
+            "summary_nrs": load_summary_nrs() if summary_nrs is None else summary_nrs,
+            "search_template": SearchTemplate(),
+            "faults": faults,
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(host: str, port: int, faults: Optional[FaultInjector] = None) -> None:
+    server = StubServer(host, port, faults=faults)
+    print(f"Serving OSHA stub at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        if faults:
+            print(f"Responses by status: {faults.counts}")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve stub OSHA pages for local testing')
+    parser.add_argument('--host', default="127.0.0.1", type=str, help='Host to bind')
+    parser.add_argument('--port', '-p', default=8000, type=int, help='Port to bind')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean extra latency (seconds) added to every response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Probability of answering 503')
+    parser.add_argument('--max-rps', type=float, default=None, help='Answer 429 with Retry-After above this many requests/sec')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After (seconds) sent with 429 responses')
+    parser.add_argument('--outage', type=float, nargs=2, metavar=("START", "DURATION"), default=None, help='Answer 503 to everything for DURATION seconds, START seconds after startup')
+    args = parser.parse_args()
+
+    faults = None
+    if args.latency or args.fail_rate or args.max_rps is not None or args.outage:
+        faults = FaultInjector(args.latency, args.fail_rate, args.max_rps, args.retry_after, tuple(args.outage) if args.outage else None)
+    main(args.host, args.port, faults)
@@ -1,8 +1,8 @@
 # Internal Modules
-from utils import get_report_id
+from utils import get_htmls, get_report_id, iter_report_ids
 # External Modules
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-from typing import List
 import argparse
 import logging
 import os
@@ -10,6 +10,8 @@ import os
 
 parser = argparse.ArgumentParser(description='Extract Summary Nrs from the HTML files')
 parser.add_argument('--directory', '-D', default="./", type=str, help='Path to folder where the HTML are stored')  # , required=True)
+parser.add_argument('--output', '-O', default="Summary_Nrs.txt", type=str, help='File to write the Summary Nrs to')
+parser.add_argument('--workers', '-W', default=os.cpu_count(), type=int, help='Number of processes parsing HTML files in parallel')
 args = parser.parse_args()
 
 # Root 
@@ -28,15 +30,19 @@ stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
 logger.addHandler(stream_handler)
 
 
-def get_htmls(folder: str) -> List[str]:
-    return [file for file in os.listdir(folder) if file.endswith('.html') and not file.endswith('(tmp).html')]
-
 def main() -> None:
-    summary_nrs : List[str] = []
-    for html in tqdm(get_htmls(args.directory)):
-        summary_nrs.extend(get_report_id(html))  # 리스트를 평탄화하여 추가
-    with open("Summary_Nrs.txt", 'w', encoding="utf-8") as file:
-        file.writelines(f"{nr}\n" for nr in summary_nrs)  # 각 항목을 줄 바꿈과 함께 기록
+    htmls = get_htmls(args.directory)
+    with open(args.output, 'w', encoding="utf-8") as file:
+        if args.workers <= 1 or len(htmls) <= 1:
+            # 한 파일씩 스트리밍하며 읽는 즉시 기록
+            for html in tqdm(htmls):
+                for nr in iter_report_ids(html):
+                    file.write(f"{nr}\n")
+            return
+        # 파일들을 여러 프로세스에서 나누어 파싱하고, 파일 순서대로 끝나는 즉시 기록
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(htmls))) as executor:
+            for summary_nrs in tqdm(executor.map(get_report_id, htmls), total=len(htmls)):
+                file.writelines(f"{nr}\n" for nr in summary_nrs)  # 각 항목을 줄 바꿈과 함께 기록
 
 # Main
 if __name__ == '__main__':
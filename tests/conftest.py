@@ -0,0 +1,11 @@
+"""테스트 공통 설정.
+
+모듈들이 `logs/<모듈>.log`와 `inspection-nrs/` 같은 상대 경로를 쓰므로, 저장소 최상위 폴더를 작업 폴더와
+import 경로로 삼은 뒤 테스트 모듈을 불러옵니다.
+"""
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
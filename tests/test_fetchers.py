@@ -0,0 +1,70 @@
+"""fetcher들을 스텁 서버(`stub_server.StubServer`)에 대고 돌려, 서버가 가진 Summary Nr 목록·매핑과 결과를 비교합니다."""
+import pytest
+
+from extraction_spec import SPEC
+from inspection_async import fetch_inspection_nrs_async
+from inspection_http import OSHAHttpScraper
+from rate_limit import AdaptiveRateController
+from search_crawler import SearchCrawler
+from stub_server import FaultInjector, StubServer, fake_inspection_nr, load_mapping, load_summary_nrs, render_inspection_detail
+from utils import BatchSizeTuner, fetch_inspection_nrs
+from work_ledger import WorkLedger
+
+
+@pytest.fixture(scope="module")
+def mapping():
+    return load_mapping()
+
+
+@pytest.fixture(scope="module")
+def summary_nrs():
+    return load_summary_nrs()[:60]
+
+
+def expected_inspection_nrs(summary_nrs, mapping):
+    """스텁 서버가 accident_detail 페이지에 넣는 Inspection Nr (매핑에 없으면 가짜 번호)."""
+    return {summary_nr: mapping.get(summary_nr) or fake_inspection_nr(summary_nr) for summary_nr in summary_nrs}
+
+
+def test_fetch_inspection_nrs_batches(summary_nrs, mapping):
+    """묶음 요청 fetcher(user-003)는 가끔 429가 나도 모든 Summary Nr의 Inspection Nr을 찾습니다."""
+    faults = FaultInjector(max_rps=5, retry_after=0.2)
+    tuner = BatchSizeTuner(batch_size=5, max_size=5)
+    with StubServer(mapping=mapping, faults=faults) as server:
+        results = dict(fetch_inspection_nrs(summary_nrs, tuner=tuner, bucket=AdaptiveRateController(50, max_rate=50), base_url=server.url))
+    assert faults.counts.get(429)
+    assert results == expected_inspection_nrs(summary_nrs, mapping)
+
+
+def test_fetch_inspection_nrs_async(summary_nrs, mapping, tmp_path):
+    """비동기 fetcher는 결과를 반환하고 `id: inspection_nr` 줄로 파일에 씁니다. 다시 실행하면 건너뜁니다."""
+    output_file = str(tmp_path / "Inspection_Nrs.txt")
+    with StubServer(mapping=mapping) as server:
+        results = fetch_inspection_nrs_async(summary_nrs, output_file, concurrency=8, rate=50, base_url=server.url)
+        assert fetch_inspection_nrs_async(summary_nrs, output_file, base_url=server.url) == {}
+    expected = expected_inspection_nrs(summary_nrs, mapping)
+    assert results == expected
+    with open(output_file, encoding='utf-8') as file:
+        assert dict(line.rstrip("\n").split(": ", 1) for line in file) == expected
+
+
+def test_search_crawler(tmp_path):
+    """검색 결과 크롤러(user-022)는 스텁 서버의 Summary Nr을 순서대로, 빠짐없이 모읍니다."""
+    summary_nrs = load_summary_nrs()[:250]
+    ledger = WorkLedger(str(tmp_path / "search.sqlite"))
+    with StubServer(mapping={}, summary_nrs=summary_nrs) as server:
+        crawler = SearchCrawler(ledger, page_size=100, limiter=AdaptiveRateController(50, max_rate=50), base_url=server.url)
+        crawler.run(workers=2)
+    assert ledger.counts() == {"done": 3}
+    assert crawler.summary_nrs() == summary_nrs
+
+
+def test_http_scraper(mapping):
+    """HTTP 상세 페이지 fetcher(user-017)는 503이 섞여도 재시도해 스텁 페이지와 같은 레코드를 만듭니다."""
+    inspection_nrs = list(dict.fromkeys(mapping.values()))[:10]
+    faults = FaultInjector(fail_rate=0.2)
+    with StubServer(mapping=mapping, faults=faults) as server:
+        scraper = OSHAHttpScraper(retry_count=10, limiter=AdaptiveRateController(50, max_rate=50, failure_threshold=100), base_url=server.url)
+        records = {nr: scraper.fetch_inspection_details(nr) for nr in inspection_nrs}
+    assert records == {nr: SPEC.extract(render_inspection_detail(nr), nr) for nr in inspection_nrs}
+    assert all(record["Inspection Nr"] == nr for nr, record in records.items())
@@ -0,0 +1,93 @@
+"""`AdaptiveRateController`를 장애를 섞는 스텁 서버(`stub_server.FaultInjector`)에 대고 확인합니다."""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import requests
+
+from rate_limit import AdaptiveRateController
+from stub_server import FaultInjector, StubServer
+from utils import INSPECTION_DETAIL_PATH
+
+
+def send(controller: AdaptiveRateController, url: str) -> int:
+    """fetcher들과 같은 순서로 `acquire()` → 요청 → `record()`를 하고 상태 코드를 반환합니다."""
+    controller.acquire()
+    started = time.perf_counter()
+    response = requests.get(url, timeout=5)
+    controller.record(response.status_code, time.perf_counter() - started, response.headers.get("Retry-After"))
+    return response.status_code
+
+
+def detail_url(server: StubServer) -> str:
+    return f"{server.url}{INSPECTION_DETAIL_PATH}?id=1716316.015"
+
+
+def test_retry_after_pauses_requests():
+    """429의 `Retry-After`만큼 다음 요청을 멈추고, 속도는 줄이되 회로는 열지 않습니다."""
+    faults = FaultInjector(max_rps=3, retry_after=1)
+    controller = AdaptiveRateController(20, max_rate=20, cooldown=10)
+    with StubServer(faults=faults) as server:
+        url = detail_url(server)
+        statuses = []
+        while 429 not in statuses and len(statuses) < 20:
+            statuses.append(send(controller, url))
+        assert statuses[-1] == 429
+        assert controller.rate == 10
+        assert controller.state == "closed"
+
+        started = time.monotonic()
+        assert send(controller, url) == 200
+        assert time.monotonic() - started >= 0.9
+    assert faults.counts[429] == 1
+
+
+def test_503_burst_decreases_once_per_cooldown():
+    """한꺼번에 들어온 503들은 속도를 한 번만 줄이고, 쿨다운이 지난 뒤의 503은 다시 줄입니다."""
+    faults = FaultInjector(fail_rate=1.0)
+    controller = AdaptiveRateController(8, max_rate=8, cooldown=0.5, failure_threshold=100)
+    with StubServer(faults=faults) as server:
+        url = detail_url(server)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert list(executor.map(lambda _: send(controller, url), range(6))) == [503] * 6
+        assert controller.rate == 4
+
+        time.sleep(0.6)
+        assert send(controller, url) == 503
+        assert controller.rate == 2
+    assert controller.state == "closed"
+    assert faults.counts[503] == 7
+
+
+def test_outage_opens_probes_and_closes_circuit():
+    """장애 동안 회로가 열리고, 실패한 시험 요청마다 대기 시간이 두 배가 되며, 복구되면 닫힙니다."""
+    faults = FaultInjector(outage=(0, 1.0))
+    controller = AdaptiveRateController(50, max_rate=50, cooldown=10, failure_threshold=3, open_timeout=0.2, max_open_timeout=5)
+    opened, probes = [], []
+    with StubServer(faults=faults) as server:
+        url = detail_url(server)
+        deadline = time.monotonic() + 10
+        status = None
+        while status != 200 and time.monotonic() < deadline:
+            controller.acquire()
+            before = controller.state
+            if before == "half-open":
+                probes.append(time.monotonic())
+            started = time.perf_counter()
+            response = requests.get(url, timeout=5)
+            status = response.status_code
+            controller.record(status, time.perf_counter() - started, response.headers.get("Retry-After"))
+            if controller.state == "open" and before != "open":
+                opened.append((time.monotonic(), controller.open_timeout))
+
+    assert status == 200
+    assert controller.state == "closed"
+    assert controller.open_timeout == 0.2
+    # 연속 실패 3번에 처음 열리고, 시험 요청이 실패할 때마다 대기 시간이 두 배가 됩니다.
+    timeouts = [timeout for _, timeout in opened]
+    assert len(timeouts) >= 2
+    assert timeouts == [0.2 * 2 ** i for i in range(len(timeouts))]
+    assert faults.counts[503] == 3 + len(opened) - 1
+    # 열린 동안에는 요청이 없고, 대기 시간이 지난 뒤 시험 요청 하나만 나갑니다.
+    assert len(probes) == len(opened)
+    for (opened_at, timeout), probe_at in zip(opened, probes):
+        assert probe_at - opened_at >= timeout - 0.05
@@ -1,13 +1,19 @@
+# Internal Modules
+from rate_limit import AdaptiveRateController, TokenBucket, backoff_delay
+from http_cache import ResponseCache
+from metrics import count, log_sampled, observe, timer
+# External Modules
 from bs4 import BeautifulSoup
-from typing import List, Dict
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from collections import deque
+from typing import IO, Deque, Iterator, List, Dict, Optional, Tuple, Union
 import logging
 import requests
 import argparse
-
-# Parser
-parser = argparse.ArgumentParser(description='Extract Summary Nrs from an HTML file')
-parser.add_argument('--file', '-F', type=str, help='Path to the HTML file')  # , required=True)
-args = parser.parse_args()
+import time
+import re
+import os
 
 # Root 
 logger_name = 'utils'
@@ -24,75 +30,311 @@ stream_handler.setLevel(logging.INFO)
 stream_handler.setFormatter(logging.Formatter(r'%(message)s'))
 logger.addHandler(stream_handler)
 
+OSHA_BASE_URL: str = "https://www.osha.gov"
+ACCIDENT_DETAIL_PATH: str = "/ords/imis/accidentsearch.accident_detail"
+INSPECTION_DETAIL_PATH: str = "/ords/imis/establishment.inspection_detail"
+ACCIDENT_SEARCH_PATH: str = "/ords/imis/accidentsearch.search"
+ACCIDENT_DETAIL_URL: str = f"{OSHA_BASE_URL}{ACCIDENT_DETAIL_PATH}"
+INSPECTION_DETAIL_URL: str = f"{OSHA_BASE_URL}{INSPECTION_DETAIL_PATH}"
+HEADERS: Dict[str, str] = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+ILLEGAL_CHARACTERS = re.compile(r'[\x00-\x1F\x7F-\x9F]')
+
+def sanitize_string(input_string: str) -> str:
+    """Remove illegal characters for Excel and control characters."""
+    return ILLEGAL_CHARACTERS.sub("", input_string)
+
+# keep-alive 커넥션을 재사용하는 세션을 만듭니다.
+def create_session(pool_size: int = 10) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def iter_report_ids(source: Union[str, IO[bytes]]) -> Iterator[str]:
+    """검색 결과 페이지를 처음부터 끝까지 한 번만 읽으면서 결과 테이블의 'Summary Nr'을 하나씩 내보냅니다.
+
+    문서 전체를 트리로 만들지 않고 lxml `iterparse`로 스트리밍하며, 처리한 행은 바로 비워
+    메모리 사용량이 파일 크기와 상관없이 일정합니다.
+
+    Args:
+        source (Union[str, IO[bytes]]): HTML 파일 경로 또는 바이너리 파일 객체.
+
+    Yields:
+        str: 'Summary Nr' 값.
+    """
+    in_table = False  # aria-label이 빈 결과 테이블 안에 있는지
+    in_body = False
+    headers: List[str] = []
+    report_id_index: Optional[int] = None
+    for event, element in etree.iterparse(source, events=("start", "end"), tag=("table", "thead", "tbody", "tr", "th"), html=True, encoding="utf-8"):
+        tag = element.tag
+        if tag == "table":
+            if event == "start" and element.get("aria-label") == "":
+                in_table = True
+            elif event == "end" and in_table:
+                if report_id_index is None:
+                    logger.error("Error: 'Summary Nr' column not found.")
+                return
+            continue
+        if not in_table:
+            continue
+        if tag == "tbody":
+            in_body = event == "start"
+        elif tag == "th" and event == "end":
+            headers.append("".join(element.itertext()).strip())
+            if headers[-1] == 'Summary Nr' and report_id_index is None:
+                report_id_index = len(headers) - 1
+        elif tag == "tr" and event == "end" and in_body:
+            if report_id_index is not None:
+                columns = element.findall("td")
+                if len(columns) > report_id_index:
+                    yield "".join(columns[report_id_index].itertext()).strip()
+            # 처리한 행과 그 앞의 형제들을 지워 메모리를 일정하게 유지합니다.
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    logger.error("Error: Table not found in the provided HTML.")
 
-def get_report_id(html: str) -> List[str]:
-    # 파일을 텍스트 모드로 열어서 전체 내용을 하나의 문자열로 읽어오기
-    with open(html, 'r', encoding="utf-8") as file:
-        html_content = file.read()  # file.readlines() 대신 file.read() 사용
-    # BeautifulSoup 객체 생성
-    soup = BeautifulSoup(html_content, 'html.parser')
-    # 'Results Table'이라는 aria-label을 가진 테이블 찾기
-    results_table = soup.find('table', {'aria-label': ''})
-    logger.debug(f"{results_table = }")
-    if results_table is None:
-        logger.error("Error: Table not found in the provided HTML.")
-        return
-    # 'Report ID' 헤더를 찾기
-    report_id_index = None
-    for index, th in enumerate(results_table.find_all('th')):
-        logger.debug(f"{th = }")
-        if th.text.strip() == 'Summary Nr':
-            report_id_index = index
-            break
-    if report_id_index is None:
-        logger.error("Error: 'Summary Nr' column not found.")
-        return
-    # 모든 'Report ID' 아래의 id들을 추출
-    report_ids = []
-    for row in results_table.find('tbody').find_all('tr'):
-        columns = row.find_all('td')
-        if len(columns) > report_id_index:
-            report_id = columns[report_id_index].text.strip()
-            report_ids.append(report_id)
-    # 결과 출력
-    logger.debug(report_ids)
+def get_htmls(folder: str) -> List[str]:
+    """`folder`에 저장된 검색 결과 페이지(`.html`, `(tmp).html` 제외) 경로 목록."""
+    return [os.path.join(folder, file) for file in os.listdir(folder) if file.endswith('.html') and not file.endswith('(tmp).html')]
+
+def get_report_id(html: Union[str, IO[bytes]]) -> List[str]:
+    with timer("osha_parse_seconds", page="search"):
+        report_ids = list(iter_report_ids(html))
+    logger.debug(f"{len(report_ids)} Summary Nrs from {html}")
     return report_ids
+
+RESULT_COUNT = re.compile(r'Results\s+([\d,]+)\s*-\s*([\d,]+)\s+of\s+([\d,]+)')
+
+def parse_result_count(page: str) -> Optional[Tuple[int, int, int]]:
+    """검색 결과 페이지의 `Results 1 - 100 of 29092`에서 (첫 번호, 마지막 번호, 전체 결과 수)를 읽습니다. 없으면 None."""
+    match = RESULT_COUNT.search(page)
+    return tuple(int(value.replace(",", "")) for value in match.groups()) if match else None
 # 텍스트 파일에서 ID 목록을 읽어옵니다.
 def read_ids_from_file(file_path: str) -> List[str]:
     with open(file_path, 'r') as file:
         ids = file.read().splitlines()
     return ids
-# 주어진 ID를 사용하여 웹사이트에서 'Inspection Nr'을 가져옵니다.
-def fetch_inspection_nr(id: str) -> str:
-    url: str = f"https://www.osha.gov/ords/imis/accidentsearch.accident_detail?id={id}"
-    headers: Dict[str, str] = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
-    response = requests.get(url, headers=headers)
-    logger.info(f"{response = }")
-    if response.status_code == 200:
-        logger.info(dir(response))
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table', {'name': 'accidentOverview'})
-        logger.info(f"{table = }")
-        if table:
-            # 테이블의 모든 행을 순회하며 "Inspection Nr"을 찾습니다.
-            for row in table.find_all("tr"):
-                cells = row.find_all("td")
-                if len(cells) > 1 and "Inspection Nr" in cells[0].text:
-                    return cells[1].text.strip()
-    else:
-        logger.error(f"Error occurred for ID: {id} with status code: {response.status_code}\n{response.headers = }\n{response.text = }")
+# accident_detail 페이지의 'accidentOverview' 테이블에서 'Inspection Nr'을 찾습니다.
+def parse_inspection_nr(page: str) -> Optional[str]:
+    soup = BeautifulSoup(page, 'html.parser')
+    table = soup.find('table', {'name': 'accidentOverview'})
+    log_sampled(logger, "accident_overview", found=table is not None, rows=len(table.find_all("tr")) if table else 0)
+    if table:
+        # inspection_detail 링크가 있으면 그 텍스트가 Inspection Nr입니다.
+        link = table.find('a', href=lambda href: href and 'inspection_detail' in href)
+        if link:
+            return link.text.strip()
+        # 테이블의 모든 행을 순회하며 "Inspection Nr"을 찾습니다.
+        for row in table.find_all("tr"):
+            cells = row.find_all("td")
+            if len(cells) > 1 and "Inspection Nr" in cells[0].text:
+                return cells[1].text.strip()
     return None
+# 주어진 ID를 사용하여 웹사이트에서 'Inspection Nr'을 가져옵니다.
+def fetch_inspection_nr(id: str, session: Optional[requests.Session] = None) -> str:
+    try:
+        results, _ = fetch_inspection_nr_batch([id], session)
+    except requests.HTTPError as e:
+        logger.error(f"Error occurred for ID: {id} with status code: {e.response.status_code}\n{e.response.headers = }\n{e.response.text = }")
+        return None
+    return results.get(id)
+
+ACCIDENT_OVERVIEW_TABLE = re.compile(r'<table\b[^>]*\bname=["\']accidentOverview["\'][^>]*>.*?</table>', re.S | re.I)
+ID_TOKEN = re.compile(r'(?<![\d.])\d+\.\d+(?![\d.])')
+
+
+def _closest_id(text: str, wanted: Dict[str, None]) -> Optional[str]:
+    """`text`에 나타나는 요청 ID 중 가장 마지막(테이블에 가장 가까운) ID를 반환합니다."""
+    found = [token for token in ID_TOKEN.findall(text) if token in wanted]
+    return found[-1] if found else None
+
+# 여러 ID를 한 번에 요청한 accident_detail 페이지에서 테이블마다 Summary Nr을 내용으로 찾아 짝지읍니다.
+def parse_inspection_nrs(page: str, ids: List[str]) -> Dict[str, str]:
+    """`accidentOverview` 테이블마다 그 앞의 제목(`Accident: <Summary Nr> ...`)이나 테이블 본문에서
+    요청한 Summary Nr을 찾아 Inspection Nr과 짝지읍니다. 순서(`ids[i]`)에 의존하지 않으므로
+    응답에서 일부 ID가 빠져도 잘못된 ID에 값이 붙지 않습니다.
 
-def main() -> None:
-    get_report_id(args.file)
+    Args:
+        page (str): accident_detail 응답 본문.
+        ids (List[str]): 요청한 Summary Nr 목록.
+
+    Returns:
+        Dict[str, str]: 짝지을 수 있었던 Summary Nr → Inspection Nr. 찾지 못한 ID는 빠집니다.
+    """
+    with timer("osha_parse_seconds", page="accident_detail"):
+        return _parse_inspection_nrs(page, ids)
+
+def _parse_inspection_nrs(page: str, ids: List[str]) -> Dict[str, str]:
+    wanted = dict.fromkeys(ids)
+    results: Dict[str, str] = {}
+    tables = list(ACCIDENT_OVERVIEW_TABLE.finditer(page))
+    previous_end = 0
+    for match in tables:
+        heading = page[previous_end:match.start()]
+        previous_end = match.end()
+        id = _closest_id(heading, wanted) or _closest_id(match.group(0), wanted)
+        if id is None and len(ids) == 1 and len(tables) == 1:
+            id = ids[0]  # 단일 요청은 테이블이 하나뿐이므로 그대로 짝지읍니다.
+        if id is None:
+            logger.warning(f"Could not match an accidentOverview table to one of {len(ids)} requested IDs")
+            continue
+        if id in results:
+            continue  # 같은 ID를 여러 번 요청한 경우
+        inspection_nr = parse_inspection_nr(match.group(0))
+        if inspection_nr:
+            results[id] = inspection_nr
+    return results
+
+def timed_get(session: Optional[requests.Session], url: str, page: str, **kwargs) -> requests.Response:
+    """GET 요청을 보내고 TTFB(응답 헤더까지)와 본문 다운로드 시간, 상태 코드를 `metrics`에 기록합니다.
+
+    `requests`는 DNS 조회와 연결 시간을 따로 알려 주지 않으므로 새 연결의 그 시간은 TTFB에 포함됩니다.
+    본문은 이 함수 안에서 모두 읽으므로 돌려받은 응답의 `content`는 바로 쓸 수 있습니다.
+
+    Args:
+        session (Optional[requests.Session]): 사용할 세션. None이면 `requests.get`.
+        page (str): 메트릭 레이블로 쓸 페이지 종류 (예: `accident_detail`).
+    """
+    try:
+        response = (session or requests).get(url, stream=True, **kwargs)
+        observe("osha_request_seconds", response.elapsed.total_seconds(), page=page, phase="ttfb")
+        with timer("osha_request_seconds", page=page, phase="download"):
+            response.content
+    except requests.RequestException:
+        count("osha_requests_total", page=page, status="error")
+        raise
+    count("osha_requests_total", page=page, status=response.status_code)
+    return response
+
+# 여러 ID를 하나의 URL로 묶어 한 번에 요청합니다.
+def fetch_inspection_nr_batch(ids: List[str], session: Optional[requests.Session] = None, timeout: float = 60, base_url: str = OSHA_BASE_URL, cache: Optional[ResponseCache] = None) -> Tuple[Dict[str, str], int]:
+    """Returns: (Summary Nr → Inspection Nr, 응답 크기(bytes)). HTTP 오류는 예외로 올립니다."""
+    response = timed_get(session, f"{base_url}{ACCIDENT_DETAIL_PATH}", "accident_detail", params=[("id", id) for id in ids], headers=HEADERS, timeout=timeout)
+    response.raise_for_status()
+    if cache:
+        cache.put(response.url, response.content)
+    return parse_inspection_nrs(response.text, ids), len(response.content)
+
+
+class BatchSizeTuner:
+    """응답 시간과 크기를 보고 한 요청에 묶을 ID 수(K)를 조절합니다.
+
+    목표보다 충분히 빠르고 작으면 K를 키우고, 목표를 넘으면 절반으로 줄입니다.
+    """
+
+    def __init__(self, batch_size: int = 25, min_size: int = 1, max_size: int = 100, target_latency: float = 5.0, max_bytes: int = 2_000_000) -> None:
+        self.batch_size = batch_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+
+    def update(self, latency: float, size: int) -> int:
+        if latency > self.target_latency or size > self.max_bytes:
+            self.batch_size = max(self.min_size, self.batch_size // 2)
+        elif latency < self.target_latency / 2 and size < self.max_bytes / 2:
+            self.batch_size = min(self.max_size, self.batch_size + max(1, self.batch_size // 4))
+        return self.batch_size
+
+# 주어진 ID들을 K개씩 묶어 가져오고, 실패한 묶음은 나누어 다시 시도합니다.
+def fetch_inspection_nrs(ids: List[str], session: Optional[requests.Session] = None, tuner: Optional[BatchSizeTuner] = None, bucket: Optional[TokenBucket] = None, retry_count: int = 3, base_url: str = OSHA_BASE_URL, cache: Optional[ResponseCache] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """Summary Nr들을 묶음 단위로 조회하여 `(Summary Nr, Inspection Nr 또는 None)`을 완료되는 대로 내보냅니다.
+
+    묶음 요청이 실패하면 절반으로 나누어 다시 큐에 넣고, 한 개짜리 요청이 `retry_count`번
+    실패하거나 응답에서 짝을 찾지 못한 ID는 `None`으로 내보냅니다. 429 응답은 묶음을 그대로 다시
+    보내되, 같은 묶음이 `retry_count`번 거절되면 일반 실패로 처리합니다. 묶음 응답에서 빠진 ID는
+    단독 요청으로 한 번 더 확인합니다.
+
+    Args:
+        ids (List[str]): 조회할 Summary Nr 목록.
+        session (Optional[requests.Session]): 재사용할 세션. 기본값은 `create_session()`.
+        tuner (Optional[BatchSizeTuner]): 묶음 크기 조절기. 기본값은 `BatchSizeTuner()`.
+        bucket (Optional[TokenBucket]): 요청 속도 제한. 응답마다 `record()`로 결과를 알려 주므로
+            `AdaptiveRateController`를 넘기면 서버 상태에 맞춰 속도가 조절됩니다. 기본값은 초당 0.5회에서
+            시작하는 `AdaptiveRateController`.
+        retry_count (int): 단일 ID 요청의 최대 시도 횟수.
+        base_url (str): 요청할 서버 주소. 스텁 서버로 시험할 때 바꿉니다.
+        cache (Optional[ResponseCache]): 원본 응답을 기록할 캐시.
+
+    Yields:
+        Tuple[str, Optional[str]]: (Summary Nr, Inspection Nr).
+    """
+    session = session or create_session()
+    tuner = tuner or BatchSizeTuner()
+    bucket = bucket or AdaptiveRateController(0.5)
+    queue: Deque[List[str]] = deque()
+    attempts: Dict[str, int] = {}
+    throttled: Dict[Tuple[str, ...], int] = {}
+    remaining = list(ids)
+
+    while remaining or queue:
+        if queue:
+            batch = queue.popleft()
+        else:
+            batch, remaining = remaining[:tuner.batch_size], remaining[tuner.batch_size:]
+        bucket.acquire()
+        started = time.perf_counter()
+        try:
+            results, size = fetch_inspection_nr_batch(batch, session, base_url=base_url, cache=cache)
+        except requests.RequestException as e:
+            response = e.response
+            status = response.status_code if response is not None else None
+            bucket.record(status, time.perf_counter() - started, response.headers.get("Retry-After") if response is not None else None)
+            logger.warning(f"Batch of {len(batch)} IDs failed: {e!r}")
+            if status == 429:
+                # 요청 속도 때문에 거절된 것이므로 묶음을 나누지 않고 그대로 다시 보냅니다.
+                # 같은 묶음이 `retry_count`번 거절되면 다른 실패와 같이 나누고 시도 횟수를 셉니다.
+                throttled[tuple(batch)] = throttled.get(tuple(batch), 0) + 1
+                if throttled[tuple(batch)] < retry_count:
+                    queue.appendleft(batch)
+                    continue
+            tuner.update(float("inf"), 0)
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                queue.extendleft([batch[middle:], batch[:middle]])
+                continue
+            attempts[batch[0]] = attempts.get(batch[0], 0) + 1
+            if attempts[batch[0]] < retry_count:
+                time.sleep(backoff_delay(attempts[batch[0]]))
+                queue.append(batch)
+            else:
+                logger.error(f"ID: {batch[0]}, giving up after {retry_count} attempts")
+                yield batch[0], None
+            continue
+        latency = time.perf_counter() - started
+        bucket.record(200, latency)
+        tuner.update(latency, size)
+
+        for id in batch:
+            if id in results:
+                yield id, results[id]
+            elif len(batch) > 1:
+                queue.append([id])  # 묶음에서 빠진 ID는 단독으로 다시 확인합니다.
+            else:
+                logger.error(f"ID: {id}, Inspection Nr not found")
+                yield id, None
+
+def main(file: str) -> None:
+    get_report_id(file)
 
 # Main
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Extract Summary Nrs from an HTML file')
+    parser.add_argument('--file', '-F', type=str, help='Path to the HTML file')  # , required=True)
+    args = parser.parse_args()
+
+    main(args.file)
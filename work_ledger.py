@@ -0,0 +1,278 @@
+"""Inspection Nr 단위로 작업 상태를 기록하는 SQLite(WAL) 작업 원장.
+
+각 Inspection Nr은 `pending → in_flight → done | failed` 상태를 가지며, 시도 횟수와 마지막 오류,
+그리고 완료된 경우 추출한 레코드(JSON)를 함께 저장합니다. 레코드는 하나씩 커밋되므로 배치
+도중에 중단되어도 이미 가져온 레코드는 사라지지 않고, 다시 실행하면 끝나지 않은 항목만 가져갑니다.
+
+한 머신의 여러 스레드/프로세스가 같은 원장을 함께 사용할 수 있습니다. 항목을 가져갈 때는 `BEGIN IMMEDIATE`
+트랜잭션으로 잠그고, `lease_timeout`이 지나도록 끝나지 않은 `in_flight` 항목(죽은 워커)은
+다시 가져갈 수 있게 됩니다. WAL 모드는 네트워크 파일 시스템에서 동작하지 않으므로 원장은 로컬 디스크에 둡니다.
+
+Usage:
+    $ python work_ledger.py inspection-detail/ledger.sqlite
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import argparse
+import sqlite3
+import socket
+import json
+import time
+import os
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+EXPORTING = "exporting:"
+
+
+def default_worker_id() -> str:
+    """`호스트:PID:스레드` 형식의 워커 이름."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class WorkLedger:
+    """Inspection Nr별 작업 상태 원장."""
+
+    def __init__(self, path: str, lease_timeout: float = 600, max_attempts: int = 3) -> None:
+        """WorkLedger 클래스의 초기화 메서드.
+
+        Args:
+            path (str): SQLite 파일 경로.
+            lease_timeout (float): `in_flight` 항목을 죽은 워커의 것으로 보고 다시 내줄 때까지의 시간(초).
+            max_attempts (int): `failed` 항목을 다시 시도할 최대 횟수.
+        """
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db
+        db.execute("""CREATE TABLE IF NOT EXISTS items (
+            inspection_nr TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            worker TEXT,
+            leased_at REAL,
+            updated_at REAL,
+            record TEXT,
+            export TEXT)""")
+        db.execute("CREATE INDEX IF NOT EXISTS items_state_seq ON items (state, seq)")
+        db.execute("CREATE INDEX IF NOT EXISTS items_export ON items (state, export)")
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않으므로 스레드마다 따로 엽니다.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self, sql: str, params: Iterable = ()) -> List[Tuple]:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(sql, params).fetchall()
+            db.execute("COMMIT")
+            return rows
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def is_empty(self) -> bool:
+        return self._db.execute("SELECT 1 FROM items LIMIT 1").fetchone() is None
+
+    def add(self, inspection_nrs: List[str], append: bool = False) -> int:
+        """새 Inspection Nr들을 `pending`으로 추가합니다. 이미 있는 항목은 그대로 둡니다.
+
+        `seq`는 입력 목록에서의 위치(처음 등장한 위치)이며 처리 순서와 출력 파일 이름에 쓰입니다.
+        `append`이면 원장의 마지막 `seq` 뒤에 이어 붙입니다 (파이프라인처럼 조금씩 들어오는 경우).
+
+        Returns:
+            int: 새로 추가된 항목 수.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            start = db.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM items").fetchone()[0] if append else 0
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO items (inspection_nr, seq) VALUES (?, ?)", ((nr, start + seq) for seq, nr in enumerate(inspection_nrs) if nr))
+            added = db.total_changes - before
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return added
+
+    def mark_done(self, inspection_nrs: Iterable[str], export: str = "legacy") -> None:
+        """이미 다른 방법으로 수집된 항목을 레코드 없이 `done`(내보냄)으로 표시합니다."""
+        now = time.time()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("UPDATE items SET state = 'done', updated_at = ?, export = ? WHERE inspection_nr = ? AND state != 'done'", ((now, export, nr) for nr in inspection_nrs))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def claim(self, limit: int = 1, worker: Optional[str] = None) -> List[str]:
+        """처리할 항목을 최대 `limit`개 가져가 `in_flight`로 표시합니다.
+
+        `pending`, 시도 횟수가 남은 `failed`, 임대 시간이 지난 `in_flight` 항목을 `seq` 순서로 가져갑니다.
+
+        Returns:
+            List[str]: 가져간 Inspection Nr 목록. 남은 작업이 없으면 빈 리스트.
+        """
+        now = time.time()
+        rows = self._transaction(
+            """UPDATE items SET state = 'in_flight', attempts = attempts + 1, worker = ?, leased_at = ?, updated_at = ?
+            WHERE inspection_nr IN (
+                SELECT inspection_nr FROM items
+                WHERE state = 'pending'
+                   OR (state = 'failed' AND attempts < ?)
+                   OR (state = 'in_flight' AND leased_at < ?)
+                ORDER BY seq LIMIT ?)
+            RETURNING inspection_nr, seq""",
+            (worker or default_worker_id(), now, now, self.max_attempts, now - self.lease_timeout, limit),
+        )
+        return [nr for nr, _ in sorted(rows, key=lambda row: row[1])]
+
+    def claim_nrs(self, inspection_nrs: List[str], worker: Optional[str] = None) -> List[str]:
+        """`inspection_nrs` 중 `claim`이 가져갈 수 있는 상태인 항목만 가져가 `in_flight`로 표시합니다.
+
+        Returns:
+            List[str]: 가져간 Inspection Nr 목록. 이미 끝났거나 다른 워커가 처리 중인 항목은 빠집니다.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" * len(inspection_nrs))
+        rows = self._transaction(
+            f"""UPDATE items SET state = 'in_flight', attempts = attempts + 1, worker = ?, leased_at = ?, updated_at = ?
+            WHERE inspection_nr IN ({placeholders})
+              AND (state = 'pending'
+                   OR (state = 'failed' AND attempts < ?)
+                   OR (state = 'in_flight' AND leased_at < ?))
+            RETURNING inspection_nr, seq""",
+            (worker or default_worker_id(), now, now, *inspection_nrs, self.max_attempts, now - self.lease_timeout),
+        ) if inspection_nrs else []
+        return [nr for nr, _ in sorted(rows, key=lambda row: row[1])]
+
+    def heartbeat(self, inspection_nrs: List[str]) -> None:
+        """오래 걸리는 항목의 임대 시간을 연장합니다."""
+        now = time.time()
+        self._db.executemany("UPDATE items SET leased_at = ? WHERE inspection_nr = ? AND state = 'in_flight'", ((now, nr) for nr in inspection_nrs))
+
+    def release(self, worker_prefix: str) -> int:
+        """`worker_prefix`로 시작하는 워커(죽은 프로세스 등)가 잡고 있던 `in_flight` 항목을 바로 `pending`으로 돌립니다.
+
+        Returns:
+            int: 되돌린 항목 수.
+        """
+        rows = self._transaction(
+            "UPDATE items SET state = 'pending', worker = NULL, leased_at = NULL, updated_at = ? WHERE state = 'in_flight' AND worker >= ? AND worker < ? RETURNING inspection_nr",
+            (time.time(), worker_prefix, worker_prefix + "\uffff"),
+        )
+        return len(rows)
+
+    def complete(self, inspection_nr: str, record: Dict[str, Any]) -> None:
+        """항목을 `done`으로 표시하고 레코드를 저장합니다 (즉시 커밋)."""
+        self._db.execute("UPDATE items SET state = 'done', record = ?, last_error = NULL, updated_at = ? WHERE inspection_nr = ?", (json.dumps(record, ensure_ascii=False), time.time(), inspection_nr))
+
+    def update_record(self, inspection_nr: str, record: Dict[str, Any]) -> None:
+        """`done` 항목의 레코드를 새 값으로 바꾸고 다시 내보내도록 표시합니다 (재수집한 경우).
+
+        원장에 없는 항목(예전 출력물에서만 알던 항목)은 맨 뒤 `seq`로 추가됩니다.
+        """
+        now = time.time()
+        self._transaction(
+            """INSERT INTO items (inspection_nr, seq, state, record, updated_at)
+            VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM items), 'done', ?, ?)
+            ON CONFLICT(inspection_nr) DO UPDATE SET state = 'done', record = excluded.record, last_error = NULL, updated_at = excluded.updated_at, export = NULL""",
+            (inspection_nr, json.dumps(record, ensure_ascii=False), now),
+        )
+
+    def fail(self, inspection_nr: str, error: str) -> None:
+        """항목을 `failed`로 표시하고 오류를 기록합니다 (즉시 커밋)."""
+        self._db.execute("UPDATE items SET state = 'failed', last_error = ?, updated_at = ? WHERE inspection_nr = ?", (error, time.time(), inspection_nr))
+
+    def take_unexported(self, export: str, limit: Optional[int] = None, loads: Callable[[str], Any] = json.loads) -> List[Tuple[int, Any]]:
+        """아직 파일로 내보내지 않은 `done` 레코드를 `export` 이름으로 예약하고 `(seq, record)`를 반환합니다.
+
+        예약과 조회가 한 트랜잭션에서 일어나므로 여러 워커가 같은 레코드를 중복해서 내보내지 않습니다.
+        파일을 다 쓴 뒤 `finish_export`로 확정하고, 쓰다가 실패하면 `abort_export`로 되돌려야 합니다.
+        레코드는 `loads`로 읽습니다 (예: `records.loads_record`로 압축된 레코드를 바로 만들기).
+        """
+        rows = self._transaction(
+            """UPDATE items SET export = ? WHERE inspection_nr IN (
+                SELECT inspection_nr FROM items WHERE state = 'done' AND export IS NULL ORDER BY seq LIMIT ?)
+            RETURNING seq, record""",
+            (EXPORTING + export, -1 if limit is None else limit),
+        )
+        return [(seq, loads(record)) for seq, record in sorted(rows, key=lambda row: row[0]) if record]
+
+    def finish_export(self, export: str) -> None:
+        """`take_unexported`로 예약한 레코드를 내보낸 것으로 확정합니다."""
+        self._transaction("UPDATE items SET export = ? WHERE export = ?", (export, EXPORTING + export))
+
+    def abort_export(self, export: str) -> None:
+        """`take_unexported`로 예약한 레코드를 다시 내보낼 대상으로 되돌립니다."""
+        self._transaction("UPDATE items SET export = NULL WHERE export = ?", (EXPORTING + export,))
+
+    def reset_exports(self) -> int:
+        """내보내던 중 프로세스가 죽어 남은 예약을 모두 되돌리고 그 수를 반환합니다.
+
+        다른 프로세스가 내보내는 중인 예약까지 되돌리므로, 내보내기를 맡은 프로세스 하나가 시작할 때만 부릅니다.
+        """
+        return len(self._transaction("UPDATE items SET export = NULL WHERE export LIKE ? RETURNING seq", (EXPORTING + "%",)))
+
+    def records(self, state: str = DONE) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        """`state` 상태의 `(Inspection Nr, record)`를 `seq` 순서로 나열합니다."""
+        for nr, record in self._db.execute("SELECT inspection_nr, record FROM items WHERE state = ? AND record IS NOT NULL ORDER BY seq", (state,)):
+            yield nr, json.loads(record)
+
+    def updated_at(self, state: str = DONE) -> Dict[str, float]:
+        """`state` 상태 항목의 Inspection Nr → 마지막으로 바뀐 시각."""
+        return dict(self._db.execute("SELECT inspection_nr, updated_at FROM items WHERE state = ?", (state,)).fetchall())
+
+    def failures(self) -> List[Tuple[str, int, Optional[str]]]:
+        """`(Inspection Nr, 시도 횟수, 마지막 오류)` 목록."""
+        return self._db.execute("SELECT inspection_nr, attempts, last_error FROM items WHERE state = 'failed' ORDER BY seq").fetchall()
+
+    def counts(self) -> Dict[str, int]:
+        """상태별 항목 수."""
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+
+    def unexported(self) -> int:
+        """아직 파일로 내보내지 않은 `done` 항목 수."""
+        return self._db.execute("SELECT COUNT(*) FROM items WHERE state = 'done' AND export IS NULL").fetchone()[0]
+
+    def remaining(self) -> int:
+        """아직 처리될 수 있는 항목 수 (`pending`, 시도 횟수가 남은 `failed`, `in_flight`)."""
+        return self._db.execute("SELECT COUNT(*) FROM items WHERE state IN ('pending', 'in_flight') OR (state = 'failed' AND attempts < ?)", (self.max_attempts,)).fetchone()[0]
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def main(path: str) -> None:
+    ledger = WorkLedger(path)
+    print(ledger.counts())
+    for nr, attempts, error in ledger.failures():
+        print(f"{nr}\t{attempts}\t{error}")
+
+# Main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the state of a work ledger')
+    parser.add_argument('path', type=str, help='Path to the ledger SQLite file')
+    args = parser.parse_args()
+
+    main(args.path)